@@ -0,0 +1,214 @@
+"""Live alert feed for GET /alerts/stream (server-sent events).
+
+Every alert created or updated is appended to the `alert_events` table in the
+same transaction as the alert (database.record_alert_events), so the log is
+the single source of truth for all workers:
+
+- One pump thread per server process tails the log and fans each new event
+  out to the in-process subscribers whose state/district filter matches.
+  Writers in the same process wake it at once (`alert_bus.notify()`); events
+  written by other workers are picked up within ALERT_STREAM_POLL_MS. That is
+  one indexed query per process per interval, however many clients are
+  connected, and none while nobody is.
+- Event ids are the log's primary key, so a reconnecting EventSource sends
+  the last id it saw (Last-Event-ID) and gets the events it missed replayed
+  from the log. When they are no longer there (trimmed by ALERT_EVENTS_KEEP,
+  or more than ALERT_STREAM_REPLAY_LIMIT) it gets an `event: reset` instead
+  and should refetch /alerts.
+- A subscriber that stops reading fills its bounded queue and is dropped; its
+  client reconnects and resumes from the log.
+
+An idle stream holds a socket and a small queue, not a thread or a database
+connection, as long as the server runs an async worker class
+(GUNICORN_WORKER_CLASS=gevent). With sync workers every open stream occupies
+a whole worker, so the stream is off by default there (ALERT_STREAM_ENABLED):
+it answers 503 and clients poll /alerts. Turned on anyway, streams are cut
+after ALERT_STREAM_MAX_SECONDS (the client reconnects and resumes) to stay
+under the worker timeout.
+"""
+import os
+import queue
+import threading
+import time
+
+# Reconnection delay suggested to EventSource clients
+RETRY_MS = 3000
+# Retry-After of the 503 answered while ALERT_STREAM_ENABLED is off
+UNAVAILABLE_RETRY_AFTER = 300
+# Log rows read per poll
+POLL_BATCH = 1000
+# How long a missing event id is waited for before it is skipped: PostgreSQL
+# ids can commit out of order, and a rolled back transaction leaves a hole
+GAP_SECONDS = 5
+
+def format_event(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+class Subscriber:
+    """One open stream: its filter and a bounded queue of event frames"""
+
+    def __init__(self, state, district, queue_size):
+        self.state = state
+        self.district = district
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = False
+        # Last event before the live feed: later ones arrive on the queue
+        self.start_id = 0
+
+    def wants(self, state, district):
+        return (not self.state or self.state == state) and (not self.district or self.district == district)
+
+class AlertBus:
+    """Flask extension: `alert_bus.init_app(app)`, then `alert_bus.subscribe(...)` per stream"""
+
+    def __init__(self):
+        self.app = None
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.pid = None
+        # Id of the last event fanned out; None while nobody is subscribed
+        self.floor = None
+        self.gap_since = None
+        self.polls = 0
+        self.delivered = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.poll_seconds = app.config['ALERT_STREAM_POLL_MS'] / 1000
+        self.heartbeat_seconds = app.config['ALERT_STREAM_HEARTBEAT_SECONDS']
+        self.max_seconds = app.config['ALERT_STREAM_MAX_SECONDS']
+        self.max_clients = app.config['ALERT_STREAM_MAX_CLIENTS']
+        self.queue_size = app.config['ALERT_STREAM_QUEUE_SIZE']
+        self.replay_limit = app.config['ALERT_STREAM_REPLAY_LIMIT']
+
+    def notify(self):
+        """Called after a commit that recorded alert events"""
+        self.wakeup.set()
+
+    def subscribe(self, state=None, district=None):
+        """Register a stream; None when ALERT_STREAM_MAX_CLIENTS are already open.
+
+        Call inside a request: the first subscriber of an idle process reads
+        the latest event id, where its live feed starts.
+        """
+        from database import db, AlertEvent
+
+        with self.lock:
+            if len(self.subscribers) >= self.max_clients:
+                return None
+            # Forked workers do not inherit the pump thread
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.floor = None
+                self.subscribers = set()
+                threading.Thread(target=self._pump, name='alert-stream', daemon=True).start()
+            if self.floor is None:
+                self.floor = db.session.query(db.func.max(AlertEvent.id)).scalar() or 0
+                self.gap_since = None
+            subscriber = Subscriber(state, district, self.queue_size)
+            subscriber.start_id = self.floor
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def replay(self, subscriber, last_event_id):
+        """Frames for the events after `last_event_id` up to where the live feed starts"""
+        from database import db, AlertEvent
+
+        oldest = db.session.query(db.func.min(AlertEvent.id)).scalar()
+        query = db.session.query(AlertEvent.id, AlertEvent.event, AlertEvent.payload)\
+            .filter(AlertEvent.id > last_event_id, AlertEvent.id <= subscriber.start_id)
+        if subscriber.state:
+            query = query.filter(AlertEvent.state == subscriber.state)
+        if subscriber.district:
+            query = query.filter(AlertEvent.district == subscriber.district)
+        rows = query.order_by(AlertEvent.id).limit(self.replay_limit + 1).all()
+
+        trimmed = last_event_id < subscriber.start_id and oldest is not None and oldest > last_event_id + 1
+        if trimmed or len(rows) > self.replay_limit:
+            # The client cannot catch up from the log: it refetches /alerts and resumes from here
+            return [format_event(subscriber.start_id, 'reset', '{}')]
+        return [format_event(row.id, row.event, row.payload) for row in rows]
+
+    def stream(self, subscriber, frames):
+        """Response body: the replayed frames, then live events and keepalive comments"""
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            yield from frames
+            deadline = time.monotonic() + self.max_seconds
+            while not subscriber.dropped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    frame = subscriber.queue.get(timeout=min(self.heartbeat_seconds, remaining))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield frame
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _pump(self):
+        while True:
+            self.wakeup.wait(0.05 if self.gap_since else self.poll_seconds)
+            self.wakeup.clear()
+            try:
+                self._poll()
+            except Exception as e:
+                print(f"❌ Alert stream poll failed: {e}")
+                time.sleep(self.poll_seconds)
+
+    def _poll(self):
+        """Fan out the events after the floor, in id order"""
+        from database import db, AlertEvent
+
+        with self.lock:
+            if not self.subscribers:
+                self.floor = None
+                return
+            floor = self.floor
+        self.polls += 1
+        with self.app.app_context():
+            rows = db.session.query(AlertEvent.id, AlertEvent.event, AlertEvent.state,
+                                    AlertEvent.district, AlertEvent.payload)\
+                .filter(AlertEvent.id > floor).order_by(AlertEvent.id).limit(POLL_BATCH).all()
+
+        for row in rows:
+            if row.id != floor + 1:
+                # Hold back behind a hole until it fills or GAP_SECONDS pass
+                if self.gap_since is None:
+                    self.gap_since = time.monotonic()
+                if time.monotonic() - self.gap_since < GAP_SECONDS:
+                    return
+            self.gap_since = None
+            frame = format_event(row.id, row.event, row.payload)
+            # Moving the floor with the snapshot: a stream subscribed in between replays up to it
+            with self.lock:
+                if self.floor != floor:
+                    return  # everyone left, the next subscriber starts afresh
+                subscribers = [subscriber for subscriber in self.subscribers if subscriber.wants(row.state, row.district)]
+                self.floor = floor = row.id
+            for subscriber in subscribers:
+                try:
+                    subscriber.queue.put_nowait(frame)
+                except queue.Full:
+                    subscriber.dropped = True
+            self.delivered += len(subscribers)
+
+        if len(rows) == POLL_BATCH:
+            self.wakeup.set()
+
+    def stats(self):
+        return {
+            'subscribers': len(self.subscribers),
+            'last_event_id': self.floor,
+            'polls': self.polls,
+            'delivered': self.delivered
+        }
+
+alert_bus = AlertBus()
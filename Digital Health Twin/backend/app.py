@@ -1,9 +1,21 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from database import db, WaterQualityRecord, PredictionRecord, HealthAlert, HealthWorker, HealthMetricsRecord, seed_initial_data, save_prediction_record
-from model.predict import predict_disease
-from sqlalchemy import func
+from database import db, engine_options, WaterQualityRecord, PredictionRecord, HealthAlert, HealthWorker, HealthMetricsRecord, PredictionRollup, WaterQualityHourlyRollup, HealthMetricsRollup, HealthMetricsHourlyRollup, OutbreakAlert, save_prediction_record, save_prediction_records_bulk, save_health_metrics_bulk, update_health_metrics_rollups, record_alert_events, extract_symptom, ROLLUP_VITALS, WATER_QUALITY_VALUES, ALERT_STATUSES
+from model.predict import predict_disease, predict_diseases, prediction_cache, model_status, load_model, start_model_load, model_ready
+from migrations import prepare_database, schema_is_current
+from pagination import keyset_page
+from cache import response_cache
+from write_behind import prediction_writer
+from sqlite_writer import sqlite_writer
+from alert_stream import alert_bus, UNAVAILABLE_RETRY_AFTER
+from ingest import parse_body, validate_records
+from sqlalchemy import Date, cast, func, select, type_coerce
+from datetime import datetime, timedelta
 import os
+import csv
+import io
+import json
+import uuid
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -14,26 +26,114 @@ app = Flask(__name__)
 # CORS configuration
 default_origins = 'http://localhost:3000,http://localhost:5173,http://localhost:5174,http://localhost:8081'
 cors_origins = os.getenv('CORS_ORIGINS', default_origins).split(',')
-CORS(app, origins=cors_origins, supports_credentials=True)
+CORS(app, origins=cors_origins, supports_credentials=True, expose_headers=['X-Next-Cursor', 'X-Total-Count'])
 
 # Database configuration
 database_url = os.getenv('DATABASE_URL', f'sqlite:///{os.path.join(os.path.dirname(__file__), "health_monitoring.db")}')
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+app.config['PREDICT_BATCH_MAX_SIZE'] = int(os.getenv('PREDICT_BATCH_MAX_SIZE', 10000))
+app.config['HEALTH_METRICS_BULK_MAX_SIZE'] = int(os.getenv('HEALTH_METRICS_BULK_MAX_SIZE', 10000))
+app.config['ALERTS_DEFAULT_LIMIT'] = int(os.getenv('ALERTS_DEFAULT_LIMIT', 100))
+# Largest page the list endpoints return, whatever limit/per_page asks for
+app.config['PAGE_MAX_LIMIT'] = int(os.getenv('PAGE_MAX_LIMIT', 1000))
+app.config['EXPORT_CHUNK_SIZE'] = int(os.getenv('EXPORT_CHUNK_SIZE', 1000))
+# /timeseries/* switch to a coarser bucket beyond this many points
+app.config['TIMESERIES_MAX_POINTS'] = int(os.getenv('TIMESERIES_MAX_POINTS', 500))
 
-# Initialize database
+# Response cache configuration
+app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', 'memory')
+app.config['CACHE_URL'] = os.getenv('CACHE_URL', 'redis://localhost:6379/0')
+app.config['CACHE_DEFAULT_TTL'] = int(os.getenv('CACHE_DEFAULT_TTL', 10))
+app.config['CACHE_MAX_ENTRIES'] = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+
+# Prediction persistence: 'sync' saves inside the /predict request, 'async'
+# returns at once and saves in the background (see write_behind.py)
+app.config['PREDICTION_WRITE_MODE'] = os.getenv('PREDICTION_WRITE_MODE', 'sync')
+app.config['WRITE_BEHIND_INTERVAL_MS'] = int(os.getenv('WRITE_BEHIND_INTERVAL_MS', 50))
+app.config['WRITE_BEHIND_BATCH_SIZE'] = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 500))
+app.config['PREDICTION_SPOOL_DIR'] = os.getenv('PREDICTION_SPOOL_DIR', os.path.join(os.path.dirname(__file__), 'data', 'spool'))
+app.config['PREDICTION_SPOOL_FSYNC'] = os.getenv('PREDICTION_SPOOL_FSYNC', '0') == '1'
+
+# SQLite production profile: WAL and tuning pragmas on every connection, and
+# one writer at a time across all workers (see sqlite_writer.py)
+app.config['SQLITE_TUNING'] = os.getenv('SQLITE_TUNING', '0') == '1'
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 30000))
+app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+app.config['SQLITE_CACHE_SIZE_KB'] = int(os.getenv('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+
+# Live alert feed (see alert_stream.py). Streams are cut after MAX_SECONDS and
+# resumed by the client: under the worker timeout with sync workers, which
+# hold a whole worker per stream; gevent workers can keep them open far longer.
+# With sync workers every open stream would hold a whole worker: off unless asked for
+app.config['ALERT_STREAM_ENABLED'] = os.getenv('ALERT_STREAM_ENABLED', '1' if os.getenv('GUNICORN_WORKER_CLASS') == 'gevent' else '0') == '1'
+app.config['ALERT_STREAM_POLL_MS'] = int(os.getenv('ALERT_STREAM_POLL_MS', 1000))
+app.config['ALERT_STREAM_HEARTBEAT_SECONDS'] = int(os.getenv('ALERT_STREAM_HEARTBEAT_SECONDS', 15))
+app.config['ALERT_STREAM_MAX_SECONDS'] = int(os.getenv('ALERT_STREAM_MAX_SECONDS', 3600 if os.getenv('GUNICORN_WORKER_CLASS') == 'gevent' else 90))
+app.config['ALERT_STREAM_MAX_CLIENTS'] = int(os.getenv('ALERT_STREAM_MAX_CLIENTS', 10000))
+app.config['ALERT_STREAM_QUEUE_SIZE'] = int(os.getenv('ALERT_STREAM_QUEUE_SIZE', 1000))
+app.config['ALERT_STREAM_REPLAY_LIMIT'] = int(os.getenv('ALERT_STREAM_REPLAY_LIMIT', 1000))
+
+# Fast start: no schema work at import and the model loads in the background.
+# Run `python migrations.py` once per deploy and route traffic on GET /ready.
+app.config['FAST_START'] = os.getenv('FAST_START', '0') == '1'
+
+# Pool sized per server process; gunicorn.conf.py exports the worker count and concurrency.
+# Background threads with their own session: the write-behind writer and the alert-stream pump
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+    database_url,
+    workers=int(os.getenv('WEB_CONCURRENCY', 1)),
+    concurrency=int(os.getenv('WORKER_CONCURRENCY', 1)),
+    background_threads=(app.config['PREDICTION_WRITE_MODE'] == 'async') + app.config['ALERT_STREAM_ENABLED'],
+    max_connections=int(os.getenv('DB_MAX_CONNECTIONS', 90)),
+    pool_size=int(os.environ['DB_POOL_SIZE']) if os.getenv('DB_POOL_SIZE') else None,
+    max_overflow=int(os.environ['DB_MAX_OVERFLOW']) if os.getenv('DB_MAX_OVERFLOW') else None,
+    pool_recycle=int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    pool_timeout=int(os.getenv('DB_POOL_TIMEOUT', 10))
+)
+
+# Initialize database, response cache, write-behind persistence and the alert feed
 db.init_app(app)
+sqlite_writer.init_app(app)
+response_cache.init_app(app)
+prediction_writer.init_app(app)
+alert_bus.init_app(app)
+
+if app.config['FAST_START']:
+    start_model_load()
+else:
+    # Create tables, upgrade existing schemas and seed data
+    with app.app_context():
+        prepare_database()
+        # With preload_app the app starts in the Gunicorn master: close its connections
+        # so forked workers never share a database socket
+        db.engine.dispose()
+    load_model()
 
-# Create tables and seed data
-with app.app_context():
-    db.create_all()
-    seed_initial_data()
+# Set once the schema is known to be current; it cannot go back
+_schema_ready = False
 
 @app.route("/")
 def home():
 
-    return {"message": "Smart Health Monitoring API with Database is running!", "endpoints": ["/predict", "/records", "/alerts", "/statistics/<state>", "/workers", "/dashboard", "/auth/login", "/auth/verify"]}
+    return {"message": "Smart Health Monitoring API with Database is running!", "endpoints": ["/ready", "/predict", "/predict/batch", "/predict/queue", "/records", "/alerts", "/alerts/stream", "/outbreaks", "/statistics/<state>", "/workers", "/dashboard", "/export/records", "/health-metrics/bulk", "/export/health-metrics", "/timeseries/water-quality", "/timeseries/vitals", "/cache/stats", "/model", "/auth/login", "/auth/verify"]}
+
+@app.route("/ready")
+def ready():
+    """Readiness probe: 200 once the schema is migrated and the model is loaded, 503 until then.
+
+    `/` answers as soon as the process is up (liveness); load balancers and
+    deploy health checks should wait for this one.
+    """
+    global _schema_ready
+    if not _schema_ready:
+        _schema_ready = schema_is_current()
+    loaded = model_ready()
+    if not loaded:
+        start_model_load()
+    checks = {'schema': _schema_ready, 'model': loaded}
+    return jsonify({'ready': all(checks.values()), 'checks': checks}), 200 if all(checks.values()) else 503
 
 @app.route("/auth/login", methods=["POST"])
 def login():
@@ -109,38 +209,45 @@ def verify_token():
             'message': f'Verification error: {str(e)}'
         }), 500
 
+def parse_prediction_input(data):
+    """Validate a prediction payload and split it into water data and additional info"""
+    water_data = {
+        'ph': float(data["ph"]),
+        'turbidity': float(data["turbidity"]),
+        'tds': float(data["tds"]),
+        'people_affected_per_5000': int(data["people_affected_per_5000"])
+    }
+
+    # Get additional info if provided
+    additional_info = {
+        'location': data.get("location", "Unknown"),
+        'state': data.get("state", "Unknown"),
+        'district': data.get("district", "Unknown"),
+        'collected_by': data.get("collected_by", "System")
+    }
+
+    return water_data, additional_info
+
 @app.route("/predict", methods=["POST"])
 def predict():
     try:
-        data = request.json
-        ph = float(data["ph"])
-        turbidity = float(data["turbidity"])
-        tds = float(data["tds"])
-        people_affected = int(data["people_affected_per_5000"])
-        
-        # Get additional info if provided
-        location = data.get("location", "Unknown")
-        state = data.get("state", "Unknown")
-        district = data.get("district", "Unknown")
-        collected_by = data.get("collected_by", "System")
+        water_data, additional_info = parse_prediction_input(request.json)
 
         # Get prediction
-        result = predict_disease(ph, turbidity, tds, people_affected)
-        
-        # Prepare data for database save
-        water_data = {
-            'ph': ph,
-            'turbidity': turbidity,
-            'tds': tds,
-            'people_affected_per_5000': people_affected
-        }
+        result = predict_disease(
+            water_data['ph'],
+            water_data['turbidity'],
+            water_data['tds'],
+            water_data['people_affected_per_5000']
+        )
+        result['prediction_uuid'] = str(uuid.uuid4())
         
-        additional_info = {
-            'location': location,
-            'state': state,
-            'district': district,
-            'collected_by': collected_by
-        }
+        # Async mode: spool the record and let the background writer save it
+        if prediction_writer.enabled:
+            prediction_writer.submit(water_data, result, additional_info)
+            result['saved_to_database'] = False
+            result['queued'] = True
+            return jsonify(result)
         
         # Save to database
         saved_record = save_prediction_record(water_data, result, additional_info)
@@ -157,104 +264,352 @@ def predict():
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    """Predict and save many water quality samples in one request.
+
+    Accepts either a JSON array of samples or {"samples": [...]}. Every sample
+    gets its own result entry; invalid samples report an error without
+    failing the rest of the batch.
+    """
+    try:
+        data = request.get_json()
+        samples = data.get("samples") if isinstance(data, dict) else data
+
+        if not isinstance(samples, list):
+            return jsonify({"error": "Expected a list of samples"}), 400
+
+        max_size = app.config['PREDICT_BATCH_MAX_SIZE']
+        if len(samples) > max_size:
+            return jsonify({"error": f"Batch too large: {len(samples)} samples (max {max_size})"}), 413
+
+        results = [None] * len(samples)
+        valid_indexes = []
+        parsed = []
+        for index, sample in enumerate(samples):
+            try:
+                if not isinstance(sample, dict):
+                    raise ValueError("Sample must be an object")
+                parsed.append(parse_prediction_input(sample))
+                valid_indexes.append(index)
+            except (KeyError, TypeError, ValueError) as e:
+                message = f"Missing field: {e.args[0]}" if isinstance(e, KeyError) else str(e)
+                results[index] = {'index': index, 'error': message}
+
+        # One vectorized model call for all valid samples
+        predictions = predict_diseases([
+            (water['ph'], water['turbidity'], water['tds'], water['people_affected_per_5000'])
+            for water, _ in parsed
+        ])
+
+        # One transaction for all records
+        saved_records = save_prediction_records_bulk([
+            (water, prediction, info)
+            for (water, info), prediction in zip(parsed, predictions)
+        ])
+
+        for position, (index, prediction) in enumerate(zip(valid_indexes, predictions)):
+            result = dict(prediction, index=index)
+            if saved_records:
+                result['record_id'] = saved_records[position]['id']
+                result['saved_to_database'] = True
+            else:
+                result['saved_to_database'] = False
+            results[index] = result
+
+        return jsonify({
+            'results': results,
+            'total': len(samples),
+            'succeeded': len(valid_indexes),
+            'failed': len(samples) - len(valid_indexes)
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+def parse_time_arg(name):
+    """Parse an optional ISO 8601 query parameter"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid '{name}': expected an ISO 8601 date or datetime")
+
+def location_time_filters(state_column, district_column, timestamp_column):
+    """Build filters from the state, district, start and end query parameters"""
+    filters = []
+    state = request.args.get('state')
+    district = request.args.get('district')
+    start = parse_time_arg('start')
+    end = parse_time_arg('end')
+    
+    if state:
+        filters.append(state_column == state)
+    if district:
+        filters.append(district_column == district)
+    if start:
+        filters.append(timestamp_column >= start)
+    if end:
+        filters.append(timestamp_column < end)
+    return filters
+
+def wants_total():
+    """Whether the client asked for a total count alongside a cursor page"""
+    return request.args.get('include_total', 'false').lower() in ('1', 'true', 'yes')
+
+def page_limit(name, default):
+    """Page size from the query string, clamped to 1..PAGE_MAX_LIMIT"""
+    return max(1, min(request.args.get(name, default, type=int), app.config['PAGE_MAX_LIMIT']))
+
+# HealthWorker.to_dict() fields, selected as worker_<field> columns by /alerts
+WORKER_FIELDS = ('id', 'name', 'worker_id', 'role', 'state', 'district', 'contact_phone', 'is_active', 'created_at')
+
+def worker_from_row(row):
+    """The assigned worker's to_dict() from a row's worker_* columns; None when unassigned"""
+    # worker_id is HealthWorker.id here (the worker_id field is worker_worker_id): NULL from the outer join
+    if row.worker_id is None:
+        return None
+    worker = {field: getattr(row, f'worker_{field}') for field in WORKER_FIELDS}
+    worker['created_at'] = worker['created_at'].isoformat() if worker['created_at'] else None
+    return worker
+
+def list_page_response(items, next_cursor, total=None):
+    """List body with the cursor and optional total in headers, so existing clients keep working"""
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    if total is not None:
+        response.headers['X-Total-Count'] = str(total)
+    return response
+
 @app.route("/records", methods=["GET"])
 def get_records():
-    """Get recent prediction records"""
+    """Get recent prediction records, newest first.
+
+    Pass the X-Next-Cursor response header back as `cursor` to get the next page.
+    """
     try:
-        limit = request.args.get('limit', 50, type=int)
+        limit = page_limit('limit', 50)
+        cursor = request.args.get('cursor')
         state_filter = request.args.get('state', None)
         
-        # Build query
-        query = db.session.query(PredictionRecord, WaterQualityRecord)\
-            .join(WaterQualityRecord)
+        # Only the columns the response needs: rows are plain tuples, no ORM objects
+        query = db.session.query(
+            PredictionRecord.id, PredictionRecord.predicted_disease, PredictionRecord.health_alert,
+            PredictionRecord.timestamp, WaterQualityRecord.ph, WaterQualityRecord.turbidity,
+            WaterQualityRecord.tds, WaterQualityRecord.people_affected_per_5000, WaterQualityRecord.location,
+            WaterQualityRecord.state, WaterQualityRecord.district, WaterQualityRecord.collected_by
+        ).join(WaterQualityRecord, PredictionRecord.water_quality_id == WaterQualityRecord.id)
         
-        # Apply state filter if provided
+        # Apply state filter if provided; on the prediction's copy, so one index filters and orders the page
         if state_filter:
-            query = query.filter(WaterQualityRecord.state == state_filter)
+            query = query.filter(PredictionRecord.state == state_filter)
+        
+        total = query.count() if wants_total() else None
         
         # Order and limit
-        records = query.order_by(PredictionRecord.timestamp.desc()).limit(limit).all()
+        records, next_cursor = keyset_page(
+            query, PredictionRecord.timestamp, PredictionRecord.id, cursor, limit,
+            key=lambda row: (row.timestamp, row.id)
+        )
         
-        result = []
-        for pred, water in records:
-            result.append({
-                'id': pred.id,
-                'predicted_disease': pred.predicted_disease,
-                'health_alert': pred.health_alert,
-                'timestamp': pred.timestamp.isoformat(),
-                'water_quality': {
-                    'ph': water.ph,
-                    'turbidity': water.turbidity,
-                    'tds': water.tds,
-                    'people_affected': water.people_affected_per_5000,
-                    'location': water.location,
-                    'state': water.state,
-                    'district': water.district,
-                    'collected_by': water.collected_by
-                }
-            })
+        result = [{
+            'id': row.id,
+            'predicted_disease': row.predicted_disease,
+            'health_alert': row.health_alert,
+            'timestamp': row.timestamp.isoformat(),
+            'water_quality': {
+                'ph': row.ph,
+                'turbidity': row.turbidity,
+                'tds': row.tds,
+                'people_affected': row.people_affected_per_5000,
+                'location': row.location,
+                'state': row.state,
+                'district': row.district,
+                'collected_by': row.collected_by
+            }
+        } for row in records]
         
-        return jsonify(result)
+        return list_page_response(result, next_cursor, total)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 @app.route("/alerts", methods=["GET"])
+@response_cache.cached('predictions', ttl=5)
 def get_alerts():
-    """Get active health alerts"""
+    """Get health alerts (ACTIVE by default), newest first.
+
+    Pass the X-Next-Cursor response header back as `cursor` to get the next page.
+    """
     try:
+        limit = page_limit('limit', app.config['ALERTS_DEFAULT_LIMIT'])
+        cursor = request.args.get('cursor')
         status_filter = request.args.get('status', 'ACTIVE')
         state_filter = request.args.get('state', None)
         
-        # Build query with explicit joins
-        query = db.session.query(HealthAlert, PredictionRecord, WaterQualityRecord)\
-            .join(PredictionRecord, HealthAlert.prediction_id == PredictionRecord.id)\
+        # Only the columns the response needs, with the assigned worker joined in the
+        # same statement (an attribute access per alert would lazy-load it one by one)
+        query = db.session.query(
+            HealthAlert.id, HealthAlert.alert_level, HealthAlert.status, HealthAlert.created_at, HealthAlert.notes,
+            HealthAlert.occurrence_count, HealthAlert.last_seen_at,
+            PredictionRecord.predicted_disease, PredictionRecord.health_alert,
+            WaterQualityRecord.state, WaterQualityRecord.district, WaterQualityRecord.location,
+            *[getattr(HealthWorker, field).label(f'worker_{field}') for field in WORKER_FIELDS]
+        ).join(PredictionRecord, HealthAlert.prediction_id == PredictionRecord.id)\
             .join(WaterQualityRecord, PredictionRecord.water_quality_id == WaterQualityRecord.id)\
+            .outerjoin(HealthWorker, HealthAlert.assigned_to == HealthWorker.id)\
             .filter(HealthAlert.status == status_filter)
         
         # Apply state filter if provided
         if state_filter:
             query = query.filter(WaterQualityRecord.state == state_filter)
         
-        alerts = query.order_by(HealthAlert.created_at.desc()).all()
+        total = query.count() if wants_total() else None
         
-        result = []
-        for alert, pred, water in alerts:
-            result.append({
-                'id': alert.id,
-                'alert_level': alert.alert_level,
-                'status': alert.status,
-                'created_at': alert.created_at.isoformat(),
-                'notes': alert.notes,
-                'prediction': {
-                    'disease': pred.predicted_disease,
-                    'health_alert': pred.health_alert
-                },
-                'location': {
-                    'state': water.state,
-                    'district': water.district,
-                    'location': water.location
-                },
-                'assigned_worker': alert.assigned_worker.to_dict() if alert.assigned_worker else None
-            })
+        alerts, next_cursor = keyset_page(
+            query, HealthAlert.created_at, HealthAlert.id, cursor, limit,
+            key=lambda row: (row.created_at, row.id)
+        )
         
-        return jsonify(result)
+        result = [{
+            'id': row.id,
+            'alert_level': row.alert_level,
+            'status': row.status,
+            'created_at': row.created_at.isoformat(),
+            'notes': row.notes,
+            'occurrence_count': row.occurrence_count,
+            'last_seen_at': row.last_seen_at.isoformat() if row.last_seen_at else None,
+            'prediction': {
+                'disease': row.predicted_disease,
+                'health_alert': row.health_alert
+            },
+            'location': {
+                'state': row.state,
+                'district': row.district,
+                'location': row.location
+            },
+            'assigned_worker': worker_from_row(row)
+        } for row in alerts]
+        
+        return list_page_response(result, next_cursor, total)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@app.route("/alerts/stream", methods=["GET"])
+def stream_alerts():
+    """Server-sent events: `alert.created` and `alert.updated`, each carrying the alert as an /alerts item.
+
+    Optional `state` and `district` filters. An EventSource reconnecting with
+    Last-Event-ID (or `?last_event_id=`) first gets the events it missed, or
+    an `event: reset` when it should refetch /alerts instead. 503 with
+    Retry-After when ALERT_STREAM_ENABLED is off (sync workers): poll /alerts.
+    """
+    if not app.config['ALERT_STREAM_ENABLED']:
+        return jsonify({"error": "Alert stream is off on this server, poll /alerts"}), 503, \
+            {'Retry-After': str(UNAVAILABLE_RETRY_AFTER)}
+    try:
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID must be an event id"}), 400
+
+    subscriber = alert_bus.subscribe(request.args.get('state') or None, request.args.get('district') or None)
+    if subscriber is None:
+        return jsonify({"error": "Too many open alert streams, retry later"}), 503
+    try:
+        frames = alert_bus.replay(subscriber, last_event_id) if last_event_id is not None else []
+    except Exception as e:
+        alert_bus.unsubscribe(subscriber)
+        return jsonify({"error": str(e)}), 400
+    # Everything read from the database is read by now: the body runs without the
+    # request context, so an idle stream holds no session or connection
+    db.session.remove()
+    return Response(alert_bus.stream(subscriber, frames), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route("/outbreaks", methods=["GET"])
+def get_outbreaks():
+    """Get outbreak cluster alerts raised by outbreaks.py (ACTIVE by default), newest first.
+
+    Pass the X-Next-Cursor response header back as `cursor` to get the next page.
+    """
+    try:
+        limit = page_limit('limit', app.config['ALERTS_DEFAULT_LIMIT'])
+        cursor = request.args.get('cursor')
+        query = OutbreakAlert.query.filter(OutbreakAlert.status == request.args.get('status', 'ACTIVE'))
+        
+        state_filter = request.args.get('state', None)
+        if state_filter:
+            query = query.filter(OutbreakAlert.state == state_filter)
+        
+        total = query.count() if wants_total() else None
+        
+        outbreaks, next_cursor = keyset_page(
+            query, OutbreakAlert.created_at, OutbreakAlert.id, cursor, limit,
+            key=lambda outbreak: (outbreak.created_at, outbreak.id)
+        )
+        return list_page_response([outbreak.to_dict() for outbreak in outbreaks], next_cursor, total)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/alerts/<int:alert_id>", methods=["PUT"])
+def update_alert(alert_id):
+    """Update an alert's status, notes or assignee, and record the confirmed outcome.
+
+    `confirmed_disease` on a RESOLVED alert ('None' for a false alarm) is the
+    label the retraining pipeline learns from.
+    """
+    try:
+        data = request.get_json() or {}
+        alert = db.session.get(HealthAlert, alert_id)
+        if alert is None:
+            return jsonify({"error": "Alert not found"}), 404
+        # Before any change: the lazy loads would autoflush it outside the write lock
+        prediction = alert.prediction
+        water_record = prediction.water_quality
+        
+        if 'status' in data:
+            if data['status'] not in ALERT_STATUSES:
+                return jsonify({"error": f"Invalid status: expected one of {', '.join(ALERT_STATUSES)}"}), 400
+            alert.status = data['status']
+        if 'confirmed_disease' in data:
+            disease = data['confirmed_disease']
+            if disease is not None and (not isinstance(disease, str) or not disease.strip() or len(disease) > 100):
+                return jsonify({"error": "confirmed_disease must be a disease name or 'None'"}), 400
+            alert.confirmed_disease = disease.strip() if disease else None
+        if 'notes' in data:
+            alert.notes = data['notes']
+        if 'assigned_to' in data:
+            alert.assigned_to = data['assigned_to']
+        
+        with sqlite_writer.lock():
+            record_alert_events([('alert.updated', alert, prediction, water_record)])
+            db.session.commit()
+        response_cache.invalidate('predictions', [water_record.state])
+        alert_bus.notify()
+        return jsonify(alert.to_dict())
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+
 @app.route("/statistics/<state>", methods=["GET"])
+@response_cache.cached('predictions', ttl=30)
 def get_state_statistics(state):
     """Get health statistics for a state"""
     try:
-        # Count of records by disease type
+        # Count of records by disease type, read from the daily rollups
+        record_count = func.sum(PredictionRollup.record_count)
         stats = db.session.query(
-            PredictionRecord.predicted_disease,
-            func.count(PredictionRecord.id).label('count'),
-            func.avg(WaterQualityRecord.ph).label('avg_ph'),
-            func.avg(WaterQualityRecord.turbidity).label('avg_turbidity'),
-            func.avg(WaterQualityRecord.tds).label('avg_tds')
-        ).join(WaterQualityRecord)\
-         .filter(WaterQualityRecord.state == state)\
-         .group_by(PredictionRecord.predicted_disease)\
+            PredictionRollup.predicted_disease,
+            record_count.label('count'),
+            (func.sum(PredictionRollup.ph_sum) / record_count).label('avg_ph'),
+            (func.sum(PredictionRollup.turbidity_sum) / record_count).label('avg_turbidity'),
+            (func.sum(PredictionRollup.tds_sum) / record_count).label('avg_tds')
+        ).filter(PredictionRollup.state == state)\
+         .group_by(PredictionRollup.predicted_disease)\
+         .having(record_count > 0)\
          .all()
         
         result = []
@@ -276,6 +631,7 @@ def get_state_statistics(state):
         return jsonify({"error": str(e)}), 400
 
 @app.route("/workers", methods=["GET"])
+@response_cache.cached('workers', ttl=60)
 def get_health_workers():
     """Get all health workers"""
     try:
@@ -294,51 +650,60 @@ def get_health_workers():
         return jsonify({"error": str(e)}), 400
 
 @app.route("/dashboard", methods=["GET"])
+@response_cache.cached('predictions')
 def get_dashboard_data():
     """Get comprehensive dashboard data"""
     try:
-        # Summary statistics
-        total_records = PredictionRecord.query.count()
-        active_alerts = HealthAlert.query.filter(HealthAlert.status == 'ACTIVE').count()
-        total_workers = HealthWorker.query.filter(HealthWorker.is_active == True).count()
-        
-        # Disease breakdown
-        disease_stats = db.session.query(
-            PredictionRecord.predicted_disease,
-            func.count(PredictionRecord.id).label('count')
-        ).group_by(PredictionRecord.predicted_disease).all()
+        # Summary statistics - one round trip
+        summary = db.session.query(
+            db.session.query(func.coalesce(func.sum(PredictionRollup.record_count), 0)).scalar_subquery().label('total_records'),
+            db.session.query(func.count(HealthAlert.id))
+                .filter(HealthAlert.status == 'ACTIVE').scalar_subquery().label('active_alerts'),
+            db.session.query(func.count(HealthWorker.id))
+                .filter(HealthWorker.is_active == True).scalar_subquery().label('total_workers')
+        ).one()
         
-        # State-wise breakdown - simplified query
-        state_stats = db.session.query(
-            WaterQualityRecord.state,
-            func.count(PredictionRecord.id).label('total_predictions')
-        ).join(PredictionRecord)\
-         .group_by(WaterQualityRecord.state)\
+        # Disease, state and district breakdowns all come from one grouped rollup query
+        grouped_stats = db.session.query(
+            PredictionRollup.state,
+            PredictionRollup.district,
+            PredictionRollup.predicted_disease,
+            func.sum(PredictionRollup.record_count).label('count')
+        ).group_by(PredictionRollup.state, PredictionRollup.district, PredictionRollup.predicted_disease)\
+         .having(func.sum(PredictionRollup.record_count) > 0)\
          .all()
         
-        # Calculate disease predictions separately for each state
-        state_breakdown = []
-        for state_stat in state_stats:
-            disease_count = db.session.query(func.count(PredictionRecord.id))\
-                .join(WaterQualityRecord)\
-                .filter(WaterQualityRecord.state == state_stat.state)\
-                .filter(PredictionRecord.predicted_disease != 'None')\
-                .scalar()
-            
-            state_breakdown.append({
-                'state': state_stat.state,
-                'total_predictions': state_stat.total_predictions,
-                'disease_predictions': disease_count or 0
-            })
+        disease_totals = {}
+        state_totals = {}
+        district_totals = {}
+        for row in grouped_stats:
+            # Rollups store missing locations as ''
+            row_state, row_district = row.state or None, row.district or None
+            disease_count = row.count if row.predicted_disease != 'None' else 0
+            disease_totals[row.predicted_disease] = disease_totals.get(row.predicted_disease, 0) + row.count
+            for totals, key in ((state_totals, row_state), (district_totals, (row_state, row_district))):
+                entry = totals.setdefault(key, {'total_predictions': 0, 'disease_predictions': 0})
+                entry['total_predictions'] += row.count
+                entry['disease_predictions'] += disease_count
+        
+        state_breakdown = [
+            {'state': state, **totals}
+            for state, totals in sorted(state_totals.items(), key=lambda item: item[0] or '')
+        ]
+        district_breakdown = [
+            {'state': state, 'district': district, **totals}
+            for (state, district), totals in sorted(district_totals.items(), key=lambda item: (item[0][0] or '', item[0][1] or ''))
+        ]
         
         return jsonify({
             'summary': {
-                'total_records': total_records,
-                'active_alerts': active_alerts,
-                'total_workers': total_workers
+                'total_records': summary.total_records,
+                'active_alerts': summary.active_alerts,
+                'total_workers': summary.total_workers
             },
-            'disease_breakdown': [{'disease': d.predicted_disease, 'count': d.count} for d in disease_stats],
-            'state_breakdown': state_breakdown
+            'disease_breakdown': [{'disease': disease, 'count': count} for disease, count in disease_totals.items()],
+            'state_breakdown': state_breakdown,
+            'district_breakdown': district_breakdown
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -363,11 +728,16 @@ def submit_health_metrics():
             state=data.get('state'),
             district=data.get('district'),
             recorded_by=data.get('recorded_by'),
-            notes=data.get('notes')
+            notes=data.get('notes'),
+            symptom=data.get('symptom') or extract_symptom(data.get('notes'))
         )
         
-        db.session.add(health_record)
-        db.session.commit()
+        with sqlite_writer.lock():
+            db.session.add(health_record)
+            db.session.flush()
+            update_health_metrics_rollups([health_record])
+            db.session.commit()
+        response_cache.invalidate('health_metrics', [health_record.state])
         
         return jsonify({
             'success': True,
@@ -379,12 +749,68 @@ def submit_health_metrics():
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
 
+@app.route('/health-metrics/bulk', methods=['POST'])
+def submit_health_metrics_bulk():
+    """Submit many health metrics records at once (offline device sync).
+
+    Accepts a JSON array, {"records": [...]} or NDJSON. Every record gets a
+    result with its status: 'created', 'duplicate' (its client_uuid is
+    already stored, or repeated earlier in the upload) or 'invalid'.
+    Invalid records do not fail the rest of the upload.
+    """
+    try:
+        records, errors = parse_body(request.get_data(), request.mimetype)
+
+        max_size = app.config['HEALTH_METRICS_BULK_MAX_SIZE']
+        if len(records) > max_size:
+            return jsonify({"error": f"Upload too large: {len(records)} records (max {max_size})"}), 413
+
+        rows = validate_records(records, errors)
+        first_rows = {}
+        for row in rows:
+            if row is not None:
+                first_rows.setdefault(row['client_uuid'], row)
+        saved = save_health_metrics_bulk(list(first_rows.values()))
+
+        results = []
+        counts = {'created': 0, 'duplicate': 0, 'invalid': 0}
+        for index, row in enumerate(rows):
+            if row is None:
+                result = {'index': index, 'status': 'invalid', 'error': errors[index]}
+            else:
+                record_id, created = saved[row['client_uuid']]
+                created = created and first_rows[row['client_uuid']] is row
+                result = {
+                    'index': index,
+                    'status': 'created' if created else 'duplicate',
+                    'record_id': record_id,
+                    'client_uuid': row['client_uuid']
+                }
+            counts[result['status']] += 1
+            results.append(result)
+
+        return jsonify({
+            'results': results,
+            'total': len(records),
+            'created': counts['created'],
+            'duplicates': counts['duplicate'],
+            'failed': counts['invalid']
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
 @app.route('/health-metrics', methods=['GET'])
 def get_health_metrics():
-    """Get all health metrics records"""
+    """Get health metrics records, newest first.
+
+    Uses cursor pagination (`cursor` / `next_cursor`). The legacy `page`
+    parameter still works but costs an OFFSET scan plus a COUNT per page.
+    """
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
+        page = request.args.get('page', type=int)
+        per_page = page_limit('per_page', 50)
+        cursor = request.args.get('cursor')
         state = request.args.get('state')
         district = request.args.get('district')
         
@@ -395,101 +821,186 @@ def get_health_metrics():
         if district:
             query = query.filter(HealthMetricsRecord.district == district)
             
-        records = query.order_by(HealthMetricsRecord.timestamp.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
+        if page is not None:
+            records = query.order_by(HealthMetricsRecord.timestamp.desc()).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
+            
+            return jsonify({
+                'records': [record.to_dict() for record in records.items],
+                'total': records.total,
+                'pages': records.pages,
+                'current_page': page
+            })
+        
+        result = {}
+        if wants_total():
+            result['total'] = query.count()
+        
+        records, next_cursor = keyset_page(
+            query, HealthMetricsRecord.timestamp, HealthMetricsRecord.id, cursor, per_page,
+            key=lambda record: (record.timestamp, record.id)
         )
         
-        return jsonify({
-            'records': [record.to_dict() for record in records.items],
-            'total': records.total,
-            'pages': records.pages,
-            'current_page': page
-        })
+        result['records'] = [record.to_dict() for record in records]
+        result['next_cursor'] = next_cursor
+        result['per_page'] = per_page
+        return jsonify(result)
         
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+VITALS_PERCENTILES = (('p50', 0.5), ('p95', 0.95))
+STATS_GROUPINGS = ('district', 'day')
+
+def percentile_column(column, fraction):
+    """Continuous percentile aggregate (SQLite gets it from database.register_sqlite_functions)"""
+    if db.engine.dialect.name == 'postgresql':
+        return func.percentile_cont(fraction).within_group(column)
+    return func.percentile_cont(column, fraction)
+
+def vitals_stats_columns():
+    """Aggregate columns for the vitals summary, all computed in one scan"""
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    columns = [
+        func.count(HealthMetricsRecord.id).label('total_records'),
+        func.count(HealthMetricsRecord.id).filter(HealthMetricsRecord.timestamp >= week_ago).label('recent_records')
+    ]
+    for vital in ROLLUP_VITALS:
+        column = getattr(HealthMetricsRecord, vital)
+        columns += [
+            func.count(column).label(f'{vital}_count'),
+            func.avg(column).label(f'{vital}_avg'),
+            func.min(column).label(f'{vital}_min'),
+            func.max(column).label(f'{vital}_max')
+        ]
+        columns += [percentile_column(column, fraction).label(f'{vital}_{name}') for name, fraction in VITALS_PERCENTILES]
+    return columns
+
+def vitals_stats_dict(row):
+    """Shape one aggregate row into the /health-metrics/stats response"""
+    def rounded(value):
+        return round(float(value), 1) if value is not None else None
+    
+    return {
+        'total_records': row.total_records,
+        'recent_records': row.recent_records,
+        'average_metrics': {
+            vital: rounded(getattr(row, f'{vital}_avg')) or 0 for vital in ROLLUP_VITALS
+        },
+        'metrics': {
+            vital: {
+                'count': getattr(row, f'{vital}_count'),
+                **{stat: rounded(getattr(row, f'{vital}_{stat}')) for stat in ('avg', 'min', 'max', 'p50', 'p95')}
+            }
+            for vital in ROLLUP_VITALS
+        }
+    }
+
 @app.route('/health-metrics/stats', methods=['GET'])
+@response_cache.cached('health_metrics', ttl=30)
 def get_health_metrics_stats():
-    """Get health metrics statistics"""
+    """Get health metrics statistics in a single scan.
+
+    Filters: state, district, start, end. Optional group_by=district|day
+    returns one entry per group instead of the overall summary.
+    """
     try:
-        state = request.args.get('state')
-        
-        query = HealthMetricsRecord.query
-        if state:
-            query = query.filter(HealthMetricsRecord.state == state)
-            
-        total_records = query.count()
+        group_by = request.args.get('group_by')
+        if group_by and group_by not in STATS_GROUPINGS:
+            return jsonify({"error": f"Unsupported group_by: {group_by} (use district or day)"}), 400
         
-        # Average metrics
-        avg_temp = db.session.query(func.avg(HealthMetricsRecord.temperature)).filter(
-            HealthMetricsRecord.temperature.isnot(None)
-        ).scalar() or 0
+        filters = location_time_filters(HealthMetricsRecord.state, HealthMetricsRecord.district, HealthMetricsRecord.timestamp)
+        columns = vitals_stats_columns()
         
-        avg_systolic = db.session.query(func.avg(HealthMetricsRecord.systolic_bp)).filter(
-            HealthMetricsRecord.systolic_bp.isnot(None)
-        ).scalar() or 0
+        if not group_by:
+            row = db.session.query(*columns).filter(*filters).one()
+            return jsonify(vitals_stats_dict(row))
         
-        avg_diastolic = db.session.query(func.avg(HealthMetricsRecord.diastolic_bp)).filter(
-            HealthMetricsRecord.diastolic_bp.isnot(None)
-        ).scalar() or 0
+        group_column = HealthMetricsRecord.district if group_by == 'district' else func.date(HealthMetricsRecord.timestamp)
+        rows = db.session.query(group_column.label('group_key'), *columns)\
+            .filter(*filters)\
+            .group_by(group_column)\
+            .order_by(group_column)\
+            .all()
         
-        avg_oxygen = db.session.query(func.avg(HealthMetricsRecord.blood_oxygen)).filter(
-            HealthMetricsRecord.blood_oxygen.isnot(None)
-        ).scalar() or 0
-        
-        # Recent records (last 7 days)
-        from datetime import datetime, timedelta
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        recent_records = query.filter(HealthMetricsRecord.timestamp >= week_ago).count()
+        groups = []
+        for row in rows:
+            key = row.group_key.isoformat() if hasattr(row.group_key, 'isoformat') else row.group_key
+            groups.append({group_by: key, **vitals_stats_dict(row)})
         
         return jsonify({
-            'total_records': total_records,
-            'recent_records': recent_records,
-            'average_metrics': {
-                'temperature': round(avg_temp, 1),
-                'systolic_bp': round(avg_systolic, 1),
-                'diastolic_bp': round(avg_diastolic, 1),
-                'blood_oxygen': round(avg_oxygen, 1)
-            }
+            'group_by': group_by,
+            'groups': groups
         })
         
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+def symptom_counts(by_day=False, since=None):
+    """Count symptom reports with one GROUP BY, honoring state/district/start/end.
+
+    Returns (symptom, count) rows, or (symptom, day, count) rows when `by_day`.
+    """
+    group_columns = [HealthMetricsRecord.symptom]
+    if by_day:
+        group_columns.append(func.date(HealthMetricsRecord.timestamp).label('day'))
+    
+    filters = location_time_filters(HealthMetricsRecord.state, HealthMetricsRecord.district, HealthMetricsRecord.timestamp)
+    if since:
+        filters.append(HealthMetricsRecord.timestamp >= since)
+    return db.session.query(*group_columns, func.count().label('count'))\
+        .filter(HealthMetricsRecord.symptom.isnot(None), *filters)\
+        .group_by(*group_columns)\
+        .all()
+
 @app.route('/health-metrics/symptom-stats', methods=['GET'])
+@response_cache.cached('health_metrics', ttl=30)
 def get_symptom_statistics():
-    """Get symptom statistics from health metrics"""
+    """Get symptom statistics from health metrics (filters: state, district, start, end)"""
     try:
-        state = request.args.get('state')
+        symptom_stats = [
+            {'symptom': row.symptom, 'count': row.count}
+            for row in sorted(symptom_counts(), key=lambda row: row.count, reverse=True)
+        ]
         
-        query = HealthMetricsRecord.query
-        if state:
-            query = query.filter(HealthMetricsRecord.state == state)
+        return jsonify({
+            'symptom_statistics': symptom_stats,
+            'total_symptom_records': sum(stat['count'] for stat in symptom_stats)
+        })
         
-        # Get all records with notes (symptoms)
-        records_with_notes = query.filter(HealthMetricsRecord.notes.isnot(None)).all()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/health-metrics/symptom-trends', methods=['GET'])
+def get_symptom_trends():
+    """Get daily symptom counts for the last N days (filters: state, district, days, limit)"""
+    try:
+        days = request.args.get('days', 14, type=int)
+        limit = request.args.get('limit', 10, type=int)
         
-        # Count symptoms
-        symptom_counts = {}
-        for record in records_with_notes:
-            if record.notes and record.notes.startswith('Symptom: '):
-                symptom = record.notes.replace('Symptom: ', '').strip()
-                if symptom:
-                    symptom_counts[symptom] = symptom_counts.get(symptom, 0) + 1
+        first_day = datetime.utcnow().date() - timedelta(days=days - 1)
         
-        # Sort by count (descending)
-        sorted_symptoms = sorted(symptom_counts.items(), key=lambda x: x[1], reverse=True)
+        daily = {}
+        for row in symptom_counts(by_day=True, since=datetime.combine(first_day, datetime.min.time())):
+            day = row.day.isoformat() if hasattr(row.day, 'isoformat') else row.day
+            daily.setdefault(row.symptom, {})[day] = row.count
         
-        # Convert to list of objects
-        symptom_stats = [
-            {'symptom': symptom, 'count': count} 
-            for symptom, count in sorted_symptoms
+        window = [(first_day + timedelta(days=offset)).isoformat() for offset in range(days)]
+        trends = [
+            {
+                'symptom': symptom,
+                'total': sum(counts.values()),
+                'daily': [{'date': day, 'count': counts.get(day, 0)} for day in window]
+            }
+            for symptom, counts in daily.items()
         ]
+        trends.sort(key=lambda trend: trend['total'], reverse=True)
         
         return jsonify({
-            'symptom_statistics': symptom_stats,
-            'total_symptom_records': sum(symptom_counts.values())
+            'days': days,
+            'start_date': window[0] if window else None,
+            'trends': trends[:limit]
         })
         
     except Exception as e:
@@ -504,8 +1015,12 @@ def delete_health_metrics_record(record_id):
         if not record:
             return jsonify({"error": "Record not found"}), 404
         
-        db.session.delete(record)
-        db.session.commit()
+        with sqlite_writer.lock():
+            update_health_metrics_rollups([record], sign=-1)
+            state = record.state
+            db.session.delete(record)
+            db.session.commit()
+        response_cache.invalidate('health_metrics', [state])
         
         return jsonify({
             'success': True,
@@ -516,6 +1031,244 @@ def delete_health_metrics_record(record_id):
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
 
+# Time series endpoints, read from the hourly and daily rollups
+TIMESERIES_BUCKETS = {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1)}
+# Range covered when no start is given
+TIMESERIES_DEFAULT_SPANS = {'hour': timedelta(days=2), 'day': timedelta(days=90), 'week': timedelta(days=365)}
+
+def timeseries_range():
+    """(bucket, requested bucket, start, end) from the bucket, start and end query parameters.
+
+    A range that would take more than TIMESERIES_MAX_POINTS buckets is
+    downsampled to the next coarser bucket (hour, then day, then week).
+    """
+    requested = request.args.get('bucket', 'day')
+    if requested not in TIMESERIES_BUCKETS:
+        raise ValueError(f"Unsupported bucket: {requested} (use hour, day or week)")
+    end = parse_time_arg('end') or datetime.utcnow()
+    start = parse_time_arg('start') or end - TIMESERIES_DEFAULT_SPANS[requested]
+    if start >= end:
+        raise ValueError("'start' must be before 'end'")
+
+    bucket = requested
+    coarser = list(TIMESERIES_BUCKETS)
+    while bucket != 'week' and (end - start) / TIMESERIES_BUCKETS[bucket] > app.config['TIMESERIES_MAX_POINTS']:
+        bucket = coarser[coarser.index(bucket) + 1]
+    return bucket, requested, start, end
+
+def week_start(day_column):
+    """The Monday of a date column's week"""
+    if db.engine.dialect.name == 'postgresql':
+        return cast(func.date_trunc('week', day_column), Date)
+    return type_coerce(func.date(day_column, 'weekday 0', '-6 days'), Date)
+
+def timeseries_response(hourly_model, daily_model, names, counted):
+    """Bucket the rollups into one entry per bucket with data, for every whole bucket overlapping [start, end).
+
+    `names` are the rollup value prefixes; `counted` when each has its own
+    `<name>_count` column (a vital may be missing from a record), otherwise
+    every row has them all and `record_count` counts them.
+    """
+    bucket, requested, start, end = timeseries_range()
+    if bucket == 'hour':
+        model = hourly_model
+        key = model.hour
+        filters = [key >= start.replace(minute=0, second=0, microsecond=0), key < end]
+    else:
+        model = daily_model
+        first_day, last_day = start.date(), (end - timedelta(microseconds=1)).date()
+        key = model.day
+        if bucket == 'week':
+            first_day -= timedelta(days=first_day.weekday())
+            last_day += timedelta(days=6 - last_day.weekday())
+            key = week_start(model.day)
+        filters = [model.day >= first_day, model.day <= last_day]
+
+    state = request.args.get('state')
+    district = request.args.get('district')
+    if state:
+        filters.append(model.state == state)
+    if district:
+        filters.append(model.district == district)
+
+    record_count = func.sum(model.record_count)
+    columns = [key.label('bucket'), record_count.label('record_count')]
+    for name in names:
+        columns += [
+            (func.sum(getattr(model, f'{name}_count')) if counted else record_count).label(f'{name}_count'),
+            func.sum(getattr(model, f'{name}_sum')).label(f'{name}_sum'),
+            func.min(getattr(model, f'{name}_min')).label(f'{name}_min'),
+            func.max(getattr(model, f'{name}_max')).label(f'{name}_max')
+        ]
+    rows = db.session.query(*columns).filter(*filters)\
+        .group_by(key)\
+        .having(record_count > 0)\
+        .order_by(key)\
+        .all()
+
+    def stats(values, name):
+        count = values[f'{name}_count']
+        return {
+            'count': count,
+            'mean': round(values[f'{name}_sum'] / count, 2) if count else None,
+            'min': values[f'{name}_min'],
+            'max': values[f'{name}_max']
+        }
+
+    return jsonify({
+        'bucket': bucket,
+        'requested_bucket': requested,
+        'downsampled': bucket != requested,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'state': state,
+        'district': district,
+        # One dict per row: looking columns up by name on a Row is slow
+        'series': [
+            {'time': values['bucket'].isoformat(), 'count': values['record_count'], **{name: stats(values, name) for name in names}}
+            for values in (row._asdict() for row in rows)
+        ]
+    })
+
+@app.route("/timeseries/water-quality", methods=["GET"])
+@response_cache.cached('predictions', ttl=30)
+def get_water_quality_timeseries():
+    """Water quality trend: count, mean, min and max of ph, turbidity and tds per bucket.
+
+    Parameters: bucket=hour|day|week (default day), start, end (ISO 8601,
+    default the last 2/90/365 days), state, district. Long ranges are
+    downsampled to a coarser bucket; the response names the one used.
+    """
+    try:
+        return timeseries_response(WaterQualityHourlyRollup, PredictionRollup, WATER_QUALITY_VALUES, counted=False)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/timeseries/vitals", methods=["GET"])
+@response_cache.cached('health_metrics', ttl=30)
+def get_vitals_timeseries():
+    """Vitals trend: count, mean, min and max of temperature, blood pressure and blood oxygen per bucket.
+
+    Same parameters as /timeseries/water-quality.
+    """
+    try:
+        return timeseries_response(HealthMetricsHourlyRollup, HealthMetricsRollup, ROLLUP_VITALS, counted=True)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/cache/stats", methods=["GET"])
+def get_cache_stats():
+    """Response cache and prediction cache hit/miss counters"""
+    return jsonify({
+        **response_cache.stats(),
+        'predictions': prediction_cache.stats()
+    })
+
+@app.route("/predict/queue", methods=["GET"])
+def get_prediction_queue():
+    """Write-behind queue state and SQLite write lock waits of this worker"""
+    return jsonify({
+        **prediction_writer.stats(),
+        'sqlite_writer': sqlite_writer.stats()
+    })
+
+@app.route("/model", methods=["GET"])
+def get_model_status():
+    """Served model version, registry versions and shadow model comparison"""
+    try:
+        return jsonify(model_status())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Export Endpoints
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+def stream_export(statement, filename):
+    """Stream the rows of a Core select as NDJSON or CSV.
+
+    Rows are pulled from a server-side cursor in chunks and written out as
+    they arrive, so memory use does not depend on the number of rows.
+    """
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format: {export_format} (use ndjson or csv)"}), 400
+    
+    chunk_size = app.config['EXPORT_CHUNK_SIZE']
+    columns = [column.name for column in statement.selected_columns]
+    
+    def serialize(value):
+        return value.isoformat() if isinstance(value, datetime) else value
+    
+    def generate():
+        result = db.session.execute(statement.execution_options(yield_per=chunk_size))
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if export_format == 'csv' else None
+        if writer:
+            writer.writerow(columns)
+        
+        for rows in result.partitions():
+            for row in rows:
+                values = [serialize(value) for value in row]
+                if writer:
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(columns, values))))
+                    buffer.write('\n')
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        
+        yield buffer.getvalue()
+        result.close()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}.{export_format}'}
+    )
+
+@app.route("/export/records", methods=["GET"])
+def export_records():
+    """Stream the full prediction history (optionally filtered by state, district, start, end)"""
+    try:
+        statement = select(
+            PredictionRecord.id,
+            PredictionRecord.timestamp,
+            PredictionRecord.predicted_disease,
+            PredictionRecord.health_alert,
+            PredictionRecord.confidence_score,
+            PredictionRecord.model_version,
+            WaterQualityRecord.ph,
+            WaterQualityRecord.turbidity,
+            WaterQualityRecord.tds,
+            WaterQualityRecord.people_affected_per_5000,
+            WaterQualityRecord.location,
+            WaterQualityRecord.state,
+            WaterQualityRecord.district,
+            WaterQualityRecord.collected_by
+        ).join(WaterQualityRecord, PredictionRecord.water_quality_id == WaterQualityRecord.id)\
+         .where(*location_time_filters(WaterQualityRecord.state, WaterQualityRecord.district, PredictionRecord.timestamp))\
+         .order_by(PredictionRecord.id)
+        
+        return stream_export(statement, 'prediction_records')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/export/health-metrics", methods=["GET"])
+def export_health_metrics():
+    """Stream the full health metrics history (optionally filtered by state, district, start, end)"""
+    try:
+        statement = select(*HealthMetricsRecord.__table__.columns)\
+            .where(*location_time_filters(HealthMetricsRecord.state, HealthMetricsRecord.district, HealthMetricsRecord.timestamp))\
+            .order_by(HealthMetricsRecord.id)
+        
+        return stream_export(statement, 'health_metrics_records')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
 if __name__ == "__main__":
     host = os.getenv('HOST', '0.0.0.0')
     port = int(os.getenv('PORT', 5000))
@@ -0,0 +1,81 @@
+"""Benchmark: alert deduplication at write time.
+
+Seeds --existing open alerts spread over 2000 wells, then replays a sensor
+on one well sending --readings POST /predict calls, once with alert
+deduplication off (ALERT_DEDUP_WINDOW_HOURS=0) and once with the default
+window. Reported: alert rows added and /predict median and p99 latency.
+
+    python bench/alert_dedup.py [--existing 200000] [--readings 1000]
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from common import load_app, make_samples
+
+def seed(db, alerts):
+    from database import WaterQualityRecord, PredictionRecord, HealthAlert, alert_dedup_key
+
+    start = datetime.utcnow() - timedelta(hours=12)
+    for offset in range(0, alerts, 10000):
+        ids = range(offset + 1, min(offset + 10000, alerts) + 1)
+        db.session.execute(WaterQualityRecord.__table__.insert(), [
+            {'id': index, 'ph': 6.5, 'turbidity': 5.0, 'tds': 800, 'people_affected_per_5000': 300,
+             'location': f'Well {index % 2000}', 'state': 'Assam', 'district': 'Bench',
+             'collected_by': 'BENCH', 'timestamp': start}
+            for index in ids
+        ])
+        db.session.execute(PredictionRecord.__table__.insert(), [
+            {'id': index, 'water_quality_id': index, 'predicted_disease': 'Cholera',
+             'health_alert': 'High risk of Cholera', 'timestamp': start}
+            for index in ids
+        ])
+        # Written before deduplication: one alert per reading
+        db.session.execute(HealthAlert.__table__.insert(), [
+            {'id': index, 'prediction_id': index, 'alert_level': 'HIGH', 'status': 'ACTIVE',
+             'dedup_key': alert_dedup_key('Assam', 'Bench', f'Well {index % 2000}', 'Cholera'),
+             'occurrence_count': 1, 'created_at': start, 'last_seen_at': start}
+            for index in ids
+        ])
+    db.session.commit()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--existing', type=int, default=200000)
+    parser.add_argument('--readings', type=int, default=1000)
+    args = parser.parse_args()
+
+    app = load_app(prefix="dht-dedup-")
+    import database
+    from database import db, HealthAlert
+
+    with app.app_context():
+        seed(db, args.existing)
+    client = app.test_client()
+    default_window = database.ALERT_DEDUP_WINDOW
+
+    print(f"{args.existing} existing alerts, {args.readings} readings from one well")
+    for label, window in (('off', timedelta(0)), ('on', default_window)):
+        database.ALERT_DEDUP_WINDOW = window
+        readings = make_samples(args.readings, seed=11, states=['Assam'])
+        for reading in readings:
+            reading['location'] = f'Sensor well {label}'
+        with app.app_context():
+            before = db.session.query(HealthAlert.id).count()
+
+        timings, diseases = [], 0
+        for reading in readings:
+            start = time.perf_counter()
+            response = client.post('/predict', json=reading)
+            timings.append(time.perf_counter() - start)
+            diseases += response.get_json()['predicted_disease'] != 'None'
+
+        with app.app_context():
+            added = db.session.query(HealthAlert.id).count() - before
+        timings.sort()
+        print(f"dedup {label:3}: {diseases} disease predictions -> {added:>5} alert rows  "
+              f"/predict p50 {statistics.median(timings) * 1000:5.1f}ms p99 {timings[int(len(timings) * 0.99)] * 1000:5.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Benchmark and check: /alerts/stream fan-out on one gevent worker.
+
+Starts Gunicorn with one gevent worker (gunicorn.conf.py) on a temporary
+database and opens --clients idle event streams, half of them filtered to
+state=Assam. Then:
+
+  1. reports the worker's memory per open stream, and its CPU time over
+     --idle seconds with every stream open and no alerts (the pump's polls)
+  2. POSTs an Assam and a Manipur reading that raise alerts, and reports how
+     long every stream took to receive each event after /predict returned;
+     fails if a stream misses an event it should get or gets one it should not
+  3. fails if the streamed alert differs from the same alert on /alerts
+  4. reconnects one stream with Last-Event-ID after an alert it missed, and
+     fails unless the alert is replayed
+
+    python bench/alert_stream.py [--clients 2000] [--idle 10] [--database-url URL]
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import resource
+import selectors
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import BACKEND_DIR
+
+EVENT = re.compile(r'id: (\d+)\nevent: (\S+)\ndata: (.*)\n\n')
+READING = {'ph': 6.0, 'turbidity': 30, 'tds': 1500, 'people_affected_per_5000': 800,
+           'location': 'Bench well', 'district': 'Bench'}
+
+def request(port, method, path, body=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    connection.request(method, path, body=json.dumps(body) if body else None,
+                       headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    return response.status, response.read()
+
+def open_stream(port, path, headers=''):
+    sock = socket.create_connection(('127.0.0.1', port))
+    sock.sendall(f"GET {path} HTTP/1.0\r\nHost: bench\r\nAccept: text/event-stream\r\n{headers}\r\n".encode())
+    sock.setblocking(False)
+    return sock
+
+def worker_pid(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as children:
+        return int(children.read().split()[0])
+
+def rss_mb(pid):
+    with open(f'/proc/{pid}/status') as status:
+        return int(re.search(r'VmRSS:\s+(\d+)', status.read()).group(1)) / 1024
+
+def cpu_seconds(pid):
+    with open(f'/proc/{pid}/stat') as stat:
+        fields = stat.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+class Streams:
+    """Open streams read through one selector; events parsed as they arrive"""
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.buffers = {}
+        self.opened = set()  # streams that sent their first bytes
+        self.events = {}  # sock -> [(id, event, data, received at)]
+
+    def add(self, sock):
+        self.buffers[sock] = ''
+        self.events[sock] = []
+        self.selector.register(sock, selectors.EVENT_READ)
+
+    def read(self, timeout):
+        for key, _ in self.selector.select(timeout):
+            chunk = key.fileobj.recv(65536).decode()
+            if not chunk:
+                self.selector.unregister(key.fileobj)
+                continue
+            self.opened.add(key.fileobj)
+            buffer = self.buffers[key.fileobj] + chunk
+            now = time.perf_counter()
+            for match in EVENT.finditer(buffer):
+                self.events[key.fileobj].append((int(match.group(1)), match.group(2), match.group(3), now))
+            self.buffers[key.fileobj] = buffer[buffer.rfind('\n\n') + 2:] if '\n\n' in buffer else buffer
+
+    def wait(self, done, timeout):
+        deadline = time.monotonic() + timeout
+        while not done() and time.monotonic() < deadline:
+            self.read(0.1)
+        return done()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=2000)
+    parser.add_argument('--idle', type=float, default=10)
+    parser.add_argument('--port', type=int, default=5097)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='dht-stream-'), 'stream.db')}"
+    env = dict(os.environ, DATABASE_URL=database_url, CACHE_BACKEND='none', WEB_CONCURRENCY='1',
+               GUNICORN_WORKER_CLASS='gevent', GUNICORN_WORKER_CONNECTIONS=str(args.clients + 100))
+    subprocess.run([sys.executable, '-W', 'ignore', 'migrations.py'], cwd=BACKEND_DIR, env=env,
+                   check=True, capture_output=True)
+    server = subprocess.Popen(
+        [sys.executable, '-W', 'ignore', '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{args.port}', '--access-logfile', '/dev/null',
+         '--pid', os.path.join(tempfile.mkdtemp(prefix='dht-stream-pid-'), 'gunicorn.pid'), 'app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    failed = False
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if request(args.port, 'GET', '/ready')[0] == 200:
+                    break
+            except OSError:
+                pass
+            if time.monotonic() > deadline or server.poll() is not None:
+                raise RuntimeError("Gunicorn did not become ready")
+            time.sleep(0.1)
+        worker = worker_pid(server.pid)
+        baseline = rss_mb(worker)
+
+        streams = Streams()
+        assam, everyone = [], []
+        for index in range(args.clients):
+            filtered = index % 2 == 0
+            sock = open_stream(args.port, '/alerts/stream?state=Assam' if filtered else '/alerts/stream')
+            streams.add(sock)
+            (assam if filtered else everyone).append(sock)
+            streams.read(0)
+        if not streams.wait(lambda: len(streams.opened) == args.clients, 60):
+            raise RuntimeError(f"Only {len(streams.opened)} of {args.clients} streams opened")
+        opened = rss_mb(worker)
+        print(f"{args.clients} open streams on one gevent worker: RSS {baseline:.1f}MB -> {opened:.1f}MB "
+              f"({(opened - baseline) * 1024 / args.clients:.1f}KB per stream)")
+
+        cpu_before = cpu_seconds(worker)
+        idle_until = time.monotonic() + args.idle
+        while time.monotonic() < idle_until:
+            streams.read(0.5)
+        print(f"idle {args.idle:.0f}s with {args.clients} streams: worker CPU {(cpu_seconds(worker) - cpu_before) * 1000:.0f}ms "
+              f"(one poll per ALERT_STREAM_POLL_MS for the whole process)")
+
+        for state, receivers, excluded in (('Assam', assam + everyone, []), ('Manipur', everyone, assam)):
+            counts = {sock: len(streams.events[sock]) for sock in streams.events}
+            started = time.perf_counter()
+            status, body = request(args.port, 'POST', '/predict', dict(READING, state=state))
+            posted = time.perf_counter()
+            assert status == 200 and json.loads(body)['predicted_disease'] != 'None', body
+            delivered = streams.wait(lambda: all(len(streams.events[sock]) > counts[sock] for sock in receivers), 30)
+            streams.read(0.5)
+            latencies = sorted(streams.events[sock][counts[sock]][3] - posted
+                               for sock in receivers if len(streams.events[sock]) > counts[sock])
+            leaked = sum(1 for sock in excluded if len(streams.events[sock]) > counts[sock])
+            ok = delivered and not leaked
+            failed |= not ok
+            print(f"{'✅' if ok else '❌'} {state:7} alert: {len(latencies)}/{len(receivers)} streams received it "
+                  f"(/predict {(posted - started) * 1000:.1f}ms), after the response p50 {statistics.median(latencies) * 1000:.1f}ms "
+                  f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms max {latencies[-1] * 1000:.1f}ms; "
+                  f"{leaked} filtered-out streams received it")
+
+        event_id, event, data, _ = streams.events[everyone[0]][-1]
+        streamed = json.loads(data)
+        status, body = request(args.port, 'GET', '/alerts?limit=100')
+        listed = next((alert for alert in json.loads(body) if alert['id'] == streamed['id']), None)
+        same = streamed == listed
+        failed |= not same
+        print(f"{'✅' if same else '❌'} streamed {event} #{event_id} {'matches' if same else 'differs from'} the /alerts item")
+
+        # Reconnect after missing an update: the replay brings it
+        for sock in list(streams.events):
+            streams.selector.unregister(sock)
+            sock.close()
+        request(args.port, 'POST', '/predict', dict(READING, state='Assam'))
+        resumed = Streams()
+        sock = open_stream(args.port, '/alerts/stream?state=Assam', f'Last-Event-ID: {event_id}\r\n')
+        resumed.add(sock)
+        replayed = resumed.wait(lambda: resumed.events[sock], 10)
+        ok = replayed and resumed.events[sock][0][1] == 'alert.updated' and resumed.events[sock][0][0] > event_id
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} reconnect with Last-Event-ID {event_id}: replayed "
+              f"{[(event_id, event) for event_id, event, _, _ in resumed.events[sock]]}")
+        sock.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
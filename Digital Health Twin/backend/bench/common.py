@@ -0,0 +1,78 @@
+"""Shared helpers for the benchmark and check scripts in this directory."""
+import os
+import random
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+def load_app(prefix="dht-bench-"):
+    """Import the Flask app against a throwaway SQLite database, with response caching off"""
+    db_dir = tempfile.mkdtemp(prefix=prefix)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    os.environ.setdefault("CACHE_BACKEND", "none")
+
+    from app import app
+    return app
+
+DEFAULT_STATES = ["Assam", "Manipur", "Meghalaya", "Mizoram", "Nagaland", "Sikkim", "Tripura"]
+
+def make_samples(count, seed=42, states=None, districts=("Bench",)):
+    """Random but reproducible /predict payloads"""
+    rng = random.Random(seed)
+    states = states or DEFAULT_STATES
+    return [
+        {
+            "ph": round(rng.uniform(5.5, 8.5), 1),
+            "turbidity": round(rng.uniform(1.0, 10.0), 1),
+            "tds": rng.randint(100, 2000),
+            "people_affected_per_5000": rng.randint(50, 1000),
+            "state": rng.choice(states),
+            "district": rng.choice(districts),
+            "location": "Bench",
+        }
+        for _ in range(count)
+    ]
+
+def seed_health_metrics(db, rows, seed=42):
+    """Bulk insert `rows` synthetic health metrics records, 30 seconds apart"""
+    from database import HealthMetricsRecord
+
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(days=365)
+    chunk = []
+    for index in range(rows):
+        chunk.append({
+            'temperature': round(rng.uniform(36.0, 40.0), 1),
+            'systolic_bp': rng.randint(100, 160),
+            'diastolic_bp': rng.randint(60, 100),
+            'blood_oxygen': round(rng.uniform(90.0, 100.0), 1),
+            'state': 'Assam',
+            'district': 'Guwahati',
+            'timestamp': start + timedelta(seconds=index * 30),
+        })
+        if len(chunk) == 10000:
+            db.session.execute(HealthMetricsRecord.__table__.insert(), chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(HealthMetricsRecord.__table__.insert(), chunk)
+    db.session.commit()
+
+@contextmanager
+def capture_sql(engine):
+    """Collect (statement, parameters) for every SQL statement executed on the engine"""
+    from sqlalchemy import event
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
@@ -0,0 +1,97 @@
+"""Parity check and microbenchmark: compiled NumPy forest vs. sklearn.
+
+Fails if the compiled forest disagrees with sklearn on any label or
+probability (random inputs plus every split threshold, to hit the <=
+boundaries), or if the label /predict stores (model.predict._scores) differs
+from sklearn's, tied top classes included. Then compares throughput over
+batch sizes from one row (a /predict call) to 50k rows, reports where sklearn
+overtakes the compiled forest, and fails if it falls well behind at any size.
+
+    python bench/compiled_forest.py
+"""
+import sys
+import time
+
+import joblib
+import numpy as np
+
+from common import BACKEND_DIR  # noqa: F401  (puts the backend on sys.path)
+from model.forest import CompiledForest, MODEL_PATH
+from model.predict import _scores
+
+BATCH_SIZES = (1, 10, 100, 1000, 10000, 50000)
+# Slack for timing noise before a batch regression fails the run
+MIN_BATCH_RATIO = 0.8
+
+def parity_inputs(forest, rows=50000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.uniform(3.0, 11.0, rows),
+        rng.uniform(0.0, 15.0, rows),
+        rng.uniform(0.0, 3000.0, rows),
+        rng.integers(0, 1500, rows).astype(np.float64),
+    ])
+    # Rows sitting exactly on each split threshold
+    is_split = forest.left != np.arange(forest.left.shape[0])
+    for feature, threshold in zip(forest.feature[is_split], forest.threshold[is_split]):
+        row = X[rng.integers(0, rows)].copy()
+        row[feature] = threshold
+        X = np.vstack([X, row])
+    return X
+
+def rows_per_second(predict, X, repeats=5):
+    """Best of a few runs, each long enough to time reliably"""
+    calls = max(1, min(100, 10000 // len(X)))
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(calls):
+            predict(X)
+        best = min(best, (time.perf_counter() - start) / calls)
+    return len(X) / best
+
+def main():
+    sk_model = joblib.load(MODEL_PATH)
+    forest = CompiledForest.load()
+
+    X = parity_inputs(forest)
+    labels_match = np.array_equal(sk_model.predict(X), forest.predict(X))
+    max_diff = np.abs(sk_model.predict_proba(X) - forest.predict_proba(X)).max()
+    print(f"parity over {len(X)} rows: labels {'match' if labels_match else 'DIFFER'}, max |proba diff| = {max_diff:.3g}")
+    if not labels_match or max_diff > 1e-12:
+        print("❌ compiled forest disagrees with sklearn")
+        sys.exit(1)
+
+    # On a tie sklearn keeps the first of the tied classes; so must the stored label
+    probabilities = forest.predict_proba(X)
+    top_two = np.sort(probabilities, axis=1)[:, -2:]
+    ties = np.flatnonzero(top_two[:, 0] == top_two[:, 1])
+    expected = sk_model.predict(X)
+    stored = np.array([_scores(row, forest.classes_)[0] for row in probabilities])
+    wrong = np.flatnonzero(stored != expected)
+    print(f"stored labels over {len(X)} rows ({len(ties)} with tied top classes): {len(wrong)} differ from sklearn")
+    if len(ties) == 0 or len(wrong):
+        print("❌ /predict labels differ from the model's prediction" if len(wrong) else "❌ no tied rows to check")
+        sys.exit(1)
+
+    print(f"{'batch':>6} {'sklearn':>14} {'compiled':>14}  speedup")
+    ratios = {}
+    for size in BATCH_SIZES:
+        batch = X[:size]
+        sklearn_rate = rows_per_second(sk_model.predict_proba, batch)
+        compiled_rate = rows_per_second(forest.predict_proba, batch)
+        ratios[size] = compiled_rate / sklearn_rate
+        print(f"{size:>6} {sklearn_rate:>9.0f} rows/s {compiled_rate:>7.0f} rows/s  {ratios[size]:.2f}x")
+
+    slower = [size for size, ratio in ratios.items() if ratio < 1]
+    if slower:
+        print(f"crossover: sklearn is faster from batches of {min(slower)} rows")
+    else:
+        print(f"crossover: none, compiled is faster up to batches of {BATCH_SIZES[-1]} rows")
+    if min(ratios.values()) < MIN_BATCH_RATIO:
+        print(f"❌ compiled forest is under {MIN_BATCH_RATIO:.0%} of sklearn's throughput")
+        sys.exit(1)
+    print("✅ compiled forest matches sklearn")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Check that /dashboard runs a constant number of SQL statements.
+
+Loads the dashboard while the number of states, districts and raw records
+grows and fails if the statement count changes with it (an N+1 regression).
+Latency is printed alongside; with the rollups it should stay flat.
+
+    python bench/dashboard_queries.py
+"""
+import sys
+import time
+
+from common import load_app, make_samples, capture_sql
+
+def main():
+    app = load_app(prefix="dht-dashboard-")
+    from database import db
+
+    client = app.test_client()
+    counts = []
+    with app.app_context():
+        for batch, state_count in enumerate((1, 5, 25, 100)):
+            states = [f"State {index}" for index in range(state_count)]
+            districts = [f"District {index}" for index in range(3)]
+            client.post('/predict/batch', json=make_samples(state_count * 5, seed=batch, states=states, districts=districts))
+
+            with capture_sql(db.engine) as statements:
+                start = time.perf_counter()
+                response = client.get('/dashboard')
+                elapsed_ms = (time.perf_counter() - start) * 1000
+            assert response.status_code == 200, response.get_json()
+
+            body = response.get_json()
+            counts.append(len(statements))
+            print(f"states={len(body['state_breakdown']):4d}  districts={len(body['district_breakdown']):4d}  statements={len(statements)}  {elapsed_ms:6.1f}ms")
+
+    if len(set(counts)) != 1:
+        print("❌ /dashboard statement count grows with the number of states")
+        sys.exit(1)
+    print(f"✅ /dashboard runs {counts[0]} statements regardless of state count")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Benchmark: peak Python memory while streaming /export/health-metrics.
+
+Exports increasingly large tables and reports the peak traced allocation.
+With the streaming export it should stay roughly flat as rows grow.
+
+    python bench/export_memory.py
+"""
+import time
+import tracemalloc
+
+from common import load_app, seed_health_metrics
+
+def main():
+    app = load_app(prefix="dht-export-")
+    from database import db
+
+    client = app.test_client()
+    seeded = 0
+    for rows in (10000, 100000, 300000):
+        with app.app_context():
+            seed_health_metrics(db, rows - seeded, seed=rows)
+        seeded = rows
+
+        for export_format in ('ndjson', 'csv'):
+            tracemalloc.start()
+            start = time.perf_counter()
+            response = client.get(f'/export/health-metrics?format={export_format}', buffered=False)
+            exported_bytes = sum(len(chunk) for chunk in response.response)
+            response.close()
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(f"rows={rows:>7} format={export_format:6} "
+                  f"size={exported_bytes / 1e6:7.1f}MB time={elapsed:6.2f}s peak={peak / 1e6:6.2f}MB")
+
+if __name__ == "__main__":
+    main()
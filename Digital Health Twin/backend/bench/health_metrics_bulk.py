@@ -0,0 +1,99 @@
+"""Benchmark: /health-metrics/bulk against one POST /health-metrics per record.
+
+For each size, uploads that many synthetic device records as a JSON array
+and as NDJSON, then re-sends the JSON upload (every record a duplicate, as
+after a sync retry). Reports records/s and SQL statements per upload, and
+checks every record was stored exactly once. The one-request-per-record
+baseline only runs up to --single-max records.
+
+    python bench/health_metrics_bulk.py [--sizes 10,1000,100000] [--single-max 1000]
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from common import load_app, capture_sql
+
+def make_records(count, seed):
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(days=7)
+    return [
+        {
+            'client_uuid': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'temperature': round(rng.uniform(36.0, 40.0), 1),
+            'systolic_bp': rng.randint(100, 160),
+            'diastolic_bp': rng.randint(60, 100),
+            'blood_oxygen': round(rng.uniform(90.0, 100.0), 1),
+            'patient_age': rng.randint(1, 90),
+            'patient_gender': rng.choice(['M', 'F']),
+            'state': 'Assam',
+            'district': rng.choice(['Kamrup', 'Dibrugarh', 'Jorhat']),
+            'recorded_by': f'ASHA{rng.randint(1, 50):03d}',
+            'notes': rng.choice(['Symptom: fever', 'Symptom: diarrhea', None]),
+            'timestamp': (start + timedelta(seconds=rng.uniform(0, 7 * 86400))).isoformat()
+        }
+        for _ in range(count)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10,1000,100000')
+    parser.add_argument('--single-max', type=int, default=1000)
+    args = parser.parse_args()
+
+    app = load_app(prefix="dht-bulk-ingest-")
+    from sqlalchemy import func, select
+    from database import db, HealthMetricsRecord
+
+    client = app.test_client()
+    with app.app_context():
+        engine = db.engine
+
+    def stored():
+        with app.app_context():
+            return db.session.scalar(select(func.count(HealthMetricsRecord.id)))
+
+    def timed(label, count, send, expect_created):
+        before = stored()
+        with capture_sql(engine) as statements:
+            started = time.perf_counter()
+            created = send()
+            elapsed = time.perf_counter() - started
+        added = stored() - before
+        ok = created == expect_created and added == expect_created
+        print(f"{count:>8} {label:18} {elapsed:9.3f}s {count / elapsed:>10.0f}/s {len(statements):>6} "
+              f"{'' if ok else f'❌ created {created}, stored {added}, expected {expect_created}'}")
+
+    print(f"{'records':>8} {'mode':18} {'time':>10} {'records/s':>11} {'SQL':>6}")
+    for seed, count in enumerate(int(value) for value in args.sizes.split(',')):
+        app.config['HEALTH_METRICS_BULK_MAX_SIZE'] = max(count, app.config['HEALTH_METRICS_BULK_MAX_SIZE'])
+
+        if count <= args.single_max:
+            single = make_records(count, seed=seed * 10 + 1)
+            def send_single():
+                for record in single:
+                    assert client.post('/health-metrics', json=record).status_code == 201
+                return len(single)
+            timed('single POSTs', count, send_single, count)
+
+        records = make_records(count, seed=seed * 10 + 2)
+        def send_json():
+            response = client.post('/health-metrics/bulk', json=records)
+            assert response.status_code == 200, response.get_json()
+            return response.get_json()['created']
+        timed('bulk JSON', count, send_json, count)
+
+        ndjson = '\n'.join(json.dumps(record) for record in make_records(count, seed=seed * 10 + 3))
+        def send_ndjson():
+            response = client.post('/health-metrics/bulk', data=ndjson, content_type='application/x-ndjson')
+            assert response.status_code == 200, response.get_json()
+            return response.get_json()['created']
+        timed('bulk NDJSON', count, send_ndjson, count)
+
+        timed('bulk JSON re-sent', count, send_json, 0)
+
+if __name__ == "__main__":
+    main()
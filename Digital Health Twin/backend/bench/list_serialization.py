@@ -0,0 +1,156 @@
+"""Check and benchmark: projection-only serialization of /alerts and /records.
+
+Seeds --alerts alerts (two in three assigned to one of 50 workers), each on
+its own prediction and water quality record, then:
+
+  1. fails if the number of SQL statements per request changes with the
+     page size (an N+1 regression, e.g. a lazy-loaded assigned_worker)
+  2. fails if a page differs from the one the previous implementation built
+     from ORM objects (kept below as the reference)
+  3. prints median latency and peak traced memory for one page of
+     --alerts rows, projection vs the ORM reference
+
+    python bench/list_serialization.py [--alerts 10000] [--runs 5]
+"""
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from common import load_app, capture_sql
+
+def seed(db, alerts):
+    from database import WaterQualityRecord, PredictionRecord, HealthAlert, HealthWorker
+
+    start = datetime.utcnow() - timedelta(days=30)
+    db.session.execute(HealthWorker.__table__.insert(), [
+        {'id': 1000 + index, 'name': f'Worker {index}', 'worker_id': f'BENCH{index:03d}', 'role': 'ASHA',
+         'state': 'Assam', 'district': 'Bench', 'contact_phone': '9000000000', 'is_active': True,
+         'created_at': start}
+        for index in range(50)
+    ])
+    for offset in range(0, alerts, 10000):
+        ids = range(offset + 1, min(offset + 10000, alerts) + 1)
+        db.session.execute(WaterQualityRecord.__table__.insert(), [
+            {'id': index, 'ph': 6.5, 'turbidity': 5.0, 'tds': 800, 'people_affected_per_5000': 300,
+             'location': 'Bench', 'state': 'Assam' if index % 2 else 'Manipur', 'district': 'Bench',
+             'collected_by': 'BENCH', 'timestamp': start + timedelta(seconds=index)}
+            for index in ids
+        ])
+        db.session.execute(PredictionRecord.__table__.insert(), [
+            {'id': index, 'water_quality_id': index, 'predicted_disease': 'Cholera',
+             'health_alert': 'High risk of Cholera', 'timestamp': start + timedelta(seconds=index)}
+            for index in ids
+        ])
+        db.session.execute(HealthAlert.__table__.insert(), [
+            {'id': index, 'prediction_id': index, 'alert_level': 'HIGH', 'status': 'ACTIVE',
+             'assigned_to': 1000 + index % 50 if index % 3 else None, 'notes': None, 'occurrence_count': 1,
+             'created_at': start + timedelta(seconds=index), 'last_seen_at': start + timedelta(seconds=index)}
+            for index in ids
+        ])
+    db.session.commit()
+
+def register_reference_routes(app):
+    """The ORM-hydrating implementation these endpoints replaced, for comparison"""
+    from flask import request, jsonify
+    from database import db, PredictionRecord, WaterQualityRecord, HealthAlert
+
+    def orm_alerts():
+        query = db.session.query(HealthAlert, PredictionRecord, WaterQualityRecord)\
+            .join(PredictionRecord, HealthAlert.prediction_id == PredictionRecord.id)\
+            .join(WaterQualityRecord, PredictionRecord.water_quality_id == WaterQualityRecord.id)\
+            .filter(HealthAlert.status == 'ACTIVE')\
+            .order_by(HealthAlert.created_at.desc(), HealthAlert.id.desc())
+        return jsonify([{
+            'id': alert.id,
+            'alert_level': alert.alert_level,
+            'status': alert.status,
+            'created_at': alert.created_at.isoformat(),
+            'notes': alert.notes,
+            'occurrence_count': alert.occurrence_count,
+            'last_seen_at': alert.last_seen_at.isoformat() if alert.last_seen_at else None,
+            'prediction': {'disease': pred.predicted_disease, 'health_alert': pred.health_alert},
+            'location': {'state': water.state, 'district': water.district, 'location': water.location},
+            'assigned_worker': alert.assigned_worker.to_dict() if alert.assigned_worker else None
+        } for alert, pred, water in query.limit(request.args.get('limit', type=int)).all()])
+
+    def orm_records():
+        query = db.session.query(PredictionRecord, WaterQualityRecord).join(WaterQualityRecord)\
+            .order_by(PredictionRecord.timestamp.desc(), PredictionRecord.id.desc())
+        return jsonify([{
+            'id': pred.id,
+            'predicted_disease': pred.predicted_disease,
+            'health_alert': pred.health_alert,
+            'timestamp': pred.timestamp.isoformat(),
+            'water_quality': {
+                'ph': water.ph, 'turbidity': water.turbidity, 'tds': water.tds,
+                'people_affected': water.people_affected_per_5000, 'location': water.location,
+                'state': water.state, 'district': water.district, 'collected_by': water.collected_by
+            }
+        } for pred, water in query.limit(request.args.get('limit', type=int)).all()])
+
+    app.add_url_rule('/bench/orm/alerts', 'bench_orm_alerts', orm_alerts)
+    app.add_url_rule('/bench/orm/records', 'bench_orm_records', orm_records)
+
+def measure(client, url, runs):
+    """(median seconds, peak traced bytes) for GET url"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.get_json()
+    tracemalloc.start()
+    client.get(url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--alerts', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    app = load_app(prefix="dht-lists-")
+    from database import db
+
+    register_reference_routes(app)
+    with app.app_context():
+        seed(db, args.alerts)
+        engine = db.engine
+    client = app.test_client()
+    failed = False
+
+    for endpoint in ('/alerts', '/records'):
+        for suffix in ('', '&state=Assam', '&include_total=true'):
+            counts = []
+            for limit in (10, 100, 1000):
+                with capture_sql(engine) as statements:
+                    response = client.get(f'{endpoint}?limit={limit}{suffix}')
+                assert response.status_code == 200, response.get_json()
+                counts.append(len(statements))
+            ok = len(set(counts)) == 1
+            failed |= not ok
+            print(f"{'✅' if ok else '❌'} {endpoint}?limit=10/100/1000{suffix}: statements={counts}")
+
+        for limit in (20, 1000):
+            same = client.get(f'{endpoint}?limit={limit}').get_json() == client.get(f'/bench/orm{endpoint}?limit={limit}').get_json()
+            failed |= not same
+            print(f"{'✅' if same else '❌'} {endpoint}?limit={limit}: body {'matches' if same else 'differs from'} the ORM reference")
+
+    print(f"\none page of {args.alerts} rows, median of {args.runs}:")
+    for endpoint in ('/alerts', '/records'):
+        for label, url in (('orm', f'/bench/orm{endpoint}'), ('projection', endpoint)):
+            with capture_sql(engine) as statements:
+                elapsed, peak = measure(client, f'{url}?limit={args.alerts}', args.runs)
+            print(f"{endpoint:9} {label:10} {elapsed * 1000:8.1f}ms  peak={peak / 1e6:6.1f}MB  "
+                  f"statements/request={len(statements) // (args.runs + 1)}")
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Load test: requests/s and latency of sync vs gevent Gunicorn workers.
+
+Starts Gunicorn with gunicorn.conf.py once per worker class against a
+PostgreSQL database and drives it with --clients concurrent HTTP clients for
+--duration seconds. Each client sends a mix of /records, /alerts,
+/dashboard, /health-metrics and /predict. The response cache is off, so
+every request reaches the database. --query-latency-ms runs pg_sleep before
+every statement inside the workers. That stands in for a slow query or a
+database across the network, which is where sync workers stall.
+
+    python bench/load_test.py --database-url postgresql://user@localhost/dht_bench \\
+        [--modes sync,gevent] [--clients 64] [--duration 20] [--query-latency-ms 0,5]
+
+Worker counts are gunicorn.conf.py's defaults for each class unless
+--workers is given. gevent mode needs `pip install gevent psycogreen`.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import BACKEND_DIR, make_samples
+
+# Loaded by Gunicorn instead of gunicorn.conf.py: the real settings plus
+# the bench's bind address and the simulated statement latency
+BENCH_CONFIG = """
+exec(open({config!r}).read())
+bind = {bind!r}
+pidfile = None
+accesslog = None
+max_requests = 0
+
+def post_worker_init(worker):
+    latency = float(os.getenv('BENCH_QUERY_LATENCY_MS', 0)) / 1000
+    if latency:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        @event.listens_for(Engine, 'before_cursor_execute')
+        def slow_statement(conn, cursor, statement, parameters, context, executemany):
+            cursor.execute('SELECT pg_sleep(%s)', (latency,))
+"""
+
+READS = [
+    '/records?per_page=20',
+    '/alerts?limit=20',
+    '/dashboard',
+    '/health-metrics?state=Assam&per_page=20',
+]
+
+def seed(database_url):
+    """Create the schema and some data, once per database"""
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['CACHE_BACKEND'] = 'none'
+    from app import app
+    from common import seed_health_metrics
+    from database import db, PredictionRecord, HealthMetricsRecord
+
+    with app.app_context():
+        if db.session.query(PredictionRecord.id).first() is None:
+            response = app.test_client().post('/predict/batch', json=make_samples(2000, states=['Assam', 'Manipur']))
+            assert response.status_code == 200, response.get_json()
+        if db.session.query(HealthMetricsRecord.id).first() is None:
+            seed_health_metrics(db, 20000)
+        db.engine.dispose()
+
+def start_server(mode, workers, latency_ms, database_url, port):
+    config_path = os.path.join(tempfile.mkdtemp(prefix='dht-load-'), 'gunicorn.bench.py')
+    with open(config_path, 'w') as f:
+        f.write(BENCH_CONFIG.format(config=os.path.join(BACKEND_DIR, 'gunicorn.conf.py'), bind=f'127.0.0.1:{port}'))
+    env = dict(os.environ, DATABASE_URL=database_url, CACHE_BACKEND='none',
+               GUNICORN_WORKER_CLASS=mode, BENCH_QUERY_LATENCY_MS=str(latency_ms))
+    if workers:
+        env['WEB_CONCURRENCY'] = str(workers)
+    server = subprocess.Popen(
+        [sys.executable, '-W', 'ignore', '-m', 'gunicorn', '--config', config_path, 'app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Gunicorn ({mode}) exited:\n{server.stderr.read()[-2000:]}")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/')
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"Gunicorn ({mode}) did not start")
+
+def run_clients(port, clients, duration, samples):
+    """Closed loop: each client sends its next request as soon as the last one returns"""
+    timings, errors = [], []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(number):
+        rng = random.Random(number)
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        local_timings, local_errors = [], 0
+        sample_iter = itertools.cycle(samples[number::clients] or samples)
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                if rng.random() < 0.2:
+                    body = json.dumps(next(sample_iter))
+                    connection.request('POST', '/predict', body=body, headers={'Content-Type': 'application/json'})
+                else:
+                    connection.request('GET', rng.choice(READS))
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 400:
+                    local_errors += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                connection.close()
+                continue
+            local_timings.append(time.perf_counter() - started)
+        with lock:
+            timings.extend(local_timings)
+            errors.append(local_errors)
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings, sum(errors), time.monotonic() - started
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL', ''))
+    parser.add_argument('--modes', default='sync,gevent')
+    parser.add_argument('--workers', type=int, default=None, help='default: gunicorn.conf.py default per worker class')
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--query-latency-ms', default='0,5')
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    if not args.database_url.startswith('postgres'):
+        parser.error("--database-url must be a PostgreSQL URL (gevent cannot help SQLite)")
+
+    seed(args.database_url)
+    samples = make_samples(1000, seed=7)
+
+    print(f"clients={args.clients} duration={args.duration:.0f}s")
+    print(f"{'latency':>8} {'mode':7} {'workers':>7} {'req/s':>8} {'p50':>9} {'p99':>9} {'errors':>7}")
+    for latency_ms in [float(value) for value in args.query_latency_ms.split(',')]:
+        for mode in args.modes.split(','):
+            server = start_server(mode, args.workers, latency_ms, args.database_url, args.port)
+            try:
+                timings, errors, elapsed = run_clients(args.port, args.clients, args.duration, samples)
+                workers = len(subprocess.run(['pgrep', '-P', str(server.pid)], capture_output=True, text=True).stdout.split())
+            finally:
+                server.terminate()
+                server.wait()
+            if not timings:
+                print(f"{latency_ms:>6.1f}ms {mode:7} {workers:>7} no successful requests, {errors} errors")
+                continue
+            print(f"{latency_ms:>6.1f}ms {mode:7} {workers:>7} {len(timings) / elapsed:>8.0f} "
+                  f"{statistics.median(timings) * 1000:>7.1f}ms {percentile(timings, 0.99) * 1000:>7.1f}ms {errors:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Per-worker model memory against worker count.
+
+Starts N worker processes that each load the model the way a Gunicorn worker
+does after a hot reload, score a batch and read every model page, then
+stay alive while their memory is read from /proc/<pid>/smaps_rollup:
+
+    baseline  numpy only, no model: interpreter + library cost
+    sklearn   joblib.load of the pickled RandomForestClassifier
+    heap      compiled forest copied into each process (np.load)
+    mmap      compiled forest mapped from the .npz (the default)
+
+RSS counts shared pages in full in every process, so it cannot show sharing.
+PSS splits each shared page between the processes mapping it, so summing
+PSS over workers gives the real memory. "model" is PSS minus the baseline
+at the same worker count.
+
+The bundled model is small (~60 KB of arrays), so by default a larger forest
+is trained on synthetic data to make the per-worker cost visible:
+
+    python bench/model_memory.py [--trees 200] [--workers 1,2,4,8]
+    python bench/model_memory.py --bundled
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import BACKEND_DIR
+
+MODES = ('baseline', 'sklearn', 'heap', 'mmap')
+
+def worker(mode, pkl_path, npz_path):
+    import numpy as np
+    X = np.random.default_rng(0).uniform(0, 1, (1000, 4)) * [14, 15, 3000, 1500]
+    if mode == 'sklearn':
+        import joblib
+        joblib.load(pkl_path).predict_proba(X)
+    elif mode in ('heap', 'mmap'):
+        sys.path.insert(0, BACKEND_DIR)
+        from model.forest import CompiledForest
+        forest = CompiledForest.load(npz_path, mmap_arrays=mode == 'mmap')
+        forest.predict_proba(X)
+        # Read every array in full so all of the model is resident, as after hours of traffic
+        for array in (forest.feature, forest.threshold, forest.children, forest.value):
+            array.sum()
+    print('ready', flush=True)
+    sys.stdin.read()
+
+def memory_kb(pid):
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values
+
+def measure(mode, count, pkl_path, npz_path):
+    """Average RSS and PSS (MB) of `count` concurrent workers"""
+    workers = [
+        subprocess.Popen(
+            [sys.executable, '-W', 'ignore', __file__, '--worker', mode, pkl_path, npz_path],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        for _ in range(count)
+    ]
+    try:
+        for process in workers:
+            if process.stdout.readline().strip() != 'ready':
+                raise RuntimeError(f"{mode} worker failed to start")
+        samples = [memory_kb(process.pid) for process in workers]
+    finally:
+        for process in workers:
+            process.stdin.close()
+            process.wait()
+    return (
+        sum(sample['Rss'] for sample in samples) / count / 1024,
+        sum(sample['Pss'] for sample in samples) / count / 1024
+    )
+
+def build_models(trees, directory):
+    import joblib
+    import numpy as np
+    from sklearn.ensemble import RandomForestClassifier
+    sys.path.insert(0, BACKEND_DIR)
+    from model.forest import export_forest
+
+    # Labels follow the features with 10% noise, which grows trees of a realistic size
+    rng = np.random.default_rng(1)
+    X = rng.uniform(0, 1, (50000, 4)) * [14, 15, 3000, 1500]
+    labels = np.array(['None', 'Cholera', 'Typhoid', 'Diarrhea'])
+    y = labels[(X[:, 1] > 5).astype(int) + (X[:, 2] > 1500) + (X[:, 0] < 6.5)]
+    noisy = rng.random(len(y)) < 0.1
+    y[noisy] = rng.choice(labels, noisy.sum())
+    model = RandomForestClassifier(n_estimators=trees, min_samples_leaf=5, n_jobs=-1, random_state=0).fit(X, y)
+    pkl_path = os.path.join(directory, 'forest.pkl')
+    npz_path = os.path.join(directory, 'forest.npz')
+    joblib.dump(model, pkl_path)
+    export_forest(model, npz_path)
+    return pkl_path, npz_path
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trees', type=int, default=200)
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--bundled', action='store_true', help='measure model/health_model.* instead of a synthetic forest')
+    args = parser.parse_args()
+
+    if args.bundled:
+        from model.forest import MODEL_PATH, COMPILED_MODEL_PATH
+        pkl_path, npz_path = MODEL_PATH, COMPILED_MODEL_PATH
+    else:
+        pkl_path, npz_path = build_models(args.trees, tempfile.mkdtemp(prefix='dht-model-memory-'))
+    print(f"compiled artifact: {os.path.getsize(npz_path) / 1024 / 1024:.1f} MB, pickle: {os.path.getsize(pkl_path) / 1024 / 1024:.1f} MB")
+
+    print(f"{'workers':>7} {'mode':9} {'RSS/worker':>11} {'PSS/worker':>11} {'model/worker':>13} {'model total':>12}")
+    for count in [int(value) for value in args.workers.split(',')]:
+        baseline = None
+        for mode in MODES:
+            rss, pss = measure(mode, count, pkl_path, npz_path)
+            if mode == 'baseline':
+                baseline = pss
+            model = pss - baseline
+            print(f"{count:>7} {mode:9} {rss:>9.1f}MB {pss:>9.1f}MB {model:>11.1f}MB {model * count:>10.1f}MB")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        worker(*sys.argv[2:5])
+    else:
+        main()
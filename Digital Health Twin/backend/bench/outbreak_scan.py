@@ -0,0 +1,120 @@
+"""Benchmark and check: incremental outbreak scans over a large prediction history.
+
+Seeds --history predictions over the past year (SQLite, generated in SQL),
+spread over 200 districts of 10 states, and builds the rollups. Then runs
+the first scan (seeded from the rollups) and timed incremental scans after
+each of these batches, all dated today:
+
+  steady     --batch ordinary predictions spread evenly over the districts
+  cluster    40 Cholera predictions in one district       -> one alert
+  scattered  40 Cholera predictions in 40 other districts -> no alert
+  empty      nothing new
+
+Fails if an incremental scan takes longer than --max-scan-ms or an alert is
+raised or missed.
+
+    python bench/outbreak_scan.py [--history 10000000] [--batch 10000] [--max-scan-ms 1000]
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import load_app
+
+DISTRICTS = 200
+# One in ten predictions of each disease below; the rest are 'None'
+DISEASE_CASE = ("CASE (n / 200) % 10 WHEN 0 THEN 'Cholera' WHEN 1 THEN 'Typhoid' "
+                "WHEN 2 THEN 'Diarrhea' WHEN 3 THEN 'Diarrhea' ELSE 'None' END")
+
+def seed_history(db, rows, today):
+    """`rows` predictions, evenly spaced over the 365 days before `today`"""
+    from sqlalchemy import text
+
+    parameters = {'rows': rows, 'start': (today - timedelta(days=365)).isoformat(), 'step': 365 / rows}
+    sequence = "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < :rows) "
+    timestamp = "strftime('%Y-%m-%d %H:%M:%f', julianday(:start) + (n - 1) * :step)"
+    db.session.execute(text(
+        sequence + "INSERT INTO water_quality_records "
+        "(id, ph, turbidity, tds, people_affected_per_5000, location, state, district, collected_by, timestamp) "
+        f"SELECT n, 7.0, 3.0, 500, 100, 'Bench', 'State ' || (n % {DISTRICTS} % 10), "
+        f"'District ' || (n % {DISTRICTS}), 'BENCH', {timestamp} FROM seq"
+    ), parameters)
+    db.session.execute(text(
+        sequence + "INSERT INTO prediction_records (id, water_quality_id, predicted_disease, health_alert, timestamp) "
+        f"SELECT n, n, {DISEASE_CASE}, 'Bench', {timestamp} FROM seq"
+    ), parameters)
+    db.session.commit()
+
+def add_predictions(db, districts_and_diseases, timestamp):
+    from database import WaterQualityRecord, PredictionRecord
+
+    first_id = (db.session.query(db.func.max(PredictionRecord.id)).scalar() or 0) + 1
+    ids = range(first_id, first_id + len(districts_and_diseases))
+    db.session.execute(WaterQualityRecord.__table__.insert(), [
+        {'id': record_id, 'ph': 7.0, 'turbidity': 3.0, 'tds': 500, 'people_affected_per_5000': 100,
+         'location': 'Bench', 'state': f'State {district % 10}', 'district': f'District {district}',
+         'collected_by': 'BENCH', 'timestamp': timestamp}
+        for record_id, (district, _) in zip(ids, districts_and_diseases)
+    ])
+    db.session.execute(PredictionRecord.__table__.insert(), [
+        {'id': record_id, 'water_quality_id': record_id, 'predicted_disease': disease,
+         'health_alert': 'Bench', 'timestamp': timestamp}
+        for record_id, (_, disease) in zip(ids, districts_and_diseases)
+    ])
+    db.session.commit()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--history', type=int, default=10000000)
+    parser.add_argument('--batch', type=int, default=10000)
+    parser.add_argument('--max-scan-ms', type=float, default=1000)
+    args = parser.parse_args()
+
+    app = load_app(prefix="dht-outbreaks-")
+    from database import db
+    from rollups import rebuild_rollups
+    from outbreaks import scan
+
+    now = datetime.utcnow()
+    today = datetime(now.year, now.month, now.day)
+    failed = False
+    with app.app_context():
+        start = time.perf_counter()
+        seed_history(db, args.history, today)
+        print(f"seeded {args.history} predictions in {time.perf_counter() - start:.0f}s")
+        start = time.perf_counter()
+        rebuild_rollups()
+        db.session.commit()
+        print(f"built rollups in {time.perf_counter() - start:.0f}s")
+
+        summary = scan()
+        print(f"first scan (seeded from rollups): {summary['seconds'] * 1000:7.1f}ms, "
+              f"{summary['keys_updated']} districts/diseases, {summary['alerts_raised']} alerts")
+
+        # Before the settle window: every new row is counted by the next scan
+        timestamp = now - timedelta(minutes=1)
+        ordinary = [(index % DISTRICTS, ('Cholera', 'Typhoid', 'Diarrhea', 'Diarrhea', 'None', 'None', 'None', 'None', 'None', 'None')[index // DISTRICTS % 10])
+                    for index in range(args.batch)]
+        batches = (
+            ('steady', ordinary, 0),
+            ('cluster', [(7, 'Cholera')] * 40, 1),
+            ('scattered', [(district, 'Cholera') for district in range(100, 140)], 0),
+            ('empty', [], 0),
+        )
+        for name, rows, expected_alerts in batches:
+            if rows:
+                add_predictions(db, rows, timestamp)
+            summary = scan()
+            elapsed_ms = summary['seconds'] * 1000
+            ok = elapsed_ms <= args.max_scan_ms and summary['alerts_raised'] == expected_alerts
+            failed |= not ok
+            print(f"{'✅' if ok else '❌'} {name:9} {summary['new_predictions']:>6} new disease predictions  "
+                  f"scan {elapsed_ms:7.1f}ms  {summary['keys_updated']:>4} keys  "
+                  f"alerts raised {summary['alerts_raised']} (expected {expected_alerts})")
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
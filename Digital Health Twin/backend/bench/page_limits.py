@@ -0,0 +1,62 @@
+"""Check that out-of-range page sizes are clamped instead of failing.
+
+Seeds a few more rows than PAGE_MAX_LIMIT, then asks every keyset-paginated
+list endpoint for limit=0, limit=-1 and a limit far above the maximum. Each
+must answer 200 with a page of 1..PAGE_MAX_LIMIT rows (exactly 1 for limit<=0
+and PAGE_MAX_LIMIT for the oversized limit where there is enough data).
+Exits non-zero otherwise.
+
+    python bench/page_limits.py
+"""
+import os
+import sys
+
+from common import load_app, make_samples, seed_health_metrics
+
+PAGE_MAX_LIMIT = 20
+ROWS = PAGE_MAX_LIMIT + 10
+
+# (url, query parameter, whether the endpoint has ROWS rows to page through)
+ENDPOINTS = [
+    ('/records', 'limit', True),
+    ('/alerts', 'limit', False),
+    ('/outbreaks', 'limit', False),
+    ('/health-metrics', 'per_page', True),
+]
+
+def page_items(body):
+    return body['records'] if isinstance(body, dict) else body
+
+def main():
+    os.environ['PAGE_MAX_LIMIT'] = str(PAGE_MAX_LIMIT)
+    app = load_app(prefix="dht-limits-")
+    from database import db
+
+    client = app.test_client()
+    with app.app_context():
+        seed_health_metrics(db, ROWS)
+    response = client.post('/predict/batch', json=make_samples(ROWS))
+    assert response.status_code == 200, response.get_json()
+
+    failures = 0
+    for url, parameter, seeded in ENDPOINTS:
+        separator = '&' if '?' in url else '?'
+        for limit, expected in ((0, 1), (-1, 1), (10 ** 6, PAGE_MAX_LIMIT)):
+            response = client.get(f"{url}{separator}{parameter}={limit}")
+            body = response.get_json()
+            if response.status_code != 200:
+                print(f"❌ {url} {parameter}={limit}: {response.status_code} {body}")
+                failures += 1
+                continue
+            count = len(page_items(body))
+            ok = count == expected if seeded else count <= expected
+            print(f"{'✅' if ok else '❌'} {url} {parameter}={limit}: {count} rows")
+            failures += not ok
+
+    if failures:
+        print(f"❌ {failures} page size checks failed")
+        sys.exit(1)
+    print("✅ page sizes clamped to 1..PAGE_MAX_LIMIT")
+
+if __name__ == "__main__":
+    main()
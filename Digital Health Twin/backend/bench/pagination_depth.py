@@ -0,0 +1,55 @@
+"""Benchmark: page latency vs. page depth for cursor and OFFSET pagination.
+
+Walks /health-metrics page by page with `cursor` and samples the latency at
+several depths, then fetches the same depths with the legacy `page=` mode.
+
+    python bench/pagination_depth.py --rows 200000 --per-page 50
+"""
+import argparse
+import time
+
+from common import load_app, seed_health_metrics
+
+def timed_get(client, url):
+    start = time.perf_counter()
+    response = client.get(url)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    assert response.status_code == 200, response.get_json()
+    return response.get_json(), elapsed_ms
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--per-page", type=int, default=50)
+    args = parser.parse_args()
+
+    app = load_app(prefix="dht-pages-")
+    from database import db
+
+    with app.app_context():
+        seed_health_metrics(db, args.rows)
+
+    client = app.test_client()
+    last_page = args.rows // args.per_page
+    depths = sorted({1, 10, 100, last_page // 4, last_page // 2, last_page})
+    base = f"/health-metrics?state=Assam&per_page={args.per_page}"
+
+    cursor_ms = {}
+    cursor = None
+    for page in range(1, last_page + 1):
+        url = base + (f"&cursor={cursor}" if cursor else "")
+        body, elapsed_ms = timed_get(client, url)
+        if page in depths:
+            cursor_ms[page] = elapsed_ms
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+
+    print(f"rows={args.rows} per_page={args.per_page}")
+    print(f"{'page':>8} {'cursor ms':>10} {'offset ms':>10}")
+    for page in depths:
+        _, offset_ms = timed_get(client, f"{base}&page={page}")
+        print(f"{page:>8} {cursor_ms.get(page, float('nan')):>10.2f} {offset_ms:>10.2f}")
+
+if __name__ == "__main__":
+    main()
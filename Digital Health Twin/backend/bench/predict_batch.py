@@ -0,0 +1,39 @@
+"""Benchmark: /predict/batch vs. a loop of single /predict calls.
+
+Runs against a throwaway SQLite database so the real one is never touched.
+
+    python bench/predict_batch.py --samples 2000
+"""
+import argparse
+import time
+
+from common import load_app, make_samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = load_app()
+    client = app.test_client()
+    samples = make_samples(args.samples)
+
+    start = time.perf_counter()
+    for sample in samples:
+        response = client.post("/predict", json=sample)
+        assert response.status_code == 200, response.get_json()
+    single_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    response = client.post("/predict/batch", json={"samples": samples})
+    batch_elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()["succeeded"] == len(samples)
+
+    print(f"samples:         {len(samples)}")
+    print(f"single /predict: {single_elapsed:8.3f}s  {len(samples) / single_elapsed:10.1f} samples/sec")
+    print(f"/predict/batch:  {batch_elapsed:8.3f}s  {len(samples) / batch_elapsed:10.1f} samples/sec")
+    print(f"speedup:         {single_elapsed / batch_elapsed:8.1f}x")
+
+if __name__ == "__main__":
+    main()
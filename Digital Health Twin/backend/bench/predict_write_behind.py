@@ -0,0 +1,189 @@
+"""Benchmark: /predict latency and throughput with write-behind off and on.
+
+Sends the same request sequence to /predict with PREDICTION_WRITE_MODE=sync
+and =async and reports requests/s and p50/p99 latency. --db-latency-ms adds
+a sleep before every SQL statement to mimic a database across the network
+(SQLite on local disk answers in microseconds). In async mode the run also
+waits for the writer to drain and checks every prediction was saved.
+
+The drain time is pessimistic with simulated latency: SQLite cannot return
+ids in insert order from a multi-row INSERT, so the ORM inserts row by row
+there, while on PostgreSQL each table gets one batched INSERT per flush.
+
+Then a check with two Gunicorn workers sharing one spool directory, which
+holds --segments segments left by dead workers: both writers start at once
+and race to replay them. Fails unless every spooled and every new prediction
+is saved exactly once.
+
+    python bench/predict_write_behind.py [--requests 2000] [--db-latency-ms 0,1,3] [--segments 50]
+"""
+import argparse
+import http.client
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from common import BACKEND_DIR, load_app, make_samples
+
+SEGMENT_RECORDS = 40
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def write_orphan_segments(spool_dir, segments):
+    """Spool segments as a killed worker leaves them: unlocked, nothing committed"""
+    from write_behind import SEGMENT_PREFIX, SEGMENT_SUFFIX
+
+    uuids = []
+    for index, sample in enumerate(make_samples(segments * SEGMENT_RECORDS, seed=5)):
+        if index % SEGMENT_RECORDS == 0:
+            path = os.path.join(spool_dir, f"{SEGMENT_PREFIX}{900000 + index // SEGMENT_RECORDS}-{time.time_ns()}{SEGMENT_SUFFIX}")
+        prediction_uuid = str(uuid.uuid4())
+        uuids.append(prediction_uuid)
+        water = {name: sample[name] for name in ('ph', 'turbidity', 'tds', 'people_affected_per_5000')}
+        record = {
+            'uuid': prediction_uuid,
+            'timestamp': datetime.utcnow().isoformat(),
+            'water': water,
+            'prediction': {'predicted_disease': 'None', 'health_alert': 'Water quality is safe',
+                           'model_version': '1.0', 'prediction_uuid': prediction_uuid},
+            'info': {'location': sample['location'], 'state': sample['state'], 'district': sample['district']}
+        }
+        with open(path, 'a') as segment:
+            segment.write(json.dumps(record, separators=(',', ':')) + '\n')
+    return uuids
+
+def post_prediction(port, sample):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    connection.request('POST', '/predict', json.dumps(sample), {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+def check_two_workers(segments, requests, port):
+    """Two Gunicorn workers, one spool directory with orphaned segments; True when nothing is lost"""
+    db_dir = tempfile.mkdtemp(prefix='dht-write-behind-workers-')
+    database = os.path.join(db_dir, 'bench.db')
+    spool_dir = tempfile.mkdtemp(prefix='dht-spool-shared-')
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database}', CACHE_BACKEND='none', WEB_CONCURRENCY='2',
+               GUNICORN_WORKER_CLASS='sync', PREDICTION_WRITE_MODE='async', PREDICTION_SPOOL_DIR=spool_dir)
+    subprocess.run([sys.executable, '-W', 'ignore', 'migrations.py'], cwd=BACKEND_DIR, env=env,
+                   check=True, capture_output=True)
+    spooled = write_orphan_segments(spool_dir, segments)
+    server = subprocess.Popen(
+        [sys.executable, '-W', 'ignore', '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{port}', '--access-logfile', '/dev/null',
+         '--pid', os.path.join(db_dir, 'gunicorn.pid'), 'app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                connection.request('GET', '/ready')
+                if connection.getresponse().status == 200:
+                    break
+            except OSError:
+                pass
+            if time.monotonic() > deadline or server.poll() is not None:
+                raise RuntimeError("Gunicorn did not become ready")
+            time.sleep(0.1)
+
+        # Concurrent first requests start both workers' writers, and their recovery, together
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(pool.map(lambda sample: post_prediction(port, sample), make_samples(requests, seed=6)))
+        assert all(status == 200 for status, _ in responses), responses[:3]
+        posted = [body['prediction_uuid'] for _, body in responses]
+
+        expected = set(spooled + posted)
+        deadline = time.monotonic() + 60
+        while True:
+            with sqlite3.connect(database) as connection:
+                saved = [row[0] for row in connection.execute(
+                    "SELECT prediction_uuid FROM prediction_records WHERE prediction_uuid IS NOT NULL")]
+            if set(saved) >= expected or time.monotonic() > deadline:
+                break
+            time.sleep(0.2)
+        left = [name for name in os.listdir(spool_dir) if name.startswith('predictions-')]
+    finally:
+        server.terminate()
+        server.wait()
+
+    missing = len(expected - set(saved))
+    duplicated = len(saved) - len(set(saved))
+    ok = not missing and not duplicated
+    print(f"{'✅' if ok else '❌'} 2 workers, one spool directory: {len(spooled)} predictions in {segments} orphaned "
+          f"segments + {requests} new -> {len(set(saved) & expected)} saved, {missing} missing, {duplicated} duplicated "
+          f"({len(left)} segments left, the live workers' own)")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--db-latency-ms', default='0,1,3')
+    parser.add_argument('--segments', type=int, default=50)
+    parser.add_argument('--port', type=int, default=5098)
+    args = parser.parse_args()
+
+    app = load_app(prefix="dht-write-behind-")
+    from sqlalchemy import event, func, select
+    from database import db, PredictionRecord
+    from write_behind import prediction_writer
+
+    app.config['PREDICTION_SPOOL_DIR'] = tempfile.mkdtemp(prefix='dht-spool-')
+    latency = {'seconds': 0.0}
+
+    def simulated_round_trip(conn, cursor, statement, parameters, context, executemany):
+        if latency['seconds']:
+            time.sleep(latency['seconds'])
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', simulated_round_trip)
+
+    client = app.test_client()
+    samples = make_samples(args.requests)
+    print(f"{'db latency':>10} {'mode':6} {'req/s':>8} {'p50':>8} {'p99':>8} {'drain':>8}")
+    for latency_ms in [float(value) for value in args.db_latency_ms.split(',')]:
+        latency['seconds'] = latency_ms / 1000
+        for mode in ('sync', 'async'):
+            app.config['PREDICTION_WRITE_MODE'] = mode
+            prediction_writer.init_app(app)
+            with app.app_context():
+                before = db.session.scalar(select(func.count(PredictionRecord.id)))
+
+            timings = []
+            started = time.perf_counter()
+            for sample in samples:
+                request_started = time.perf_counter()
+                response = client.post('/predict', json=sample)
+                timings.append(time.perf_counter() - request_started)
+                assert response.status_code == 200, response.get_json()
+            elapsed = time.perf_counter() - started
+
+            drain_started = time.perf_counter()
+            drained = prediction_writer.flush(timeout=120)
+            drain = time.perf_counter() - drain_started
+            with app.app_context():
+                saved = db.session.scalar(select(func.count(PredictionRecord.id))) - before
+            if not drained or saved != len(samples):
+                print(f"❌ {mode}: {saved} of {len(samples)} predictions saved")
+
+            print(f"{latency_ms:>8.1f}ms {mode:6} {len(samples) / elapsed:>8.0f} "
+                  f"{statistics.median(timings) * 1000:>6.2f}ms {percentile(timings, 0.99) * 1000:>6.2f}ms "
+                  f"{drain:>6.2f}s")
+
+    print()
+    if not check_two_workers(args.segments, 200, args.port):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Check that the hot endpoints are served by indexes, not full table scans.
+
+Calls each endpoint (reads, and the writes that look rows up, such as the
+alert deduplication in /predict) against a throwaway SQLite database,
+captures the SQL it runs and inspects `EXPLAIN QUERY PLAN` for every SELECT. Exits non-zero if
+any statement scans one of the large tables without an index, or if a keyset
+page in INDEX_ORDERED sorts its rows instead of reading them in index order.
+
+    python bench/query_plans.py
+"""
+import re
+import sys
+from datetime import datetime
+
+from common import load_app, capture_sql
+
+LARGE_TABLES = ('water_quality_records', 'prediction_records', 'health_alerts', 'health_metrics_records',
+                'water_quality_hourly_rollups', 'health_metrics_hourly_rollups')
+
+ENDPOINTS = [
+    '/records',
+    '/records?state=Assam',
+    '/alerts',
+    '/alerts?state=Assam',
+    '/statistics/Assam',
+    '/health-metrics?state=Assam',
+    '/health-metrics?state=Assam&district=Guwahati',
+    '/health-metrics?district=Guwahati',
+    '/health-metrics',
+    '/health-metrics/symptom-stats',
+    '/health-metrics/symptom-stats?state=Assam&district=Guwahati',
+    '/health-metrics/symptom-trends?state=Assam',
+    '/timeseries/water-quality?bucket=hour',
+    '/timeseries/water-quality?bucket=hour&state=Assam',
+    '/timeseries/water-quality?bucket=week&state=Assam&district=Guwahati',
+    '/timeseries/vitals?bucket=hour&state=Assam&district=Guwahati',
+    '/timeseries/vitals?state=Assam',
+]
+
+# Keyset pages (and their cursor pages) that must be a range seek in index
+# order: a temp B-tree sort reads every matching row however deep the page
+INDEX_ORDERED = ('/records?state=Assam',)
+
+# (url, JSON body) of POSTs whose lookups must be indexed too
+WRITES = [
+    ('/predict', {'ph': 7.0, 'turbidity': 9.0, 'tds': 1800, 'people_affected_per_5000': 900,
+                  'state': 'Assam', 'district': 'Guwahati', 'location': 'Well 1'}),
+    ('/predict/batch', [{'ph': 7.0, 'turbidity': 9.0, 'tds': 1800, 'people_affected_per_5000': 900,
+                         'state': 'Assam', 'district': 'Guwahati', 'location': 'Well 2'}] * 3),
+]
+
+def cursor_endpoints():
+    """Second-page URLs, so the keyset range seeks get checked too"""
+    from pagination import encode_cursor
+    cursor = encode_cursor(datetime.utcnow(), 10 ** 9)
+    return [
+        f'/records?cursor={cursor}',
+        f'/records?state=Assam&cursor={cursor}',
+        f'/alerts?cursor={cursor}',
+        f'/health-metrics?state=Assam&cursor={cursor}',
+        f'/health-metrics?cursor={cursor}',
+    ]
+
+def full_scans(plan_rows):
+    """Return the plan details that scan a large table without any index"""
+    scans = []
+    for row in plan_rows:
+        detail = row[-1]
+        match = re.match(r'SCAN (\w+)', detail)
+        if match and match.group(1) in LARGE_TABLES and 'INDEX' not in detail:
+            scans.append(detail)
+    return scans
+
+def temp_sorts(plan_rows):
+    """Return the plan details that sort the rows for ORDER BY"""
+    return [row[-1] for row in plan_rows if row[-1] == 'USE TEMP B-TREE FOR ORDER BY']
+
+def main():
+    app = load_app(prefix="dht-plans-")
+    from database import db
+
+    client = app.test_client()
+    client.post('/predict', json={'ph': 7.0, 'turbidity': 9.0, 'tds': 1800, 'people_affected_per_5000': 900,
+                                  'state': 'Assam', 'district': 'Guwahati'})
+    client.post('/health-metrics', json={'temperature': 37.5, 'state': 'Assam', 'district': 'Guwahati',
+                                         'notes': 'Symptom: Fever'})
+
+    failures = 0
+    with app.app_context():
+        engine = db.engine
+        requests = [(url, None) for url in ENDPOINTS + cursor_endpoints()] + WRITES
+        for url, body in requests:
+            with capture_sql(engine) as statements:
+                response = client.get(url) if body is None else client.post(url, json=body)
+            assert response.status_code == 200, (url, response.get_json())
+
+            selects = [(sql, params) for sql, params in statements if sql.lstrip().upper().startswith('SELECT')]
+            with engine.connect() as connection:
+                raw = connection.connection.dbapi_connection
+                for sql, params in selects:
+                    plan = raw.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+                    scans = full_scans(plan)
+                    sorts = temp_sorts(plan) if url.startswith(INDEX_ORDERED) else []
+                    status = 'FULL SCAN' if scans else 'SORT' if sorts else 'ok'
+                    print(f"{status:9} {url}")
+                    for row in plan:
+                        print(f"          {row[-1]}")
+                    failures += bool(scans or sorts)
+
+    if failures:
+        print(f"❌ {failures} statement(s) without an index, or sorting a page that should come in index order")
+        sys.exit(1)
+    print("✅ All endpoint queries use an index")
+
+if __name__ == "__main__":
+    main()
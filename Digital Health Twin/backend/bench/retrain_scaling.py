@@ -0,0 +1,82 @@
+"""Benchmark: retraining wall time and peak memory as labeled history grows.
+
+Seeds resolved alerts with confirmed outcomes (labels follow the readings,
+with 10% noise, over the last 180 days) and runs `retrain.py` against the
+database at each size, in its own process so peak memory is per run. Past
+--max-rows labeled training rows, load and fit work on a stratified sample,
+so their time and memory should level off.
+
+    python bench/retrain_scaling.py [--rows 10000,100000,1000000] [--max-rows 500000] [--search]
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from common import BACKEND_DIR, load_app
+
+DISEASES = ['None', 'Diarrhea', 'Typhoid', 'Cholera']
+
+def seed_outcomes(db, first_id, rows, seed=42):
+    """Bulk insert `rows` water readings, predictions and resolved alerts"""
+    from database import WaterQualityRecord, PredictionRecord, HealthAlert
+
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(days=180)
+    for chunk_start in range(first_id, first_id + rows, 10000):
+        water, predictions, alerts = [], [], []
+        for record_id in range(chunk_start, min(chunk_start + 10000, first_id + rows)):
+            ph, turbidity = round(rng.uniform(5.5, 8.5), 1), round(rng.uniform(1.0, 10.0), 1)
+            tds, people = rng.randint(100, 2000), rng.randint(50, 1000)
+            disease = DISEASES[(turbidity > 5) + (tds > 1000) + (ph < 6.5)]
+            if rng.random() < 0.1:
+                disease = rng.choice(DISEASES)
+            timestamp = start + timedelta(seconds=rng.uniform(0, 180 * 86400))
+            water.append({'id': record_id, 'ph': ph, 'turbidity': turbidity, 'tds': tds,
+                          'people_affected_per_5000': people, 'state': 'Assam', 'district': 'Bench',
+                          'timestamp': timestamp})
+            predictions.append({'id': record_id, 'water_quality_id': record_id, 'predicted_disease': 'Cholera',
+                                'health_alert': 'bench', 'timestamp': timestamp})
+            alerts.append({'id': record_id, 'prediction_id': record_id, 'alert_level': 'HIGH',
+                           'status': 'RESOLVED', 'confirmed_disease': disease, 'created_at': timestamp})
+        db.session.execute(WaterQualityRecord.__table__.insert(), water)
+        db.session.execute(PredictionRecord.__table__.insert(), predictions)
+        db.session.execute(HealthAlert.__table__.insert(), alerts)
+        db.session.commit()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', default='10000,100000')
+    parser.add_argument('--max-rows', type=int, default=None)
+    parser.add_argument('--search', action='store_true')
+    args = parser.parse_args()
+
+    app = load_app(prefix="dht-retrain-")
+    os.environ['MODEL_REGISTRY_DIR'] = tempfile.mkdtemp(prefix='dht-registry-')
+    from database import db
+
+    seeded = 0
+    for rows in [int(value) for value in args.rows.split(',')]:
+        with app.app_context():
+            seed_outcomes(db, seeded + 1, rows - seeded, seed=rows)
+        seeded = rows
+
+        command = [sys.executable, '-W', 'ignore', os.path.join(BACKEND_DIR, 'retrain.py'), '--version', f'bench-{rows}']
+        if args.max_rows:
+            command += ['--max-rows', str(args.max_rows)]
+        if args.search:
+            command.append('--search')
+        started = time.perf_counter()
+        output = subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, text=True).stdout
+        elapsed = time.perf_counter() - started
+        print(f"rows={rows:>8} total={elapsed:7.2f}s")
+        for line in output.splitlines():
+            if line.startswith(('⏱️', '   ', '❌')):
+                print(f"    {line.strip()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark: many worker processes writing to one SQLite file.
+
+Forks N worker processes, the way Gunicorn does after preloading the app,
+all sharing one SQLite database. Each worker runs a closed loop for
+--duration seconds: 70% writes (POST /predict and POST /health-metrics,
+with one in twenty a 200-record /health-metrics/bulk sync), 30% reads
+(/records, /health-metrics). The run is repeated with the default
+setup and with SQLITE_TUNING=1 (WAL, pragmas, single-writer lock). Reported:
+writes/s, reads/s, p99 latencies, and failed writes (a "database is
+locked" error or an unsaved prediction).
+
+    python bench/sqlite_concurrency.py [--workers 8,16] [--duration 15]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+
+from common import BACKEND_DIR, make_samples
+
+READS = ['/records?per_page=20', '/health-metrics?state=Assam&per_page=20']
+
+def worker(app, number, duration, results):
+    rng = random.Random(number)
+    samples = make_samples(500, seed=number)
+    client = app.test_client()
+    writes, reads, failures = [], [], 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        if rng.random() < 0.7:
+            roll = rng.random()
+            if roll < 0.05:
+                # An offline device syncing a day's readings
+                response = client.post('/health-metrics/bulk', json=[
+                    {'temperature': round(rng.uniform(36, 40), 1), 'state': 'Assam', 'district': 'Bench'}
+                    for _ in range(200)
+                ])
+                failed = response.status_code != 200
+            elif roll < 0.5:
+                response = client.post('/predict', json=rng.choice(samples))
+                failed = response.status_code != 200 or not response.get_json().get('saved_to_database')
+            else:
+                response = client.post('/health-metrics', json={
+                    'temperature': round(rng.uniform(36, 40), 1), 'systolic_bp': rng.randint(100, 160),
+                    'state': 'Assam', 'district': 'Bench', 'notes': 'Symptom: fever'
+                })
+                failed = response.status_code != 201
+            failures += failed
+            if not failed:
+                writes.append(time.perf_counter() - started)
+        else:
+            response = client.get(rng.choice(READS))
+            if response.status_code == 200:
+                reads.append(time.perf_counter() - started)
+    results.put((writes, reads, failures))
+
+def run(workers, duration):
+    """One profile: called in a fresh process with the environment already set"""
+    from common import load_app
+    app = load_app(prefix="dht-sqlite-")
+    # Seed reads with something to return
+    app.test_client().post('/predict/batch', json=make_samples(200))
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(app, number, duration, results)) for number in range(workers)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    writes = [value for worker_writes, _, _ in collected for value in worker_writes]
+    reads = [value for _, worker_reads, _ in collected for value in worker_reads]
+    failures = sum(worker_failures for _, _, worker_failures in collected)
+    print(f"{len(writes) / elapsed:>8.0f} {percentile(writes, 0.99) * 1000:>8.1f}ms "
+          f"{len(reads) / elapsed:>8.0f} {percentile(reads, 0.99) * 1000:>8.1f}ms {failures:>8}", flush=True)
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', default='8,16')
+    parser.add_argument('--duration', type=float, default=15)
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'profile':8} {'writes/s':>8} {'write p99':>10} {'reads/s':>8} {'read p99':>10} {'failed':>8}")
+    for workers in [int(value) for value in args.workers.split(',')]:
+        for profile in ('default', 'tuned'):
+            env = dict(os.environ, SQLITE_TUNING='1' if profile == 'tuned' else '0', CACHE_BACKEND='none')
+            # The app's startup and error messages go to stdout too; the result is the last line
+            output = subprocess.run(
+                [sys.executable, '-W', 'ignore', __file__, '--run', str(workers), str(args.duration)],
+                cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True
+            ).stdout
+            print(f"{workers:>7} {profile:8} {output.splitlines()[-1]}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        run(int(sys.argv[2]), float(sys.argv[3]))
+    else:
+        main()
@@ -0,0 +1,121 @@
+"""Benchmark: startup cost of the API, default vs FAST_START=1.
+
+For each mode, against a database already prepared with
+`python migrations.py`:
+
+  import    `python -X importtime -c "import app"`: total, and the heaviest
+            modules app.py imports directly (cumulative, median of --runs)
+  first /   Gunicorn (one worker, gunicorn.conf.py) from spawn to the first
+            200 on / (liveness)
+  ready     ... to the first 200 on /ready
+  predict   ... to the first successful POST /predict
+
+    python bench/startup_time.py [--runs 5] [--max-import-ms 0]
+
+With --max-import-ms, exits non-zero when the FAST_START import is slower,
+so it can guard against import-time regressions in CI.
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import BACKEND_DIR
+
+MODES = {'default': '0', 'fast': '1'}
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)')
+
+def import_times(env):
+    """(total ms, {direct import of app: cumulative ms})"""
+    stderr = subprocess.run(
+        [sys.executable, '-W', 'ignore', '-X', 'importtime', '-c', 'import app'],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    ).stderr
+    total, direct = None, {}
+    pending = {}
+    # Children are printed before their parent: collect depth-1 lines until app itself appears
+    for match in IMPORT_LINE.finditer(stderr):
+        cumulative_ms, depth, name = int(match.group(2)) / 1000, len(match.group(3)) // 2, match.group(4)
+        if depth == 1:
+            pending[name] = cumulative_ms
+        elif depth == 0:
+            if name == 'app':
+                total, direct = cumulative_ms, dict(pending)
+            pending = {}
+    return total, direct
+
+def wait_for(port, method, path, body, deadline, server):
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Gunicorn exited:\n{server.stderr.read()[-2000:]}")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            if response.status == 200:
+                return time.perf_counter()
+        except OSError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"No 200 from {path}")
+
+def first_responses(env, port):
+    """Seconds from spawning Gunicorn to the first 200 on /, /ready and /predict"""
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-W', 'ignore', '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{port}', '--workers', '1',
+         '--pid', os.path.join(tempfile.mkdtemp(prefix='dht-startup-pid-'), 'gunicorn.pid'), 'app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    try:
+        deadline = time.monotonic() + 120
+        sample = json.dumps({'ph': 7.0, 'turbidity': 4.0, 'tds': 500, 'people_affected_per_5000': 100})
+        return [
+            wait_for(port, method, path, body, deadline, server) - started
+            for method, path, body in (('GET', '/', None), ('GET', '/ready', None), ('POST', '/predict', sample))
+        ]
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=5098)
+    parser.add_argument('--max-import-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix='dht-startup-')
+    base_env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(db_dir, 'startup.db')}",
+                    CACHE_BACKEND='none', WEB_CONCURRENCY='1')
+    subprocess.run([sys.executable, '-W', 'ignore', 'migrations.py'], cwd=BACKEND_DIR, env=base_env,
+                   check=True, capture_output=True)
+
+    results = {}
+    for mode, fast_start in MODES.items():
+        env = dict(base_env, FAST_START=fast_start)
+        imports = [import_times(env) for _ in range(args.runs)]
+        responses = [first_responses(env, args.port) for _ in range(args.runs)]
+        total = statistics.median(run[0] for run in imports)
+        direct = {name: statistics.median(run[1].get(name, 0) for run in imports) for name in imports[0][1]}
+        results[mode] = total
+        first, ready, predict = (statistics.median(run[index] for run in responses) * 1000 for index in range(3))
+
+        print(f"{mode}: import {total:.0f}ms | first / {first:.0f}ms | ready {ready:.0f}ms | first /predict {predict:.0f}ms")
+        heaviest = sorted(direct.items(), key=lambda item: item[1], reverse=True)[:6]
+        print("    heaviest imports: " + ", ".join(f"{name} {ms:.0f}ms" for name, ms in heaviest))
+
+    if args.max_import_ms and results['fast'] > args.max_import_ms:
+        print(f"❌ FAST_START import takes {results['fast']:.0f}ms, budget {args.max_import_ms:.0f}ms")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Benchmark and check: /timeseries/water-quality and /timeseries/vitals over a large history.
+
+Seeds --predictions predictions and --vitals health metrics records over the
+past year (SQLite, generated in SQL), spread over 200 districts of 10 states,
+and builds the rollups. Then, for a district, a state and all states:
+
+  1. fails if a one-year daily series differs from the same buckets computed
+     from the raw rows
+  2. times one-year day and week series, two weeks of hours, and one year
+     asked for by the hour (downsampled), median of --runs, against GROUP BY
+     on the raw rows; fails if a district or state query over the rollups
+     takes longer than --max-ms
+
+    python bench/timeseries.py [--predictions 5000000] [--vitals 2000000] [--runs 5] [--max-ms 50]
+"""
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import load_app
+
+DISTRICTS = 200
+SCOPES = (
+    ('district', 'state=State 7&district=District 7'),
+    ('state', 'state=State 7'),
+    ('all', ''),
+)
+
+def seed(db, predictions, vitals, today):
+    """Raw rows evenly spaced over the 365 days before `today`"""
+    from sqlalchemy import text
+
+    start = (today - timedelta(days=365)).isoformat()
+    sequence = "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < :rows) "
+    # Microseconds as SQLAlchemy stores them, so the rows compare with bound datetimes
+    timestamp = "strftime('%Y-%m-%d %H:%M:%f', julianday(:start) + (n - 1) * :step) || '000'"
+    location = f"'State ' || (n % {DISTRICTS} % 10), 'District ' || (n % {DISTRICTS})"
+    parameters = {'rows': predictions, 'start': start, 'step': 365 / predictions}
+    db.session.execute(text(
+        sequence + "INSERT INTO water_quality_records "
+        "(id, ph, turbidity, tds, people_affected_per_5000, location, state, district, collected_by, timestamp) "
+        f"SELECT n, 6.0 + (n % 25) / 10.0, (n % 97) / 4.0, 200 + (n * 7) % 1800, 100, 'Bench', {location}, "
+        f"'BENCH', {timestamp} FROM seq"
+    ), parameters)
+    db.session.execute(text(
+        sequence + "INSERT INTO prediction_records (id, water_quality_id, predicted_disease, health_alert, timestamp) "
+        f"SELECT n, n, CASE n % 4 WHEN 0 THEN 'Cholera' WHEN 1 THEN 'Typhoid' ELSE 'None' END, 'Bench', {timestamp} FROM seq"
+    ), parameters)
+    parameters = {'rows': vitals, 'start': start, 'step': 365 / vitals}
+    db.session.execute(text(
+        sequence + "INSERT INTO health_metrics_records "
+        "(id, temperature, systolic_bp, diastolic_bp, blood_oxygen, state, district, recorded_by, timestamp) "
+        "SELECT n, 36.0 + (n % 30) / 10.0, 100 + n % 60, 60 + n % 35, "
+        f"CASE WHEN n % 5 = 0 THEN NULL ELSE 90 + n % 10 END, {location}, 'BENCH', {timestamp} FROM seq"
+    ), parameters)
+    db.session.commit()
+
+def register_raw_routes(app):
+    """The same series computed by GROUP BY over the raw rows, for comparison"""
+    from flask import request, jsonify
+    from sqlalchemy import func
+    from database import db, WaterQualityRecord, PredictionRecord, HealthMetricsRecord, ROLLUP_VITALS
+
+    def raw_series(kind):
+        bucket = request.args.get('bucket', 'day')
+        end = datetime.fromisoformat(request.args['end'])
+        start = datetime.fromisoformat(request.args['start'])
+        if kind == 'water-quality':
+            timestamp, columns = PredictionRecord.timestamp, [WaterQualityRecord.ph, WaterQualityRecord.turbidity, WaterQualityRecord.tds]
+            model, count = WaterQualityRecord, func.count(PredictionRecord.id)
+        else:
+            timestamp, columns = HealthMetricsRecord.timestamp, [getattr(HealthMetricsRecord, vital) for vital in ROLLUP_VITALS]
+            model, count = HealthMetricsRecord, func.count(HealthMetricsRecord.id)
+        if bucket == 'hour':
+            key = func.strftime('%Y-%m-%dT%H:00:00', timestamp)
+        elif bucket == 'week':
+            key = func.date(timestamp, 'weekday 0', '-6 days')
+        else:
+            key = func.date(timestamp)
+        query = db.session.query(key.label('bucket'), count.label('count'), *[
+            aggregate(column) for column in columns for aggregate in (func.count, func.avg, func.min, func.max)
+        ])
+        if kind == 'water-quality':
+            query = query.join(WaterQualityRecord, PredictionRecord.water_quality_id == WaterQualityRecord.id)
+        for name in ('state', 'district'):
+            if request.args.get(name):
+                query = query.filter(getattr(model, name) == request.args[name])
+        rows = query.filter(timestamp >= start, timestamp < end).group_by(key).order_by(key).all()
+        names = [column.name for column in columns]
+        return jsonify({'series': [
+            {'time': row[0], 'count': row[1], **{
+                name: {'count': row[2 + index * 4], 'mean': round(row[3 + index * 4], 2) if row[2 + index * 4] else None,
+                       'min': row[4 + index * 4], 'max': row[5 + index * 4]}
+                for index, name in enumerate(names)
+            }}
+            for row in rows
+        ]})
+
+    app.add_url_rule('/bench/raw/<kind>', 'bench_raw_series', raw_series)
+
+def median_ms(client, url, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.get_json()
+    return statistics.median(timings) * 1000, response.get_json()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--predictions', type=int, default=5000000)
+    parser.add_argument('--vitals', type=int, default=2000000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    app = load_app(prefix="dht-timeseries-")
+    from database import db
+    from rollups import rebuild_rollups
+
+    register_raw_routes(app)
+    now = datetime.utcnow()
+    today = datetime(now.year, now.month, now.day)
+    with app.app_context():
+        started = time.perf_counter()
+        seed(db, args.predictions, args.vitals, today)
+        print(f"seeded {args.predictions} predictions and {args.vitals} vitals in {time.perf_counter() - started:.0f}s")
+        started = time.perf_counter()
+        rebuild_rollups()
+        db.session.commit()
+        print(f"built rollups in {time.perf_counter() - started:.0f}s")
+    client = app.test_client()
+    failed = False
+
+    year = f"start={(today - timedelta(days=365)).isoformat()}&end={today.isoformat()}"
+    fortnight = f"start={(today - timedelta(days=14)).isoformat()}&end={today.isoformat()}"
+    for kind in ('water-quality', 'vitals'):
+        for scope, filters in SCOPES:
+            _, served = median_ms(client, f'/timeseries/{kind}?bucket=day&{year}&{filters}', 1)
+            _, raw = median_ms(client, f'/bench/raw/{kind}?bucket=day&{year}&{filters}', 1)
+            for point in served['series']:
+                point['time'] = point['time'][:10]
+            same = served['series'] == raw['series']
+            failed |= not same
+            print(f"{'✅' if same else '❌'} {kind} {scope}: one year of days {'matches' if same else 'differs from'} the raw rows "
+                  f"({len(served['series'])} buckets)")
+
+    print(f"\nmedian of {args.runs}, rollups vs GROUP BY over the raw rows:")
+    for kind in ('water-quality', 'vitals'):
+        for scope, filters in SCOPES:
+            for label, bucket, span in (('year by day', 'day', year), ('year by week', 'week', year),
+                                        ('2 weeks by hour', 'hour', fortnight), ('year by hour', 'hour', year)):
+                served_ms, served = median_ms(client, f'/timeseries/{kind}?bucket={bucket}&{span}&{filters}', args.runs)
+                raw_ms, _ = median_ms(client, f'/bench/raw/{kind}?bucket={served["bucket"]}&{span}&{filters}', 1)
+                ok = scope == 'all' or served_ms <= args.max_ms
+                failed |= not ok
+                print(f"{'✅' if ok else '❌'} {kind:13} {scope:8} {label:16} -> {len(served['series']):>4} {served['bucket']} buckets  "
+                      f"rollups {served_ms:7.1f}ms  raw {raw_ms:8.1f}ms")
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -12,8 +12,10 @@ mkdir -p data
 # Set up the database
 python -c "
 from app import app, db
+from migrations import run_migrations
 with app.app_context():
     db.create_all()
+    run_migrations()
     print('Database tables created successfully')
 "
 
@@ -0,0 +1,233 @@
+"""Response cache for the polled read endpoints.
+
+Dashboards poll /dashboard, /statistics/<state>, /alerts and friends every
+few seconds from many tabs. Responses are cached by endpoint + query args,
+expire after a TTL, and are invalidated when a write touches their state.
+
+Invalidation uses tag versions instead of deleting keys: every cached entry
+depends on one tag such as `predictions:Assam` (or `predictions:*` for the
+national views), and the tag's current version is part of the cache key.
+A write bumps the versions of the tags it affects, so stale entries are
+simply never read again and age out through the TTL / LRU.
+
+Backends (CACHE_BACKEND):
+    memory  in-process LRU (default). Each Gunicorn worker has its own cache,
+            so invalidation only reaches the worker that handled the write;
+            the TTL bounds staleness in the other workers.
+    redis   shared by all workers (CACHE_URL, default redis://localhost:6379/0).
+            Works with any Redis-compatible server. Needs the `redis` package.
+    none    caching disabled.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, Response, jsonify
+
+# Response headers worth replaying from the cache (pagination cursors, totals)
+CACHED_HEADER_PREFIX = 'X-'
+
+class MemoryBackend:
+    """Thread-safe in-process LRU with per-entry expiry"""
+    name = 'memory'
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.tag_versions = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def tag_version(self, tag):
+        with self.lock:
+            return self.tag_versions.get(tag, 0)
+
+    def bump_tags(self, tags):
+        with self.lock:
+            for tag in tags:
+                self.tag_versions[tag] = self.tag_versions.get(tag, 0) + 1
+
+    def incr(self, counter):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + 1
+
+    def counter(self, counter):
+        with self.lock:
+            return self.counters.get(counter, 0)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tag_versions.clear()
+            self.counters.clear()
+
+class RedisBackend:
+    """Shared cache in a Redis-compatible server"""
+    name = 'redis'
+    prefix = 'dht:cache:'
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis needs the 'redis' package (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def tag_version(self, tag):
+        return int(self.client.get(self.prefix + 'tag:' + tag) or 0)
+
+    def bump_tags(self, tags):
+        pipeline = self.client.pipeline()
+        for tag in tags:
+            pipeline.incr(self.prefix + 'tag:' + tag)
+        pipeline.execute()
+
+    def incr(self, counter):
+        self.client.incr(self.prefix + 'stats:' + counter)
+
+    def counter(self, counter):
+        return int(self.client.get(self.prefix + 'stats:' + counter) or 0)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+def _encode_entry(response):
+    headers = {name: value for name, value in response.headers.items() if name.startswith(CACHED_HEADER_PREFIX)}
+    meta = json.dumps({'mimetype': response.mimetype, 'etag': response.get_etag()[0], 'headers': headers})
+    return meta.encode() + b'\n' + response.get_data()
+
+def _decode_entry(value):
+    meta, body = value.split(b'\n', 1)
+    return json.loads(meta), body
+
+class ResponseCache:
+    """Flask extension: `response_cache.init_app(app)`, then decorate views with `cached(...)`"""
+
+    def __init__(self):
+        self.backend = None
+        self.default_ttl = 10
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 10)
+        if backend == 'memory':
+            self.backend = MemoryBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        elif backend == 'redis':
+            self.backend = RedisBackend(app.config.get('CACHE_URL', 'redis://localhost:6379/0'))
+        elif backend == 'none':
+            self.backend = None
+        else:
+            raise ValueError(f"Unknown CACHE_BACKEND: {backend} (use memory, redis or none)")
+
+    @staticmethod
+    def tag(domain, state=None):
+        return f"{domain}:{state if state else '*'}"
+
+    def invalidate(self, domain, states):
+        """Called after a committed write to `domain` that touched `states`"""
+        if self.backend is None:
+            return
+        tags = {self.tag(domain)} | {self.tag(domain, state) for state in states if state}
+        try:
+            self.backend.bump_tags(tags)
+            self.backend.incr('invalidations')
+        except Exception as e:
+            print(f"❌ Cache invalidation failed: {e}")
+
+    def stats(self):
+        if self.backend is None:
+            return {'backend': 'none'}
+        hits = self.backend.counter('hits')
+        misses = self.backend.counter('misses')
+        return {
+            'backend': self.backend.name,
+            'hits': hits,
+            'misses': misses,
+            'invalidations': self.backend.counter('invalidations'),
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None
+        }
+
+    def cached(self, domain, ttl=None):
+        """Cache a GET view's 200 responses and answer If-None-Match with 304.
+
+        The entry depends on the `state` view arg or query arg if present,
+        otherwise on the whole `domain`.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return self._conditional(view(*args, **kwargs))
+
+                state = request.view_args.get('state') or request.args.get('state')
+                tag = self.tag(domain, state)
+                try:
+                    version = self.backend.tag_version(tag)
+                    key = f"{request.path}?{sorted(request.args.items(multi=True))}#{tag}@{version}"
+                    key = hashlib.sha1(key.encode()).hexdigest()
+                    entry = self.backend.get(key)
+                except Exception as e:
+                    print(f"❌ Cache lookup failed: {e}")
+                    return self._conditional(view(*args, **kwargs))
+
+                if entry is not None:
+                    self.backend.incr('hits')
+                    meta, body = _decode_entry(entry)
+                    response = Response(body, mimetype=meta['mimetype'], headers=meta['headers'])
+                    response.set_etag(meta['etag'])
+                    response.headers['X-Cache'] = 'HIT'
+                    return response.make_conditional(request)
+
+                self.backend.incr('misses')
+                response = self._conditional(view(*args, **kwargs), make_conditional=False)
+                if response.status_code == 200:
+                    self.backend.set(key, _encode_entry(response), ttl or self.default_ttl)
+                response.headers['X-Cache'] = 'MISS'
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _conditional(result, make_conditional=True):
+        """Turn a view result into a Response with a content-hash ETag"""
+        if isinstance(result, tuple):
+            response = jsonify(result[0]) if not isinstance(result[0], Response) else result[0]
+            response.status_code = result[1]
+        else:
+            response = result if isinstance(result, Response) else jsonify(result)
+        if response.status_code == 200 and not response.is_streamed:
+            response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+            if make_conditional:
+                response.make_conditional(request)
+        return response
+
+response_cache = ResponseCache()
@@ -0,0 +1,117 @@
+"""Vectorized confidence scoring over historical predictions.
+
+Older prediction rows were stored before confidence scores existed. This job
+re-scores their water quality readings in chunks with one batched
+predict_proba call per chunk and fills in confidence_score,
+confidence_margin and class_probabilities for the label that was stored.
+It can also summarize how confident the model is per predicted disease.
+
+    python calibration.py backfill
+    python calibration.py report
+"""
+import sys
+import numpy as np
+from sqlalchemy import bindparam, select, update
+from database import db, WaterQualityRecord, PredictionRecord
+from model.predict import predict_proba_batch
+from sqlite_writer import sqlite_writer
+
+CHUNK_SIZE = 5000
+CONFIDENCE_BINS = np.linspace(0.0, 1.0, 11)
+
+def score_history(only_missing=True, chunk_size=CHUNK_SIZE):
+    """Yield (prediction ids, stored labels, classes, probabilities) chunk by chunk"""
+    last_id = 0
+    while True:
+        statement = select(
+            PredictionRecord.id,
+            PredictionRecord.predicted_disease,
+            WaterQualityRecord.ph,
+            WaterQualityRecord.turbidity,
+            WaterQualityRecord.tds,
+            WaterQualityRecord.people_affected_per_5000
+        ).join(WaterQualityRecord, PredictionRecord.water_quality_id == WaterQualityRecord.id)\
+         .where(PredictionRecord.id > last_id)\
+         .order_by(PredictionRecord.id)\
+         .limit(chunk_size)
+        if only_missing:
+            statement = statement.where(PredictionRecord.confidence_score.is_(None))
+
+        rows = db.session.execute(statement).all()
+        if not rows:
+            return
+
+        ids = np.array([row[0] for row in rows])
+        labels = np.array([row[1] for row in rows])
+        classes, probabilities = predict_proba_batch(np.array([row[2:] for row in rows], dtype=np.float64))
+        yield ids, labels, classes, probabilities
+        last_id = int(ids[-1])
+
+def confidence_for_labels(labels, classes, probabilities):
+    """Confidence and margin of each stored label, computed for the whole chunk at once"""
+    class_index = {str(label): index for index, label in enumerate(classes)}
+    columns = np.array([class_index.get(str(label), -1) for label in labels])
+    known = columns >= 0
+
+    rows = np.arange(len(labels))
+    confidence = np.where(known, probabilities[rows, np.maximum(columns, 0)], np.nan)
+    others = probabilities.copy()
+    others[rows[known], columns[known]] = -np.inf
+    margin = confidence - others.max(axis=1)
+    return confidence, margin, known
+
+def backfill(only_missing=True):
+    updated = 0
+    statement = update(PredictionRecord.__table__)\
+        .where(PredictionRecord.__table__.c.id == bindparam('record_id'))\
+        .values(
+            confidence_score=bindparam('confidence'),
+            confidence_margin=bindparam('margin'),
+            class_probabilities=bindparam('probabilities')
+        )
+
+    for ids, labels, classes, probabilities in score_history(only_missing):
+        confidence, margin, known = confidence_for_labels(labels, classes, probabilities)
+        class_names = [str(label) for label in classes]
+        rows = [
+            {
+                'record_id': int(record_id),
+                'confidence': round(float(confidence[index]), 4),
+                'margin': round(float(margin[index]), 4),
+                'probabilities': {name: round(float(p), 4) for name, p in zip(class_names, probabilities[index])}
+            }
+            for index, record_id in enumerate(ids)
+            if known[index]
+        ]
+        if rows:
+            with sqlite_writer.lock():
+                db.session.connection().execute(statement, rows)
+                db.session.commit()
+        updated += len(rows)
+    return updated
+
+def report():
+    """Histogram of the model's confidence in each stored label, over all history"""
+    histograms = {}
+    for _, labels, classes, probabilities in score_history(only_missing=False):
+        confidence, _, known = confidence_for_labels(labels, classes, probabilities)
+        for label in np.unique(labels[known]):
+            counts, _ = np.histogram(confidence[known & (labels == label)], bins=CONFIDENCE_BINS)
+            histograms[label] = histograms.get(label, 0) + counts
+    return histograms
+
+if __name__ == "__main__":
+    from app import app
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'report'
+    with app.app_context():
+        if command == 'backfill':
+            print(f"✅ Backfilled confidence for {backfill()} prediction records")
+        elif command == 'report':
+            edges = [f"{low:.1f}-{high:.1f}" for low, high in zip(CONFIDENCE_BINS[:-1], CONFIDENCE_BINS[1:])]
+            print(f"{'disease':10} " + " ".join(f"{edge:>8}" for edge in edges))
+            for label, counts in sorted(report().items()):
+                print(f"{label:10} " + " ".join(f"{count:>8}" for count in counts))
+        else:
+            print(f"Unknown command: {command} (expected 'backfill' or 'report')")
+            sys.exit(2)
@@ -1,14 +1,77 @@
+import json
 import os
-from datetime import datetime
+import sqlite3
+from datetime import datetime, timedelta
+from types import SimpleNamespace
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import text
+from sqlalchemy import text, event, select
+from sqlalchemy.engine import Engine
+from cache import response_cache
+from sqlite_writer import sqlite_writer
+from alert_stream import alert_bus
 
 # SQLAlchemy instance
 db = SQLAlchemy()
 
+class SQLitePercentileCont:
+    """percentile_cont(value, fraction) aggregate for SQLite, matching Postgres'
+    `percentile_cont(fraction) WITHIN GROUP (ORDER BY value)`"""
+    
+    def __init__(self):
+        self.values = []
+        self.fraction = None
+    
+    def step(self, value, fraction):
+        self.fraction = fraction
+        if value is not None:
+            self.values.append(value)
+    
+    def finalize(self):
+        if not self.values:
+            return None
+        self.values.sort()
+        position = (len(self.values) - 1) * self.fraction
+        lower = int(position)
+        upper = min(lower + 1, len(self.values) - 1)
+        return self.values[lower] + (self.values[upper] - self.values[lower]) * (position - lower)
+
+@event.listens_for(Engine, "connect")
+def register_sqlite_functions(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_aggregate('percentile_cont', 2, SQLitePercentileCont)
+
+def engine_options(database_url, workers=1, concurrency=1, background_threads=1, max_connections=90,
+                   pool_size=None, max_overflow=None, pool_recycle=1800, pool_timeout=10):
+    """Connection pool settings for one server process (SQLALCHEMY_ENGINE_OPTIONS).
+
+    Each of the `workers` processes gets an equal share of `max_connections`,
+    so together they never exceed it. A worker needs one connection per
+    request it serves at once (`concurrency`: 1 for sync workers, up to
+    worker_connections for gevent) plus one for each enabled background
+    thread that holds a session of its own (`background_threads`), so those
+    threads never queue behind requests for a connection. With the default
+    max_overflow=0 the share is a hard cap: excess requests wait up to
+    `pool_timeout` seconds for a connection instead of opening more.
+    """
+    if database_url.startswith('sqlite'):
+        return {}
+    share = max(2, max_connections // max(1, workers))
+    return {
+        'pool_size': pool_size if pool_size is not None else min(concurrency + background_threads, share),
+        'max_overflow': max_overflow if max_overflow is not None else 0,
+        # Drop connections the server, a proxy or a failover closed while idle
+        'pool_pre_ping': True,
+        'pool_recycle': pool_recycle,
+        'pool_timeout': pool_timeout
+    }
+
 # Models
 class WaterQualityRecord(db.Model):
     __tablename__ = 'water_quality_records'
+    __table_args__ = (
+        # /records, /statistics/<state> and /dashboard filter or group by state
+        db.Index('ix_water_quality_state_district', 'state', 'district'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     ph = db.Column(db.Float, nullable=False)
@@ -37,13 +100,26 @@ class WaterQualityRecord(db.Model):
 
 class PredictionRecord(db.Model):
     __tablename__ = 'prediction_records'
+    __table_args__ = (
+        # /records sorts by timestamp; joins from water records go through water_quality_id
+        db.Index('ix_prediction_records_timestamp', 'timestamp'),
+        # /records?state= pages straight off this one, newest first
+        db.Index('ix_prediction_records_state_ts', 'state', 'timestamp', 'id'),
+        db.Index('ix_prediction_records_water_quality', 'water_quality_id', 'predicted_disease'),
+        # Write-behind replay skips predictions that were already persisted
+        db.Index('ix_prediction_records_uuid', 'prediction_uuid', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     water_quality_id = db.Column(db.Integer, db.ForeignKey('water_quality_records.id'), nullable=False)
     predicted_disease = db.Column(db.String(100), nullable=False)
     health_alert = db.Column(db.Text, nullable=False)
-    confidence_score = db.Column(db.Float, nullable=True)
+    confidence_score = db.Column(db.Float, nullable=True)  # probability of the predicted class
+    confidence_margin = db.Column(db.Float, nullable=True)  # gap to the runner-up class
+    class_probabilities = db.Column(db.JSON, nullable=True)
     model_version = db.Column(db.String(20), default='1.0')
+    prediction_uuid = db.Column(db.String(36), nullable=True)  # ID handed to the client before persisting
+    state = db.Column(db.String(50), nullable=True)  # copy of the reading's state, for the /records?state= index
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationship
@@ -56,7 +132,10 @@ class PredictionRecord(db.Model):
             'predicted_disease': self.predicted_disease,
             'health_alert': self.health_alert,
             'confidence_score': self.confidence_score,
+            'confidence_margin': self.confidence_margin,
+            'class_probabilities': self.class_probabilities,
             'model_version': self.model_version,
+            'prediction_uuid': self.prediction_uuid,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None,
             'water_quality': self.water_quality.to_dict() if self.water_quality else None
         }
@@ -89,6 +168,13 @@ class HealthWorker(db.Model):
 
 class HealthAlert(db.Model):
     __tablename__ = 'health_alerts'
+    __table_args__ = (
+        # /alerts filters by status and sorts by created_at
+        db.Index('ix_health_alerts_status_created', 'status', 'created_at'),
+        db.Index('ix_health_alerts_prediction', 'prediction_id'),
+        # Write-time lookup of the open alert a repeated reading belongs to
+        db.Index('ix_health_alerts_dedup', 'dedup_key', 'last_seen_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     prediction_id = db.Column(db.Integer, db.ForeignKey('prediction_records.id'), nullable=False)
@@ -96,6 +182,12 @@ class HealthAlert(db.Model):
     status = db.Column(db.String(20), default='ACTIVE')  # ACTIVE, RESOLVED, INVESTIGATING
     assigned_to = db.Column(db.Integer, db.ForeignKey('health_workers.id'), nullable=True)
     notes = db.Column(db.Text, nullable=True)
+    # Disease confirmed on resolution ('None' for a false alarm); the retraining label
+    confirmed_disease = db.Column(db.String(100), nullable=True)
+    # state|district|location|disease of the reading; None (never merged) without a location
+    dedup_key = db.Column(db.String(310), nullable=True)
+    occurrence_count = db.Column(db.Integer, default=1)  # readings merged into this alert
+    last_seen_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -111,14 +203,40 @@ class HealthAlert(db.Model):
             'status': self.status,
             'assigned_to': self.assigned_to,
             'notes': self.notes,
+            'confirmed_disease': self.confirmed_disease,
+            'occurrence_count': self.occurrence_count,
+            'last_seen_at': self.last_seen_at.isoformat() if self.last_seen_at else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'prediction': self.prediction.to_dict() if self.prediction else None,
             'assigned_worker': self.assigned_worker.to_dict() if self.assigned_worker else None
         }
 
+class AlertEvent(db.Model):
+    """Append-only log of alert changes: the /alerts/stream feed and its Last-Event-ID replay"""
+    __tablename__ = 'alert_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    alert_id = db.Column(db.Integer, nullable=False)
+    event = db.Column(db.String(20), nullable=False)  # alert.created, alert.updated
+    state = db.Column(db.String(50), nullable=True)
+    district = db.Column(db.String(50), nullable=True)
+    payload = db.Column(db.Text, nullable=False)  # the alert as an /alerts item, JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class HealthMetricsRecord(db.Model):
     __tablename__ = 'health_metrics_records'
+    __table_args__ = (
+        # /health-metrics filters by state/district and sorts by timestamp
+        db.Index('ix_health_metrics_state_district_ts', 'state', 'district', 'timestamp'),
+        db.Index('ix_health_metrics_state_ts', 'state', 'timestamp'),
+        db.Index('ix_health_metrics_district_ts', 'district', 'timestamp'),
+        db.Index('ix_health_metrics_timestamp', 'timestamp'),
+        # /health-metrics/symptom-stats groups by symptom; the index alone answers it
+        db.Index('ix_health_metrics_symptom', 'symptom', 'state', 'district', 'timestamp'),
+        # Bulk sync skips records whose client UUID is already stored
+        db.Index('ix_health_metrics_client_uuid', 'client_uuid', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     temperature = db.Column(db.Float, nullable=True)  # in Celsius
@@ -133,6 +251,8 @@ class HealthMetricsRecord(db.Model):
     district = db.Column(db.String(50), nullable=True)
     recorded_by = db.Column(db.String(100), nullable=True)  # ASHA worker ID
     notes = db.Column(db.Text, nullable=True)
+    symptom = db.Column(db.String(100), nullable=True)  # parsed from "Symptom: ..." notes
+    client_uuid = db.Column(db.String(36), nullable=True)  # set by the device, makes re-sent syncs idempotent
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
@@ -150,9 +270,215 @@ class HealthMetricsRecord(db.Model):
             'district': self.district,
             'recorded_by': self.recorded_by,
             'notes': self.notes,
+            'symptom': self.symptom,
+            'client_uuid': self.client_uuid,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None
         }
 
+class PredictionRollup(db.Model):
+    """Per-(state, district, disease, day) prediction counts and water quality sums and bounds.
+
+    Kept current on every write so dashboards never re-aggregate raw rows.
+    Missing state/district are stored as '' so the unique key works for upserts.
+    """
+    __tablename__ = 'prediction_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('state', 'district', 'predicted_disease', 'day', name='uq_prediction_rollups_key'),
+        # /timeseries without a state filter reads a range of days
+        db.Index('ix_prediction_rollups_day', 'day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    state = db.Column(db.String(50), nullable=False, default='')
+    district = db.Column(db.String(50), nullable=False, default='')
+    predicted_disease = db.Column(db.String(100), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+    ph_sum = db.Column(db.Float, nullable=False, default=0)
+    turbidity_sum = db.Column(db.Float, nullable=False, default=0)
+    tds_sum = db.Column(db.Float, nullable=False, default=0)
+    ph_min = db.Column(db.Float, nullable=True)
+    ph_max = db.Column(db.Float, nullable=True)
+    turbidity_min = db.Column(db.Float, nullable=True)
+    turbidity_max = db.Column(db.Float, nullable=True)
+    tds_min = db.Column(db.Float, nullable=True)
+    tds_max = db.Column(db.Float, nullable=True)
+
+class WaterQualityHourlyRollup(db.Model):
+    """Per-(state, district, hour) water quality counts, sums and bounds, for hourly /timeseries"""
+    __tablename__ = 'water_quality_hourly_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('state', 'district', 'hour', name='uq_water_quality_hourly_rollups_key'),
+        db.Index('ix_water_quality_hourly_rollups_hour', 'hour'),
+        db.Index('ix_water_quality_hourly_rollups_state_hour', 'state', 'hour'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    state = db.Column(db.String(50), nullable=False, default='')
+    district = db.Column(db.String(50), nullable=False, default='')
+    hour = db.Column(db.DateTime, nullable=False)
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+    ph_sum = db.Column(db.Float, nullable=False, default=0)
+    ph_min = db.Column(db.Float, nullable=True)
+    ph_max = db.Column(db.Float, nullable=True)
+    turbidity_sum = db.Column(db.Float, nullable=False, default=0)
+    turbidity_min = db.Column(db.Float, nullable=True)
+    turbidity_max = db.Column(db.Float, nullable=True)
+    tds_sum = db.Column(db.Float, nullable=False, default=0)
+    tds_min = db.Column(db.Float, nullable=True)
+    tds_max = db.Column(db.Float, nullable=True)
+
+class HealthMetricsRollup(db.Model):
+    """Per-(state, district, day) vitals counts, sums and bounds.
+
+    Each vital keeps its own count because any of them may be missing on a record.
+    """
+    __tablename__ = 'health_metrics_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('state', 'district', 'day', name='uq_health_metrics_rollups_key'),
+        db.Index('ix_health_metrics_rollups_day', 'day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    state = db.Column(db.String(50), nullable=False, default='')
+    district = db.Column(db.String(50), nullable=False, default='')
+    day = db.Column(db.Date, nullable=False)
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+    temperature_count = db.Column(db.Integer, nullable=False, default=0)
+    temperature_sum = db.Column(db.Float, nullable=False, default=0)
+    temperature_min = db.Column(db.Float, nullable=True)
+    temperature_max = db.Column(db.Float, nullable=True)
+    systolic_bp_count = db.Column(db.Integer, nullable=False, default=0)
+    systolic_bp_sum = db.Column(db.Float, nullable=False, default=0)
+    systolic_bp_min = db.Column(db.Float, nullable=True)
+    systolic_bp_max = db.Column(db.Float, nullable=True)
+    diastolic_bp_count = db.Column(db.Integer, nullable=False, default=0)
+    diastolic_bp_sum = db.Column(db.Float, nullable=False, default=0)
+    diastolic_bp_min = db.Column(db.Float, nullable=True)
+    diastolic_bp_max = db.Column(db.Float, nullable=True)
+    blood_oxygen_count = db.Column(db.Integer, nullable=False, default=0)
+    blood_oxygen_sum = db.Column(db.Float, nullable=False, default=0)
+    blood_oxygen_min = db.Column(db.Float, nullable=True)
+    blood_oxygen_max = db.Column(db.Float, nullable=True)
+
+class HealthMetricsHourlyRollup(db.Model):
+    """Per-(state, district, hour) vitals counts, sums and bounds, for hourly /timeseries"""
+    __tablename__ = 'health_metrics_hourly_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('state', 'district', 'hour', name='uq_health_metrics_hourly_rollups_key'),
+        db.Index('ix_health_metrics_hourly_rollups_hour', 'hour'),
+        db.Index('ix_health_metrics_hourly_rollups_state_hour', 'state', 'hour'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    state = db.Column(db.String(50), nullable=False, default='')
+    district = db.Column(db.String(50), nullable=False, default='')
+    hour = db.Column(db.DateTime, nullable=False)
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+    temperature_count = db.Column(db.Integer, nullable=False, default=0)
+    temperature_sum = db.Column(db.Float, nullable=False, default=0)
+    temperature_min = db.Column(db.Float, nullable=True)
+    temperature_max = db.Column(db.Float, nullable=True)
+    systolic_bp_count = db.Column(db.Integer, nullable=False, default=0)
+    systolic_bp_sum = db.Column(db.Float, nullable=False, default=0)
+    systolic_bp_min = db.Column(db.Float, nullable=True)
+    systolic_bp_max = db.Column(db.Float, nullable=True)
+    diastolic_bp_count = db.Column(db.Integer, nullable=False, default=0)
+    diastolic_bp_sum = db.Column(db.Float, nullable=False, default=0)
+    diastolic_bp_min = db.Column(db.Float, nullable=True)
+    diastolic_bp_max = db.Column(db.Float, nullable=True)
+    blood_oxygen_count = db.Column(db.Integer, nullable=False, default=0)
+    blood_oxygen_sum = db.Column(db.Float, nullable=False, default=0)
+    blood_oxygen_min = db.Column(db.Float, nullable=True)
+    blood_oxygen_max = db.Column(db.Float, nullable=True)
+
+class OutbreakAlert(db.Model):
+    """A cluster of same-disease predictions in one district, raised by outbreaks.py.
+
+    ACTIVE while the district's CUSUM statistic stays above zero, ENDED once it resets.
+    """
+    __tablename__ = 'outbreak_alerts'
+    __table_args__ = (
+        db.Index('ix_outbreak_alerts_status_created', 'status', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    state = db.Column(db.String(50), nullable=False, default='')
+    district = db.Column(db.String(50), nullable=False, default='')
+    predicted_disease = db.Column(db.String(100), nullable=False)
+    alert_level = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='ACTIVE')  # ACTIVE, ENDED
+    window_start = db.Column(db.Date, nullable=False)  # first day above baseline
+    window_end = db.Column(db.Date, nullable=False)  # latest day of the cluster seen so far
+    case_count = db.Column(db.Integer, nullable=False)
+    expected_count = db.Column(db.Float, nullable=False)
+    score = db.Column(db.Float, nullable=False)  # peak CUSUM, in standard deviations
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'state': self.state,
+            'district': self.district,
+            'predicted_disease': self.predicted_disease,
+            'alert_level': self.alert_level,
+            'status': self.status,
+            'window_start': self.window_start.isoformat(),
+            'window_end': self.window_end.isoformat(),
+            'case_count': self.case_count,
+            'expected_count': round(self.expected_count, 2),
+            'score': round(self.score, 2),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class OutbreakBaseline(db.Model):
+    """Per-(state, district, disease) detector state: the open day's count, the
+    baseline of daily counts (EWMA mean and variance) and the CUSUM so far."""
+    __tablename__ = 'outbreak_baselines'
+    __table_args__ = (
+        db.UniqueConstraint('state', 'district', 'predicted_disease', name='uq_outbreak_baselines_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    state = db.Column(db.String(50), nullable=False, default='')
+    district = db.Column(db.String(50), nullable=False, default='')
+    predicted_disease = db.Column(db.String(100), nullable=False)
+    day = db.Column(db.Date, nullable=False)  # the open (not yet scored) day
+    day_count = db.Column(db.Integer, nullable=False, default=0)
+    mean = db.Column(db.Float, nullable=False, default=0)
+    variance = db.Column(db.Float, nullable=False, default=0)
+    cusum = db.Column(db.Float, nullable=False, default=0)  # as of the end of the previous day
+    days_observed = db.Column(db.Integer, nullable=False, default=0)
+    run_start = db.Column(db.Date, nullable=True)  # first day of the current run above zero
+    run_cases = db.Column(db.Integer, nullable=False, default=0)
+    run_expected = db.Column(db.Float, nullable=False, default=0)
+    alert_id = db.Column(db.Integer, db.ForeignKey('outbreak_alerts.id'), nullable=True)
+
+class OutbreakScanState(db.Model):
+    """Single row: the last prediction id outbreaks.py has counted"""
+    __tablename__ = 'outbreak_scan_state'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    last_prediction_id = db.Column(db.Integer, nullable=False)
+    scanned_at = db.Column(db.DateTime, nullable=True)
+
+ROLLUP_VITALS = ('temperature', 'systolic_bp', 'diastolic_bp', 'blood_oxygen')
+WATER_QUALITY_VALUES = ('ph', 'turbidity', 'tds')
+
+SYMPTOM_PREFIX = 'Symptom: '
+
+# Predictions less confident than this raise an alert one level lower
+ALERT_CONFIDENCE_THRESHOLD = float(os.getenv('ALERT_CONFIDENCE_THRESHOLD', 0.6))
+ALERT_LEVELS = ['LOW', 'MEDIUM', 'HIGH']
+ALERT_STATUSES = ['ACTIVE', 'INVESTIGATING', 'RESOLVED']
+# A reading that repeats the location and disease of an alert that is not RESOLVED
+# and was last seen within this window updates that alert instead of adding one; 0 turns it off
+ALERT_DEDUP_WINDOW = timedelta(hours=float(os.getenv('ALERT_DEDUP_WINDOW_HOURS', 24)))
+# Newest alert events kept for /alerts/stream replay; older ones are trimmed as new ones arrive
+ALERT_EVENTS_KEEP = int(os.getenv('ALERT_EVENTS_KEEP', 100000))
+
 # Database utility functions
 def seed_initial_data():
     """Add initial health workers data if tables are empty"""
@@ -178,15 +504,290 @@ def seed_initial_data():
             db.session.rollback()
             print(f"❌ Error seeding initial data: {e}")
 
-def determine_alert_level(disease):
-    """Determine alert level based on disease type"""
+def extract_symptom(notes):
+    """Return the symptom from notes written as "Symptom: <name>", or None"""
+    if notes and notes.startswith(SYMPTOM_PREFIX):
+        return notes[len(SYMPTOM_PREFIX):].strip() or None
+    return None
+
+def determine_alert_level(disease, confidence=None):
+    """Determine alert level based on disease type and model confidence"""
     high_risk_diseases = ['Cholera', 'Typhoid']
     if disease in high_risk_diseases:
-        return 'HIGH'
+        level = 'HIGH'
     elif disease == 'Diarrhea':
-        return 'MEDIUM'
+        level = 'MEDIUM'
     else:
-        return 'LOW'
+        level = 'LOW'
+    
+    # An unsure model should not page anyone with a HIGH alert
+    if confidence is not None and confidence < ALERT_CONFIDENCE_THRESHOLD:
+        level = ALERT_LEVELS[max(0, ALERT_LEVELS.index(level) - 1)]
+    return level
+
+def alert_dedup_key(state, district, location, disease):
+    """Key repeated alerts are merged on; None without a location (the source is unknown)"""
+    if not location:
+        return None
+    return f"{state or ''}|{district or ''}|{location}|{disease}"[:310]
+
+def alert_payload(alert, prediction_record, water_record):
+    """The alert as an /alerts item"""
+    worker = db.session.get(HealthWorker, alert.assigned_to) if alert.assigned_to else None
+    return {
+        'id': alert.id,
+        'alert_level': alert.alert_level,
+        'status': alert.status,
+        'created_at': alert.created_at.isoformat(),
+        'notes': alert.notes,
+        'occurrence_count': alert.occurrence_count,
+        'last_seen_at': alert.last_seen_at.isoformat() if alert.last_seen_at else None,
+        'prediction': {
+            'disease': prediction_record.predicted_disease,
+            'health_alert': prediction_record.health_alert
+        },
+        'location': {
+            'state': water_record.state,
+            'district': water_record.district,
+            'location': water_record.location
+        },
+        'assigned_worker': worker.to_dict() if worker else None
+    }
+
+def record_alert_events(changes):
+    """Append events for /alerts/stream inside the caller's transaction.
+
+    `changes` are (event, alert, prediction_record, water_record) tuples with
+    flushed alerts. Call `alert_bus.notify()` once the transaction commits.
+    """
+    events = [
+        AlertEvent(alert_id=alert.id, event=kind, state=water_record.state, district=water_record.district,
+                   payload=json.dumps(alert_payload(alert, prediction_record, water_record)))
+        for kind, alert, prediction_record, water_record in changes
+    ]
+    if not events:
+        return
+    db.session.add_all(events)
+    db.session.flush()
+    # Trim the log every thousand events; a primary key range, so it stays cheap
+    if events[-1].id // 1000 != (events[0].id - 1) // 1000:
+        db.session.execute(AlertEvent.__table__.delete().where(AlertEvent.id <= events[-1].id - ALERT_EVENTS_KEEP))
+
+def _raise_alerts(readings):
+    """Create alerts for saved disease predictions, or fold repeats into an open one.
+
+    `readings` are the (prediction_record, water_record) pairs of one transaction,
+    already flushed. A prediction whose alert_dedup_key matches an alert that is
+    not RESOLVED and was last seen within ALERT_DEDUP_WINDOW bumps that alert's
+    occurrence count and last-seen time, and raises its level if higher. One
+    indexed lookup for the whole batch; runs inside the caller's transaction.
+    Records an /alerts/stream event per alert touched; returns how many.
+    """
+    candidates = []
+    for prediction_record, water_record in readings:
+        if prediction_record.predicted_disease == 'None':
+            continue
+        key = alert_dedup_key(water_record.state, water_record.district, water_record.location,
+                              prediction_record.predicted_disease) if ALERT_DEDUP_WINDOW else None
+        level = determine_alert_level(prediction_record.predicted_disease, prediction_record.confidence_score)
+        candidates.append((prediction_record, water_record, key, level))
+
+    open_alerts = {}
+    keys = {key for _, _, key, _ in candidates if key}
+    if keys:
+        oldest = min(prediction_record.timestamp for prediction_record, _, key, _ in candidates if key) - ALERT_DEDUP_WINDOW
+        # Row locks on PostgreSQL, so concurrent repeats do not lose increments
+        for alert in HealthAlert.query.filter(
+            HealthAlert.dedup_key.in_(keys),
+            HealthAlert.last_seen_at >= oldest,
+            HealthAlert.status != 'RESOLVED'
+        ).order_by(HealthAlert.last_seen_at).with_for_update():
+            open_alerts[alert.dedup_key] = alert  # the most recently seen one wins
+
+    new_alerts = []
+    # One event per alert touched, with its final state: {alert: (kind, prediction, water)}
+    changes = {}
+    for prediction_record, water_record, key, level in candidates:
+        seen_at = prediction_record.timestamp
+        alert = open_alerts.get(key)
+        if alert is not None and seen_at - alert.last_seen_at <= ALERT_DEDUP_WINDOW:
+            alert.occurrence_count += 1
+            alert.last_seen_at = max(alert.last_seen_at, seen_at)
+            if ALERT_LEVELS.index(level) > ALERT_LEVELS.index(alert.alert_level):
+                alert.alert_level = level
+            kind = changes[alert][0] if alert in changes else 'alert.updated'
+            changes[alert] = (kind, prediction_record, water_record)
+            continue
+        alert = HealthAlert(
+            prediction_id=prediction_record.id,
+            alert_level=level,
+            status='ACTIVE',
+            dedup_key=key,
+            occurrence_count=1,
+            created_at=seen_at,
+            last_seen_at=seen_at
+        )
+        new_alerts.append(alert)
+        changes[alert] = ('alert.created', prediction_record, water_record)
+        if key:
+            open_alerts[key] = alert
+    db.session.add_all(new_alerts)
+    db.session.flush()
+    record_alert_events([(kind, alert, prediction_record, water_record)
+                         for alert, (kind, prediction_record, water_record) in changes.items()])
+    return len(changes)
+
+def _pick_bound(column, current, new):
+    """Merged value of a `*_min` / `*_max` rollup column; None means no value yet"""
+    if current is None or new is None:
+        return new if current is None else current
+    return min(current, new) if column.endswith('_min') else max(current, new)
+
+def _upsert_increments(model, key_columns, rows):
+    """Insert rollup rows, or add their values onto existing rows with the same key.
+
+    Every column of `rows` that is not in `key_columns` is treated as an increment,
+    except `*_min` / `*_max` columns, which keep the lower / higher of both values.
+    Runs inside the caller's transaction.
+    """
+    if not rows:
+        return
+
+    table = model.__table__
+    value_columns = [column for column in rows[0] if column not in key_columns]
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+            # SQLite's min()/max() with two arguments are scalar
+            lower, higher = db.func.min, db.func.max
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+            lower, higher = db.func.least, db.func.greatest
+        stmt = insert(table).values(rows)
+        set_ = {}
+        for column in value_columns:
+            current, new = table.c[column], stmt.excluded[column]
+            if column.endswith(('_min', '_max')):
+                bound = lower if column.endswith('_min') else higher
+                set_[column] = bound(db.func.coalesce(current, new), db.func.coalesce(new, current))
+            else:
+                set_[column] = current + new
+        stmt = stmt.on_conflict_do_update(index_elements=list(key_columns), set_=set_)
+        db.session.execute(stmt)
+        return
+
+    # Portable fallback for databases without ON CONFLICT
+    for row in rows:
+        existing = model.query.filter_by(**{column: row[column] for column in key_columns}).first()
+        if existing:
+            for column in value_columns:
+                if column.endswith(('_min', '_max')):
+                    setattr(existing, column, _pick_bound(column, getattr(existing, column), row[column]))
+                else:
+                    setattr(existing, column, getattr(existing, column) + row[column])
+        else:
+            db.session.add(model(**row))
+    db.session.flush()
+
+def _add_to_rollup_row(row, name, value):
+    """Add one reading to a rollup row's `<name>_sum`, `_min` and `_max`"""
+    row[f'{name}_sum'] += value
+    for column in (f'{name}_min', f'{name}_max'):
+        row[column] = _pick_bound(column, row[column], value)
+
+def update_prediction_rollups(entries):
+    """Add predictions to the daily rollups and the hourly water quality rollups.
+
+    `entries` is an iterable of (timestamp, state, district, disease, ph, turbidity, tds).
+    """
+    daily, hourly = {}, {}
+    for timestamp, state, district, disease, ph, turbidity, tds in entries:
+        state, district = state or '', district or ''
+        hour = timestamp.replace(minute=0, second=0, microsecond=0)
+        for totals, key in ((daily, (state, district, disease, timestamp.date())), (hourly, (state, district, hour))):
+            row = totals.setdefault(key, {'record_count': 0, **{
+                f'{name}_{part}': None if part != 'sum' else 0.0
+                for name in WATER_QUALITY_VALUES for part in ('sum', 'min', 'max')
+            }})
+            row['record_count'] += 1
+            for name, value in zip(WATER_QUALITY_VALUES, (ph, turbidity, tds)):
+                _add_to_rollup_row(row, name, value)
+
+    _upsert_increments(PredictionRollup, ('state', 'district', 'predicted_disease', 'day'), [
+        {'state': state, 'district': district, 'predicted_disease': disease, 'day': day, **row}
+        for (state, district, disease, day), row in daily.items()
+    ])
+    _upsert_increments(WaterQualityHourlyRollup, ('state', 'district', 'hour'), [
+        {'state': state, 'district': district, 'hour': hour, **row}
+        for (state, district, hour), row in hourly.items()
+    ])
+
+def update_health_metrics_rollups(records, sign=1):
+    """Add (sign=1) or remove (sign=-1) health metrics records from the daily and hourly rollups.
+
+    Bounds cannot be subtracted: removing records recomputes the min/max of
+    their buckets from the other raw rows, so it works before or after the
+    records are deleted.
+    """
+    daily, hourly = {}, {}
+    for record in records:
+        state, district = record.state or '', record.district or ''
+        hour = record.timestamp.replace(minute=0, second=0, microsecond=0)
+        for totals, key in ((daily, (state, district, record.timestamp.date())), (hourly, (state, district, hour))):
+            row = totals.setdefault(key, {'record_count': 0, **{
+                f'{vital}_{part}': None if part in ('min', 'max') else 0
+                for vital in ROLLUP_VITALS for part in ('count', 'sum', 'min', 'max')
+            }})
+            row['record_count'] += sign
+            for vital in ROLLUP_VITALS:
+                value = getattr(record, vital)
+                if value is None:
+                    continue
+                row[f'{vital}_count'] += sign
+                if sign > 0:
+                    _add_to_rollup_row(row, vital, value)
+                else:
+                    row[f'{vital}_sum'] -= value
+
+    _upsert_increments(HealthMetricsRollup, ('state', 'district', 'day'), [
+        {'state': state, 'district': district, 'day': day, **row}
+        for (state, district, day), row in daily.items()
+    ])
+    _upsert_increments(HealthMetricsHourlyRollup, ('state', 'district', 'hour'), [
+        {'state': state, 'district': district, 'hour': hour, **row}
+        for (state, district, hour), row in hourly.items()
+    ])
+    if sign < 0:
+        _refresh_vitals_bounds([record.id for record in records], daily, hourly)
+
+def _refresh_vitals_bounds(removed_ids, daily, hourly):
+    """Recompute the vitals min/max of rollup buckets from their raw rows, leaving out `removed_ids`"""
+    bounds = []
+    for vital in ROLLUP_VITALS:
+        column = getattr(HealthMetricsRecord, vital)
+        bounds += [db.func.min(column).label(f'{vital}_min'), db.func.max(column).label(f'{vital}_max')]
+
+    def location_is(column, value):
+        # Rollups store a missing location as ''
+        return column == value if value else db.or_(column.is_(None), column == '')
+
+    for model, period, buckets in ((HealthMetricsRollup, 'day', daily), (HealthMetricsHourlyRollup, 'hour', hourly)):
+        for state, district, start in buckets:
+            if period == 'day':
+                begins, length = datetime.combine(start, datetime.min.time()), timedelta(days=1)
+            else:
+                begins, length = start, timedelta(hours=1)
+            remaining = db.session.query(*bounds).filter(
+                location_is(HealthMetricsRecord.state, state),
+                location_is(HealthMetricsRecord.district, district),
+                HealthMetricsRecord.timestamp >= begins,
+                HealthMetricsRecord.timestamp < begins + length,
+                HealthMetricsRecord.id.notin_(removed_ids)
+            ).one()
+            model.query.filter_by(state=state, district=district, **{period: start})\
+                .update(dict(remaining._mapping), synchronize_session=False)
 
 def save_prediction_record(water_data, prediction_result, additional_info=None):
     """Save water quality data and prediction to database"""
@@ -202,33 +803,177 @@ def save_prediction_record(water_data, prediction_result, additional_info=None):
             district=additional_info.get('district') if additional_info else None,
             collected_by=additional_info.get('collected_by') if additional_info else None
         )
-        db.session.add(water_record)
-        db.session.flush()  # Get the ID
+        with sqlite_writer.lock():
+            db.session.add(water_record)
+            db.session.flush()  # Get the ID
         
-        # Save prediction record
-        prediction_record = PredictionRecord(
-            water_quality_id=water_record.id,
-            predicted_disease=prediction_result['predicted_disease'],
-            health_alert=prediction_result['health_alert'],
-            confidence_score=prediction_result.get('confidence_score')
-        )
-        db.session.add(prediction_record)
-        db.session.flush()
-        
-        # Create alert if disease predicted
-        if prediction_result['predicted_disease'] != 'None':
-            alert_level = determine_alert_level(prediction_result['predicted_disease'])
-            alert = HealthAlert(
-                prediction_id=prediction_record.id,
-                alert_level=alert_level,
-                status='ACTIVE'
+            # Save prediction record
+            prediction_record = PredictionRecord(
+                water_quality_id=water_record.id,
+                predicted_disease=prediction_result['predicted_disease'],
+                health_alert=prediction_result['health_alert'],
+                confidence_score=prediction_result.get('confidence_score'),
+                confidence_margin=prediction_result.get('confidence_margin'),
+                class_probabilities=prediction_result.get('class_probabilities'),
+                model_version=prediction_result.get('model_version', '1.0'),
+                prediction_uuid=prediction_result.get('prediction_uuid'),
+                state=water_record.state
             )
-            db.session.add(alert)
+            db.session.add(prediction_record)
+            db.session.flush()
+        
+            update_prediction_rollups([(
+                prediction_record.timestamp, water_record.state, water_record.district,
+                prediction_record.predicted_disease, water_record.ph, water_record.turbidity, water_record.tds
+            )])
         
-        db.session.commit()
+            # Create alert if disease predicted, or count a repeat on the open one
+            alert_events = _raise_alerts([(prediction_record, water_record)])
+        
+            db.session.commit()
+        response_cache.invalidate('predictions', [water_record.state])
+        if alert_events:
+            alert_bus.notify()
         return prediction_record.to_dict()
         
     except Exception as e:
         db.session.rollback()
         print(f"❌ Error saving prediction record: {e}")
         return None
+
+def save_prediction_records_bulk(items):
+    """Save many water quality samples and their predictions in one transaction.
+
+    `items` is a list of (water_data, prediction_result, additional_info) tuples,
+    shaped like the arguments of save_prediction_record. Returns the saved
+    prediction records as dicts (same order as `items`), or None on failure.
+    """
+    if not items:
+        return []
+
+    try:
+        water_records = []
+        for water_data, _, additional_info in items:
+            info = additional_info or {}
+            water_records.append(WaterQualityRecord(
+                ph=water_data['ph'],
+                turbidity=water_data['turbidity'],
+                tds=water_data['tds'],
+                people_affected_per_5000=water_data['people_affected_per_5000'],
+                location=info.get('location'),
+                state=info.get('state'),
+                district=info.get('district'),
+                collected_by=info.get('collected_by'),
+                timestamp=info.get('timestamp') or datetime.utcnow()
+            ))
+        with sqlite_writer.lock():
+            db.session.add_all(water_records)
+            db.session.flush()  # Batched INSERT, assigns all IDs
+
+            prediction_records = []
+            for water_record, (_, prediction_result, _) in zip(water_records, items):
+                prediction_records.append(PredictionRecord(
+                    water_quality_id=water_record.id,
+                    predicted_disease=prediction_result['predicted_disease'],
+                    health_alert=prediction_result['health_alert'],
+                    confidence_score=prediction_result.get('confidence_score'),
+                    confidence_margin=prediction_result.get('confidence_margin'),
+                    class_probabilities=prediction_result.get('class_probabilities'),
+                    model_version=prediction_result.get('model_version', '1.0'),
+                    prediction_uuid=prediction_result.get('prediction_uuid'),
+                    state=water_record.state,
+                    # Same time as the reading, also when written behind the request
+                    timestamp=water_record.timestamp
+                ))
+            db.session.add_all(prediction_records)
+            db.session.flush()
+
+            update_prediction_rollups(
+                (prediction_record.timestamp, water_record.state, water_record.district,
+                 prediction_record.predicted_disease, water_record.ph, water_record.turbidity, water_record.tds)
+                for water_record, prediction_record in zip(water_records, prediction_records)
+            )
+
+            # In time order, so repeats inside the batch fold into the first alert
+            alert_events = _raise_alerts(sorted(zip(prediction_records, water_records), key=lambda pair: pair[0].timestamp))
+
+            # Build the response before commit expires the instances
+            saved = [
+                {
+                    'id': prediction_record.id,
+                    'water_quality_id': water_record.id,
+                    'predicted_disease': prediction_record.predicted_disease,
+                    'health_alert': prediction_record.health_alert
+                }
+                for water_record, prediction_record in zip(water_records, prediction_records)
+            ]
+            states = {water_record.state for water_record in water_records}
+
+            db.session.commit()
+        response_cache.invalidate('predictions', states)
+        if alert_events:
+            alert_bus.notify()
+        return saved
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error saving prediction records in bulk: {e}")
+        return None
+
+def save_health_metrics_bulk(rows, chunk_size=1000):
+    """Insert health metrics rows in one transaction, skipping stored client UUIDs.
+
+    `rows` are dicts of column values, each with a unique `client_uuid` and a
+    `timestamp`. Each chunk is a single executemany INSERT. Returns
+    {client_uuid: (record_id, created)}; `created` is False for a record that
+    was already stored (a re-sent sync). Raises on failure, after rollback.
+    """
+    table = HealthMetricsRecord.__table__
+    dialect = db.session.get_bind().dialect.name
+    saved = {}
+
+    try:
+        with sqlite_writer.lock():
+            created_rows = []
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                uuids = [row['client_uuid'] for row in chunk]
+
+                if dialect in ('sqlite', 'postgresql'):
+                    if dialect == 'sqlite':
+                        from sqlalchemy.dialects.sqlite import insert
+                    else:
+                        from sqlalchemy.dialects.postgresql import insert
+                    # Already stored UUIDs (also ones a concurrent sync just wrote) are skipped, not errors
+                    stmt = insert(table).on_conflict_do_nothing(index_elements=['client_uuid'])
+                    inserted = db.session.execute(stmt.returning(table.c.client_uuid, table.c.id), chunk).all()
+                else:
+                    # Portable fallback for databases without ON CONFLICT / RETURNING
+                    existing = set(db.session.scalars(select(table.c.client_uuid).where(table.c.client_uuid.in_(uuids))))
+                    new_rows = [row for row in chunk if row['client_uuid'] not in existing]
+                    if new_rows:
+                        db.session.execute(table.insert(), new_rows)
+                    inserted = db.session.execute(
+                        select(table.c.client_uuid, table.c.id)
+                        .where(table.c.client_uuid.in_([row['client_uuid'] for row in new_rows]))
+                    ).all() if new_rows else []
+
+                for client_uuid, record_id in inserted:
+                    saved[client_uuid] = (record_id, True)
+                created_rows.extend(row for row in chunk if row['client_uuid'] in saved)
+                duplicates = [client_uuid for client_uuid in uuids if client_uuid not in saved]
+                if duplicates:
+                    for client_uuid, record_id in db.session.execute(
+                        select(table.c.client_uuid, table.c.id).where(table.c.client_uuid.in_(duplicates))
+                    ):
+                        saved[client_uuid] = (record_id, False)
+
+            update_health_metrics_rollups([SimpleNamespace(**row) for row in created_rows])
+            db.session.commit()
+        response_cache.invalidate('health_metrics', {row['state'] for row in created_rows})
+        return saved
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error saving health metrics in bulk: {e}")
+        raise
@@ -1,21 +1,47 @@
 # Gunicorn configuration file
 import multiprocessing
 import os
+from dotenv import load_dotenv
+
+# Same .env as app.py, read before the settings below
+load_dotenv()
 
 # Server socket
 bind = "0.0.0.0:5000"
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
-worker_connections = 1000
+# sync: one request at a time per process. gevent: up to worker_connections
+# requests per process, each waiting on the database or a slow client without
+# blocking the others (pip install gevent psycogreen; PostgreSQL only, SQLite
+# calls still block the whole process).
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+default_workers = multiprocessing.cpu_count() * 2 + 1 if worker_class == 'sync' else multiprocessing.cpu_count()
+workers = int(os.getenv('WEB_CONCURRENCY', default_workers))
 timeout = 120
+
+if worker_class == 'gevent':
+    # Patch before the app is preloaded, so its locks, queues and sockets are cooperative
+    from gevent import monkey
+    monkey.patch_all()
+    if os.getenv('DATABASE_URL', '').startswith('postgres'):
+        # psycopg2 is a C extension that monkey patching cannot reach
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    else:
+        print("❌ gevent workers with SQLite: every query blocks the whole worker, use PostgreSQL")
+
+# app.py sizes each worker's connection pool from these (database.engine_options)
+os.environ['WEB_CONCURRENCY'] = str(workers)
+os.environ['WORKER_CONCURRENCY'] = str(worker_connections if worker_class == 'gevent' else 1)
 keepalive = 2
 
-# Restart workers after this many requests, to prevent memory leaks
-max_requests = 1000
-max_requests_jitter = 50
+# Restart workers after this many requests, to prevent memory leaks. A gevent
+# worker counts every /alerts/stream connection and drops all open ones when it
+# restarts, so it gets a much higher budget
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000 if worker_class == 'sync' else 100000))
+max_requests_jitter = max_requests // 20
 
 # Logging
 accesslog = "-"
@@ -43,7 +69,9 @@ raw_env = [
     'FLASK_ENV=production',
 ]
 
-# Preload app for better performance
+# Preload app for better performance. The compiled model is memory-mapped
+# (model/forest.py), so all workers share one copy of its arrays, including
+# versions hot-reloaded after the fork.
 preload_app = True
 
 # Worker timeout for graceful shutdown
@@ -0,0 +1,145 @@
+"""Bulk ingestion of health metrics synced from offline ASHA devices.
+
+POST /health-metrics/bulk takes a JSON array (or {"records": [...]}), or
+NDJSON with one record per line (Content-Type application/x-ndjson). The
+records are validated column by column with pandas rather than one at a
+time, and inserted with one executemany per chunk
+(database.save_health_metrics_bulk).
+
+A record can carry a `client_uuid`. Records whose UUID is already stored
+are reported as duplicates and not inserted again, so a device can safely
+re-send a whole sync after a dropped connection. A record without a UUID is
+given one by the server, returned in its result.
+"""
+import json
+import uuid
+from datetime import datetime, timedelta
+import numpy as np
+from database import extract_symptom
+
+# Column -> integer (True) or float (False)
+NUMERIC_FIELDS = {
+    'temperature': False,
+    'systolic_bp': True,
+    'diastolic_bp': True,
+    'blood_oxygen': False,
+    'patient_age': True,
+}
+# Column -> maximum length (None: unlimited), matching HealthMetricsRecord
+TEXT_FIELDS = {
+    'patient_name': 100,
+    'patient_gender': 10,
+    'location': 100,
+    'state': 50,
+    'district': 50,
+    'recorded_by': 100,
+    'notes': None,
+    'symptom': 100,
+}
+NDJSON_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-lines')
+UUID_PATTERN = r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+# Device clocks drift; readings further in the future than this are rejected
+MAX_CLOCK_SKEW = timedelta(minutes=10)
+
+def parse_body(body, mimetype):
+    """Split a request body into records.
+
+    Returns (records, errors): one entry per record (None where it could not
+    be parsed) and {index: message} for those.
+    """
+    text_body = body.decode('utf-8')
+    if mimetype in NDJSON_TYPES:
+        records, errors = [], {}
+        for line in text_body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                errors[len(records)] = f"Invalid JSON: {e}"
+                records.append(None)
+        return records, errors
+
+    data = json.loads(text_body)
+    records = data.get('records') if isinstance(data, dict) else data
+    if not isinstance(records, list):
+        raise ValueError("Expected a JSON array of records, {\"records\": [...]} or NDJSON")
+    return records, {}
+
+def _fail(errors, mask, message):
+    for index in np.flatnonzero(mask):
+        errors.setdefault(int(index), message)
+
+def _present(column):
+    """Values that were sent: not missing, null or an empty string"""
+    return column.notna().to_numpy() & (column.astype(str).str.strip() != '').to_numpy()
+
+def validate_records(records, errors):
+    """Validate and convert records column by column.
+
+    Returns a list of row dicts for HealthMetricsRecord, in record order, with
+    None for rejected records; `errors` gets {index: message} for each of them.
+    """
+    # Deferred: pandas alone takes longer to import than the rest of the app
+    import pandas as pd
+
+    count = len(records)
+    objects = np.array([isinstance(record, dict) for record in records], dtype=bool)
+    _fail(errors, ~objects, "Record must be an object")
+    frame = pd.DataFrame.from_records(
+        [record if isinstance(record, dict) else {} for record in records],
+        columns=[*NUMERIC_FIELDS, *TEXT_FIELDS, 'client_uuid', 'timestamp'],
+        index=range(count)
+    ).astype(object)
+    columns = {}
+
+    for field, integer in NUMERIC_FIELDS.items():
+        present = _present(frame[field])
+        is_bool = frame[field].map(lambda value: isinstance(value, bool)).to_numpy(dtype=bool)
+        values = pd.to_numeric(frame[field].where(present & ~is_bool), errors='coerce').to_numpy(dtype=float)
+        invalid = present & ~np.isfinite(values)
+        if integer:
+            invalid |= np.isfinite(values) & ((values != np.round(values)) | (np.abs(values) >= 2 ** 31))
+        _fail(errors, invalid, f"Invalid '{field}': expected {'an integer' if integer else 'a number'}")
+        valid = present & ~invalid
+        column = np.where(valid, values, 0).astype(np.int64 if integer else float).astype(object)
+        column[~valid] = None
+        columns[field] = column
+
+    for field, max_length in TEXT_FIELDS.items():
+        present = frame[field].notna().to_numpy()
+        column = frame[field].where(~present, frame[field].astype(str)).to_numpy(dtype=object, copy=True)
+        column[~present] = None
+        if max_length is not None:
+            lengths = pd.Series(column).str.len().fillna(0).to_numpy()
+            _fail(errors, lengths > max_length, f"Invalid '{field}': longer than {max_length} characters")
+        columns[field] = column
+
+    # Same fallback as the single-record endpoint: "Symptom: ..." notes
+    missing_symptom = ~_present(pd.Series(columns['symptom'], dtype=object))
+    columns['symptom'][missing_symptom] = [extract_symptom(notes) for notes in columns['notes'][missing_symptom]]
+    lengths = pd.Series(columns['symptom']).str.len().fillna(0).to_numpy()
+    _fail(errors, lengths > TEXT_FIELDS['symptom'], f"Invalid 'symptom': longer than {TEXT_FIELDS['symptom']} characters")
+
+    # Canonical lowercase UUIDs; the server assigns one where the device did not
+    present = _present(frame['client_uuid'])
+    client_uuids = frame['client_uuid'].astype(str).str.strip().str.lower().to_numpy(dtype=object, copy=True)
+    _fail(errors, present & ~pd.Series(client_uuids).str.fullmatch(UUID_PATTERN).to_numpy(dtype=bool),
+          "Invalid 'client_uuid': expected a UUID like 123e4567-e89b-12d3-a456-426614174000")
+    client_uuids[~present] = [str(uuid.uuid4()) for _ in range(int((~present).sum()))]
+    columns['client_uuid'] = client_uuids
+
+    # ISO 8601 reading time, stored as naive UTC like every other timestamp
+    present = _present(frame['timestamp'])
+    timestamps = pd.to_datetime(frame['timestamp'].where(present), errors='coerce', utc=True, format='ISO8601')
+    timestamps = timestamps.dt.tz_convert(None).to_numpy(dtype='datetime64[us]')
+    _fail(errors, present & np.isnat(timestamps), "Invalid 'timestamp': expected an ISO 8601 datetime")
+    now = datetime.utcnow()
+    _fail(errors, timestamps > np.datetime64(now + MAX_CLOCK_SKEW), "Invalid 'timestamp': in the future")
+    columns['timestamp'] = np.where(present, timestamps, np.datetime64(now)).astype('datetime64[us]').astype(object)
+
+    names = list(columns)
+    return [
+        None if index in errors else dict(zip(names, values))
+        for index, values in enumerate(zip(*columns.values()))
+    ]
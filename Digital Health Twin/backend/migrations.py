@@ -0,0 +1,238 @@
+"""Lightweight schema migrations for existing databases.
+
+`db.create_all()` only creates missing tables; it never touches tables that
+already exist. Each migration below brings an older database up to the
+current models and is recorded in `schema_migrations`, so it runs once per
+database. Migrations must be idempotent: on a fresh database `create_all()`
+has already created everything they would add.
+
+Run automatically at startup, or by hand (create tables, migrate, seed) with:
+
+    python migrations.py
+
+With FAST_START=1 the app does no schema work when it starts; run the
+command once per deploy instead (e.g. as a pre-deploy step).
+"""
+from datetime import datetime
+from sqlalchemy import bindparam, inspect, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from database import (db, seed_initial_data, WaterQualityRecord, PredictionRecord, HealthAlert, HealthMetricsRecord,
+                      PredictionRollup, WaterQualityHourlyRollup, HealthMetricsRollup, HealthMetricsHourlyRollup,
+                      SYMPTOM_PREFIX, ALERT_LEVELS, ALERT_DEDUP_WINDOW)
+from sqlite_writer import sqlite_writer
+
+def _create_missing_indexes(connection, *models):
+    """Create indexes declared on the models that the database does not have yet.
+
+    Indexes on columns a later migration still has to add are skipped; that
+    migration creates them.
+    """
+    inspector = inspect(connection)
+    for model in models:
+        table = model.__table__
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if index.name not in existing and all(column.name in columns for column in index.columns):
+                index.create(bind=connection)
+                print(f"  + index {index.name} on {table.name}")
+
+def _add_missing_columns(connection, model):
+    """Add columns declared on the model that the table does not have yet (nullable columns only)"""
+    table = model.__table__
+    existing = {column['name'] for column in inspect(connection).get_columns(table.name)}
+    for column in table.columns:
+        if column.name not in existing:
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            print(f"  + column {column.name} on {table.name}")
+
+def _add_hot_path_indexes(connection):
+    _create_missing_indexes(connection, WaterQualityRecord, PredictionRecord, HealthAlert, HealthMetricsRecord)
+
+def _build_rollups(connection):
+    from rollups import rebuild_rollups
+    # The rebuild fills every current rollup column, including ones added by later migrations
+    for model in (PredictionRollup, HealthMetricsRollup):
+        _add_missing_columns(connection, model)
+    rebuild_rollups(connection)
+
+def _add_symptom_column(connection):
+    _add_missing_columns(connection, HealthMetricsRecord)
+    _create_missing_indexes(connection, HealthMetricsRecord)
+    # Backfill from notes; same parsing as database.extract_symptom
+    prefix_length = len(SYMPTOM_PREFIX)
+    connection.execute(text(
+        "UPDATE health_metrics_records "
+        f"SET symptom = NULLIF(TRIM(SUBSTR(notes, {prefix_length + 1})), '') "
+        f"WHERE symptom IS NULL AND SUBSTR(notes, 1, {prefix_length}) = :prefix"
+    ), {'prefix': SYMPTOM_PREFIX})
+
+def _add_confidence_columns(connection):
+    _add_missing_columns(connection, PredictionRecord)
+
+def _add_alert_outcome_column(connection):
+    _add_missing_columns(connection, HealthAlert)
+
+def _add_prediction_uuid_column(connection):
+    _add_missing_columns(connection, PredictionRecord)
+    _create_missing_indexes(connection, PredictionRecord)
+
+def _add_health_metrics_client_uuid(connection):
+    _add_missing_columns(connection, HealthMetricsRecord)
+    _create_missing_indexes(connection, HealthMetricsRecord)
+
+def _add_alert_dedup_columns(connection):
+    _add_missing_columns(connection, HealthAlert)
+    _create_missing_indexes(connection, HealthAlert)
+    connection.execute(text(
+        "UPDATE health_alerts SET occurrence_count = 1, last_seen_at = created_at WHERE occurrence_count IS NULL"
+    ))
+    # Same key as database.alert_dedup_key
+    connection.execute(text(
+        "UPDATE health_alerts SET dedup_key = ("
+        "SELECT CASE WHEN w.location IS NULL OR w.location = '' THEN NULL ELSE SUBSTR("
+        "COALESCE(w.state, '') || '|' || COALESCE(w.district, '') || '|' || w.location || '|' || p.predicted_disease, 1, 310"
+        ") END "
+        "FROM prediction_records p JOIN water_quality_records w ON w.id = p.water_quality_id "
+        "WHERE p.id = health_alerts.prediction_id) "
+        "WHERE dedup_key IS NULL"
+    ))
+    _merge_duplicate_alerts(connection)
+
+def _merge_duplicate_alerts(connection):
+    """Fold open alerts that repeat an earlier one within ALERT_DEDUP_WINDOW into it.
+
+    The oldest alert of a run survives with the summed count, latest last-seen
+    time and highest level; it keeps its assignee and notes, or takes the first
+    ones a merged alert has. RESOLVED alerts (retraining labels) are left alone.
+    """
+    if not ALERT_DEDUP_WINDOW:
+        return
+    table = HealthAlert.__table__
+    rows = connection.execute(
+        select(table.c.id, table.c.dedup_key, table.c.alert_level, table.c.status, table.c.assigned_to,
+               table.c.notes, table.c.occurrence_count, table.c.created_at, table.c.last_seen_at)
+        .where(table.c.dedup_key.isnot(None), table.c.status != 'RESOLVED')
+        .order_by(table.c.dedup_key, table.c.created_at, table.c.id)
+    ).mappings().all()
+
+    survivors, merged = [], []
+    survivor = None
+    for row in rows:
+        if (survivor is not None and row['dedup_key'] == survivor['dedup_key']
+                and row['created_at'] - survivor['last_seen_at'] <= ALERT_DEDUP_WINDOW):
+            survivor['occurrence_count'] += row['occurrence_count']
+            survivor['last_seen_at'] = max(survivor['last_seen_at'], row['last_seen_at'])
+            survivor['alert_level'] = max(survivor['alert_level'], row['alert_level'], key=ALERT_LEVELS.index)
+            if row['status'] == 'INVESTIGATING':
+                survivor['status'] = 'INVESTIGATING'
+            survivor['assigned_to'] = survivor['assigned_to'] or row['assigned_to']
+            survivor['notes'] = survivor['notes'] or row['notes']
+            survivor['merged'] = True
+            merged.append(row['id'])
+            continue
+        survivor = dict(row, merged=False)
+        survivors.append(survivor)
+
+    columns = ('alert_level', 'status', 'assigned_to', 'notes', 'occurrence_count', 'last_seen_at')
+    # Parameter names must differ from the column names they set
+    updates = [
+        {'alert_id': survivor['id'], **{f'merged_{column}': survivor[column] for column in columns}}
+        for survivor in survivors if survivor['merged']
+    ]
+    if updates:
+        connection.execute(
+            table.update().where(table.c.id == bindparam('alert_id'))
+            .values(**{column: bindparam(f'merged_{column}') for column in columns}),
+            updates
+        )
+    for start in range(0, len(merged), 1000):
+        connection.execute(table.delete().where(table.c.id.in_(merged[start:start + 1000])))
+    if merged:
+        print(f"  merged {len(merged)} duplicate alerts into {len(updates)}")
+
+def _add_timeseries_rollups(connection):
+    # The hourly tables come from create_all(); the daily ones gain min/max columns
+    _build_rollups(connection)
+    _create_missing_indexes(connection, PredictionRollup, WaterQualityHourlyRollup, HealthMetricsRollup, HealthMetricsHourlyRollup)
+
+def _add_prediction_state_column(connection):
+    _add_missing_columns(connection, PredictionRecord)
+    connection.execute(text(
+        "UPDATE prediction_records SET state = (SELECT state FROM water_quality_records "
+        "WHERE water_quality_records.id = prediction_records.water_quality_id) WHERE state IS NULL"
+    ))
+    _create_missing_indexes(connection, PredictionRecord)
+
+# Ordered list of (version, description, function). Append only; never renumber.
+MIGRATIONS = [
+    (1, 'Composite indexes for dashboard query filters', _add_hot_path_indexes),
+    (2, 'Populate dashboard rollup tables from existing records', _build_rollups),
+    (3, 'Normalized symptom column on health metrics, backfilled from notes', _add_symptom_column),
+    (4, 'Confidence margin and class probabilities on predictions', _add_confidence_columns),
+    (5, 'Confirmed disease on alerts, used as the retraining label', _add_alert_outcome_column),
+    (6, 'Client-facing prediction UUID for write-behind persistence', _add_prediction_uuid_column),
+    (7, 'Client record UUID on health metrics for idempotent bulk sync', _add_health_metrics_client_uuid),
+    (8, 'Alert deduplication key and occurrence count; merge existing duplicates', _add_alert_dedup_columns),
+    (9, 'Min/max on the daily rollups and hourly rollups for /timeseries, built from existing records', _add_timeseries_rollups),
+    (10, 'State copied onto predictions so /records?state= pages on one index; backfilled', _add_prediction_state_column),
+]
+
+def _ensure_migrations_table(connection):
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR(200), "
+        "applied_at TIMESTAMP)"
+    ))
+
+def applied_versions(connection):
+    _ensure_migrations_table(connection)
+    rows = connection.execute(text("SELECT version FROM schema_migrations"))
+    return {row[0] for row in rows}
+
+def run_migrations(engine=None):
+    """Apply all pending migrations. Each migration runs in its own write transaction."""
+    engine = engine or db.engine
+
+    with sqlite_writer.lock(), engine.begin() as connection:
+        done = applied_versions(connection)
+
+    for version, description, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        with sqlite_writer.lock(), engine.begin() as connection:
+            # Another worker may have applied it while this one waited for the lock
+            if version in applied_versions(connection):
+                continue
+            print(f"🔧 Applying migration {version}: {description}")
+            migrate(connection)
+            connection.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {'v': version, 'd': description, 't': datetime.utcnow()}
+            )
+
+def schema_is_current(engine=None):
+    """Whether every migration has been applied. Read-only, for readiness checks."""
+    engine = engine or db.engine
+    try:
+        with engine.connect() as connection:
+            latest = connection.execute(text("SELECT MAX(version) FROM schema_migrations")).scalar()
+    except SQLAlchemyError:
+        return False  # no schema_migrations table yet
+    return latest is not None and latest >= MIGRATIONS[-1][0]
+
+def prepare_database():
+    """Create missing tables, apply pending migrations and seed reference data"""
+    with sqlite_writer.lock():
+        db.create_all()
+    run_migrations()
+    with sqlite_writer.lock():
+        seed_initial_data()
+
+if __name__ == "__main__":
+    from app import app
+    with app.app_context():
+        prepare_database()
+        print("✅ Database schema is up to date")
@@ -0,0 +1,286 @@
+"""Pickle-free random forest inference with plain NumPy.
+
+`export_forest` flattens a trained sklearn RandomForestClassifier into a few
+NumPy arrays (split feature, threshold, children and per-node class
+probabilities for every tree) saved as an uncompressed .npz file.
+`CompiledForest` loads that file without importing sklearn and evaluates all
+trees for all rows at once. Forests of small trees (at most 64 leaves each)
+find each exit leaf QuickScorer style: every split node holds a bitmask of the
+leaves still reachable when the row goes right, and the leftmost leaf left in
+the AND of a tree's masks is the one the row reaches. Bigger trees are walked
+one tree level per step.
+
+The arrays are memory-mapped straight out of the .npz rather than copied, so
+every Gunicorn worker serving the same artifact shares one set of read-only
+page-cache pages instead of holding a private copy each. Artifacts are only
+ever replaced by rename, never rewritten in place, so a mapping stays valid.
+
+Convert the current model with:
+
+    python model/forest.py
+"""
+import io
+import mmap
+import os
+import struct
+import tempfile
+import zipfile
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "health_model.pkl")
+COMPILED_MODEL_PATH = os.path.join(BASE_DIR, "health_model.npz")
+
+# sklearn marks leaves with child index -1
+LEAF = -1
+# Rows evaluated together by predict_proba; small enough that a block's
+# (trees, rows, classes) leaf values stay in cache for the reduction
+BLOCK_ROWS = 1024
+# Upper bound on the per-block split mask array; fewer rows per block beyond it
+MASK_BLOCK_BYTES = 16 * 1024 * 1024
+# Leaf bitmask dtypes, smallest first
+MASK_DTYPES = (np.uint8, np.uint16, np.uint32, np.uint64)
+# Array data in the .npz starts on this boundary so mapped arrays are aligned
+ALIGNMENT = 64
+# Extra field id used for alignment padding (the one Android's zipalign uses)
+PADDING_EXTRA_ID = 0xD935
+
+def export_forest(model, path=COMPILED_MODEL_PATH):
+    """Flatten a fitted RandomForestClassifier into an .npz file"""
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        left = tree.children_left.astype(np.int32)
+        right = tree.children_right.astype(np.int32)
+        is_leaf = left == LEAF
+
+        # Leaves point at themselves so traversal can run a fixed number of steps
+        node_ids = np.arange(tree.node_count, dtype=np.int32) + offset
+        lefts.append(np.where(is_leaf, node_ids, left + offset))
+        rights.append(np.where(is_leaf, node_ids, right + offset))
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+
+        value = tree.value[:, 0, :].astype(np.float64)
+        values.append(value / value.sum(axis=1, keepdims=True))
+
+        roots.append(offset)
+        offset += tree.node_count
+
+    left = np.concatenate(lefts)
+    right = np.concatenate(rights)
+    arrays = dict(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=left,
+        right=right,
+        # children[2 * node] is the left child, children[2 * node + 1] the right one
+        children=np.stack([left, right], axis=1).ravel().astype(np.int64),
+        value=np.concatenate(values),
+        roots=np.array(roots, dtype=np.int32),
+        max_depth=np.array(max(estimator.tree_.max_depth for estimator in model.estimators_)),
+        classes=np.array([str(label) for label in model.classes_]),
+        n_features=np.array(model.n_features_in_)
+    )
+
+    # Write next to the target and rename over it: workers may have the old file mapped
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.npz')
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            _write_aligned_npz(f, arrays)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return path
+
+def _write_aligned_npz(f, arrays):
+    """Like np.savez, but each array's data starts on an ALIGNMENT boundary.
+
+    NumPy pads .npy headers to a multiple of 64 bytes, so aligning where each
+    zip member starts aligns its data. The padding goes in the member's local
+    extra field; the file remains a normal .npz for np.load.
+    """
+    with zipfile.ZipFile(f, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for name, array in arrays.items():
+            buffer = io.BytesIO()
+            np.lib.format.write_array(buffer, np.asanyarray(array), allow_pickle=False)
+            info = zipfile.ZipInfo(name + '.npy', date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_STORED
+            data_start = f.tell() + 30 + len(info.filename)
+            padding = -(data_start + 4) % ALIGNMENT + 4
+            info.extra = struct.pack('<HH', PADDING_EXTRA_ID, padding - 4) + bytes(padding - 4)
+            archive.writestr(info, buffer.getvalue())
+
+def _mapped_arrays(path):
+    """Arrays of an uncompressed .npz as read-only views of one shared mmap.
+
+    Returns None when a member cannot be mapped (compressed or object dtype).
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                return None
+            # Member data follows its local header: 30 fixed bytes, the name and an extra field
+            name_length, extra_length = struct.unpack_from('<HH', mapped, info.header_offset + 26)
+            data_start = info.header_offset + 30 + name_length + extra_length
+            with archive.open(info) as member:
+                version = np.lib.format.read_magic(member)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(member)
+                else:
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(member)
+                header_length = member.tell()
+            offset = data_start + header_length
+            # Unaligned arrays (artifacts written by plain np.savez) are much slower to index
+            if dtype.hasobject or offset % dtype.alignment:
+                return None
+            array = np.frombuffer(mapped, dtype=dtype, count=int(np.prod(shape)), offset=offset)
+            arrays[info.filename[:-len('.npy')]] = array.reshape(shape, order='F' if fortran_order else 'C')
+    return arrays
+
+class CompiledForest:
+    """Evaluates an exported forest; same predictions and probabilities as sklearn"""
+
+    def __init__(self, arrays):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        self.classes_ = arrays['classes']
+        self.n_features_in_ = int(arrays['n_features'])
+        if 'children' in arrays:
+            self.children = arrays['children']
+        else:
+            # Artifacts exported before children was stored
+            self.children = np.stack([self.left, self.right], axis=1).ravel().astype(np.int64)
+        self.roots64 = self.roots.astype(np.int64)
+        self._build_leaf_masks()
+        self.block_rows = BLOCK_ROWS
+        if self.split_masks is not None:
+            mask_bytes = self.split_masks.shape[0] * self.split_masks.itemsize
+            self.block_rows = max(8, min(BLOCK_ROWS, MASK_BLOCK_BYTES // mask_bytes // 8 * 8))
+
+    def _build_leaf_masks(self):
+        """Per-split leaf bitmasks for exit-leaf scoring; split_masks is None when unusable"""
+        self.split_masks = None
+        node_ids = np.arange(self.left.shape[0], dtype=np.int64)
+        is_leaf = self.left == node_ids
+        splits = np.flatnonzero(~is_leaf)
+        leaves = np.flatnonzero(is_leaf)
+        n_trees = self.roots64.shape[0]
+
+        # Leaf bits follow node order, which is only left to right when nodes are
+        # numbered depth first (the left child right after its parent), as sklearn does
+        if not np.array_equal(self.left[splits], splits + 1):
+            return
+        leaf_tree = np.searchsorted(self.roots64, leaves, side='right') - 1
+        first_leaf = np.searchsorted(leaf_tree, np.arange(n_trees))
+        leaf_counts = np.diff(np.append(first_leaf, leaves.shape[0]))
+        if leaf_counts.max() > 64:
+            return
+        dtype = next(d for d in MASK_DTYPES if np.iinfo(d).bits >= leaf_counts.max())
+
+        # Going right drops the left subtree: nodes split+1 .. right[split]-1
+        split_tree = np.searchsorted(self.roots64, splits, side='right') - 1
+        low = np.searchsorted(leaves, splits + 1) - first_leaf[split_tree]
+        high = np.searchsorted(leaves, self.right[splits]) - first_leaf[split_tree]
+        width = (high - low).astype(np.uint64)
+        dropped = ((np.uint64(1) << width) - np.uint64(1)) << low.astype(np.uint64)
+        masks = (~dropped).astype(dtype)
+        features = self.feature[splits]
+        thresholds = self.threshold[splits]
+
+        # A tree that is a single leaf gets a split that never masks anything
+        stumps = np.flatnonzero(self.left[self.roots64] == self.roots64)
+        tree_splits = np.searchsorted(split_tree, np.arange(n_trees))
+        if stumps.shape[0]:
+            at = tree_splits[stumps]
+            masks = np.insert(masks, at, np.iinfo(dtype).max)
+            features = np.insert(features, at, 0)
+            thresholds = np.insert(thresholds, at, np.inf)
+            tree_splits = tree_splits + np.searchsorted(stumps, np.arange(n_trees))
+
+        self.split_masks = masks[:, None]
+        self.split_feature = features
+        self.split_threshold = thresholds[:, None]
+        self.tree_splits = tree_splits
+        self.leaf_nodes = leaves
+        self.tree_first_leaf = first_leaf[:, None]
+
+    @classmethod
+    def load(cls, path=COMPILED_MODEL_PATH, mmap_arrays=True):
+        """Load an exported forest, memory-mapping its arrays unless mmap_arrays is False"""
+        arrays = _mapped_arrays(path) if mmap_arrays else None
+        if arrays is None:
+            with np.load(path, allow_pickle=False) as archive:
+                arrays = {name: archive[name] for name in archive.files}
+        return cls(arrays)
+
+    def apply(self, X):
+        """Leaf node index for every (row, tree)"""
+        # sklearn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features_in_)
+        return self._tree_leaves(X).T
+
+    def _tree_leaves(self, X):
+        """Leaf node index for every (tree, row) of a float32 block"""
+        if self.split_masks is None:
+            return self._walk(X).T
+        rows = X.shape[0]
+        # Pad to whole 8-byte words so the masks can be ANDed a word at a time
+        X_t = np.zeros((self.n_features_in_, rows + -rows % 8), dtype=np.float32)
+        X_t[:, :rows] = X.T
+        masks = (X_t[self.split_feature] <= self.split_threshold).astype(self.split_masks.dtype)
+        # All ones where the row goes left, the split's mask where it goes right
+        np.negative(masks, out=masks)
+        masks |= self.split_masks
+        reachable = np.bitwise_and.reduceat(masks.view(np.uint64), self.tree_splits, axis=0)
+        reachable = reachable.view(self.split_masks.dtype)[:, :rows]
+        # The exit leaf is the lowest bit set; a lone power of two converts to float exactly
+        lowest = reachable & np.negative(reachable)
+        bit = np.frexp(lowest.astype(np.float64))[1] - 1
+        return self.leaf_nodes[self.tree_first_leaf + bit]
+
+    def _walk(self, X):
+        """Leaf node index for every (row, tree), descending one level per step"""
+        flat_X = X.ravel()
+        row_offsets = (np.arange(X.shape[0], dtype=np.int64) * self.n_features_in_)[:, None]
+        nodes = np.broadcast_to(self.roots64, (X.shape[0], self.roots64.shape[0])).copy()
+        for _ in range(self.max_depth):
+            go_left = flat_X[row_offsets + self.feature[nodes]] <= self.threshold[nodes]
+            nodes = self.children[2 * nodes + 1 - go_left]
+        return nodes
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features_in_)
+        n_trees, n_classes = self.roots64.shape[0], self.value.shape[1]
+        probabilities = np.empty((X.shape[0], n_classes))
+        # Score in blocks: the (trees, rows, classes) gather would otherwise need
+        # hundreds of MB for a large batch. One buffer serves every block.
+        buffer = np.empty(n_trees * min(X.shape[0], self.block_rows) * n_classes)
+        for start in range(0, X.shape[0], self.block_rows):
+            leaves = self._tree_leaves(X[start:start + self.block_rows])
+            values = buffer[:leaves.size * n_classes].reshape(leaves.shape + (n_classes,))
+            np.take(self.value, leaves, axis=0, out=values)
+            # Reducing over the leading tree axis adds trees in order, like
+            # sklearn's running total, so the probabilities are bit-identical
+            probabilities[start:start + self.block_rows] = np.add.reduce(values, axis=0) / n_trees
+        return probabilities
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+if __name__ == "__main__":
+    import joblib
+    path = export_forest(joblib.load(MODEL_PATH))
+    print("Compiled forest saved at:", path)
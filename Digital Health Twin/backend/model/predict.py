@@ -1,24 +1,302 @@
 import os
-import joblib
+import threading
+import time
+from collections import OrderedDict
+from collections import namedtuple
 import numpy as np
+from model import registry
+from model.forest import CompiledForest, COMPILED_MODEL_PATH
+from model.shadow import shadow_scorer
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "health_model.pkl")
 
-# Load model
-model = joblib.load(MODEL_PATH)
+# 'compiled' serves the exported NumPy forest (no sklearn import, no pickle);
+# 'sklearn' unpickles the full RandomForestClassifier
+MODEL_ENGINE = os.getenv('MODEL_ENGINE', 'compiled')
+# Version recorded for the bundled artifact when the registry has no active version
+MODEL_VERSION = os.getenv('MODEL_VERSION', '1.0')
 
-def predict_disease(ph, turbidity, tds, people_affected):
-    features = np.array([[ph, turbidity, tds, people_affected]])
-    prediction = model.predict(features)[0]
+# Prediction cache: sensors resend the same readings, so identical (quantized)
+# inputs skip the forest entirely
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 4096))
+# Decimal places kept for ph, turbidity, tds and people_affected
+QUANTIZATION = (2, 2, 1, 0)
+# How often to stat() the model file for changes, in seconds
+MODEL_CHECK_INTERVAL = float(os.getenv('MODEL_CHECK_INTERVAL', 1.0))
 
-    # Create health alert based on prediction
-    if prediction == "None":
-        alert = "Safe – No immediate outbreak risk."
+class PredictionCache:
+    """Thread-safe LRU of prediction scores with hit/miss counters"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
+
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE)
+
+# The model being served. Replaced as a whole (never mutated) so a request
+# always sees a matching model, version and cache signature.
+ServedModel = namedtuple('ServedModel', 'model version signature')
+served = None
+_last_model_check = 0.0
+_loading_signature = None
+_failed_signature = None
+_model_lock = threading.Lock()
+# ACTIVE version already warned about under MODEL_ENGINE=sklearn
+_ignored_active = None
+
+def _model_source():
+    """(signature, version, loader) of the artifact that should be served.
+
+    The registry's ACTIVE version wins; without one, the bundled artifact is
+    served under MODEL_VERSION. Registry versions are compiled forests only,
+    so MODEL_ENGINE=sklearn always serves the bundled pickle and warns when
+    an ACTIVE pointer is set.
+    """
+    global _ignored_active
+    active = registry.read_pointer(registry.ACTIVE)
+    if active and MODEL_ENGINE == 'compiled':
+        return f"registry-{active}", active, lambda: registry.load_version(active)
+    if active and active != _ignored_active:
+        _ignored_active = active
+        print(f"❌ Registry version {active} is ACTIVE but MODEL_ENGINE=sklearn serves the bundled "
+              f"{os.path.basename(MODEL_PATH)} as version {MODEL_VERSION}; set MODEL_ENGINE=compiled to serve it")
+    if MODEL_ENGINE == 'compiled' and os.path.exists(COMPILED_MODEL_PATH):
+        path, load = COMPILED_MODEL_PATH, CompiledForest.load
     else:
-        alert = f"Outbreak risk detected: {prediction}"
+        import joblib
+        path, load = MODEL_PATH, joblib.load
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}-{stat.st_mtime_ns}-{stat.st_size}", MODEL_VERSION, lambda: load(path)
+
+def _swap_in(signature, version, loaded):
+    global served
+    served = ServedModel(loaded, version, signature)
+    prediction_cache.clear()
+    print(f"✅ Serving model version {version}")
+
+def _load_in_background(signature, version, load):
+    global _loading_signature, _failed_signature
+    try:
+        loaded = load()
+        with _model_lock:
+            _swap_in(signature, version, loaded)
+    except Exception as e:
+        print(f"❌ Failed to load model version {version}: {e}")
+        _failed_signature = signature
+    finally:
+        _loading_signature = None
+
+def _refresh_model():
+    """Model to use for this call; starts loading a new version when one appears.
+
+    The first load is synchronous. After that, a changed artifact is loaded in
+    a background thread while the current model keeps serving, then swapped in.
+    """
+    global _last_model_check, _loading_signature
+    current = served
+    now = time.monotonic()
+    if current is not None and now - _last_model_check < MODEL_CHECK_INTERVAL:
+        return current
+    with _model_lock:
+        _last_model_check = now
+        signature, version, load = _model_source()
+        shadow_scorer.set_version(registry.read_pointer(registry.SHADOW))
+        if served is None:
+            _swap_in(signature, version, load())
+        elif signature not in (served.signature, _loading_signature, _failed_signature):
+            _loading_signature = signature
+            threading.Thread(
+                target=_load_in_background, args=(signature, version, load),
+                name='model-loader', daemon=True
+            ).start()
+        return served
+
+def load_model():
+    """Load the model now instead of on the first prediction"""
+    _refresh_model()
+
+# Process that started a background first load (fast start), if any
+_first_load_pid = None
+
+def start_model_load():
+    """Load the model in a background thread of this process; model_ready() tells when it is in"""
+    global _first_load_pid
+    if served is not None or _first_load_pid == os.getpid():
+        return
+    _first_load_pid = os.getpid()
+    threading.Thread(target=_first_load, name='model-loader', daemon=True).start()
+
+def _first_load():
+    global _first_load_pid
+    try:
+        _refresh_model()
+    except Exception as e:
+        print(f"❌ Failed to load model: {e}")
+        _first_load_pid = None  # the next readiness check tries again
+
+def model_ready():
+    return served is not None
+
+def _reset_after_fork():
+    # A Gunicorn worker forked while the master's loader thread held the lock
+    # would wait on it forever; that thread does not exist in the child
+    global _model_lock, _loading_signature
+    _model_lock = threading.Lock()
+    _loading_signature = None
 
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def quantize(ph, turbidity, tds, people_affected):
+    """Round inputs to the precision field kits report at; this is the cache key"""
+    return tuple(
+        round(float(value), digits) if digits else int(round(float(value)))
+        for value, digits in zip((ph, turbidity, tds, people_affected), QUANTIZATION)
+    )
+
+def build_health_alert(prediction):
+    """Create health alert message based on prediction"""
+    if prediction == "None":
+        return "Safe – No immediate outbreak risk."
+    return f"Outbreak risk detected: {prediction}"
+
+def _scores(probabilities, classes):
+    """Label, confidence, margin and per-class probabilities from one predict_proba row.
+
+    The label is the argmax class, exactly what `predict` would return: on a
+    tie, the first of the tied classes (the margin is then 0).
+    """
+    best = int(np.argmax(probabilities))
+    top = probabilities[best]
+    runner_up = np.delete(probabilities, best).max() if len(probabilities) > 1 else 0.0
+    return (
+        str(classes[best]),
+        float(top),
+        float(top - runner_up),
+        tuple((str(label), float(probability)) for label, probability in zip(classes, probabilities))
+    )
+
+def _result(scores, version):
+    prediction, confidence, margin, probabilities = scores
     return {
         "predicted_disease": prediction,
-        "health_alert": alert
+        "health_alert": build_health_alert(prediction),
+        "confidence_score": round(confidence, 4),
+        "confidence_margin": round(margin, 4),
+        "class_probabilities": {label: round(probability, 4) for label, probability in probabilities},
+        "model_version": version
+    }
+
+def _shadow(features, scores, version):
+    """Hand the rows just scored to the shadow model, if one is configured"""
+    if shadow_scorer.version is not None:
+        shadow_scorer.submit(
+            np.asarray(features, dtype=np.float64).reshape(-1, 4),
+            np.array([row[0] for row in scores]),
+            np.array([row[1] for row in scores]),
+            version
+        )
+
+def predict_disease(ph, turbidity, tds, people_affected):
+    current = _refresh_model()
+    features = quantize(ph, turbidity, tds, people_affected)
+    key = (current.signature, features)
+
+    scores = prediction_cache.get(key)
+    if scores is None:
+        # One forest pass gives the label and its confidence
+        probabilities = current.model.predict_proba(np.array([features], dtype=np.float64))[0]
+        scores = _scores(probabilities, current.model.classes_)
+        prediction_cache.set(key, scores)
+
+    _shadow([features], [scores], current.version)
+    return _result(scores, current.version)
+
+def predict_diseases(samples):
+    """Predict diseases for many samples with a single model call.
+
+    `samples` is a sequence of (ph, turbidity, tds, people_affected) rows.
+    Returns one result dict per row, in the same order. Cached rows are
+    answered from the prediction cache; the rest go through one batched call.
+    """
+    if len(samples) == 0:
+        return []
+
+    current = _refresh_model()
+    keys = [(current.signature, quantize(*sample)) for sample in samples]
+    scores = [prediction_cache.get(key) for key in keys]
+
+    missing = [index for index, cached in enumerate(scores) if cached is None]
+    if missing:
+        features = np.array([keys[index][1] for index in missing], dtype=np.float64)
+        probabilities = current.model.predict_proba(features)
+        for index, row in zip(missing, probabilities):
+            scores[index] = _scores(row, current.model.classes_)
+            prediction_cache.set(keys[index], scores[index])
+
+    _shadow([key[1] for key in keys], scores, current.version)
+    return [_result(row, current.version) for row in scores]
+
+def predict_proba_batch(features):
+    """Raw vectorized scoring for offline jobs: (classes, probabilities) for an (n, 4) array.
+
+    Bypasses the prediction cache; quantizes like the online path so scores match.
+    """
+    current = _refresh_model()
+    quantized = np.array([quantize(*row) for row in features], dtype=np.float64).reshape(-1, 4)
+    return current.model.classes_, current.model.predict_proba(quantized)
+
+def model_status():
+    """Served model version and metadata, registry contents and shadow comparison"""
+    current = _refresh_model()
+    from_registry = current.signature == f"registry-{current.version}"
+    return {
+        'engine': MODEL_ENGINE,
+        'version': current.version,
+        'source': 'registry' if from_registry else 'bundled',
+        'loading': _loading_signature is not None,
+        'metadata': registry.metadata(current.version) if from_registry else None,
+        'registry': {
+            'active': registry.read_pointer(registry.ACTIVE),
+            # The sklearn engine cannot load registry versions
+            'active_ignored': MODEL_ENGINE != 'compiled' and registry.read_pointer(registry.ACTIVE) is not None,
+            'versions': [entry['version'] for entry in registry.list_versions()]
+        },
+        'shadow': shadow_scorer.stats()
     }
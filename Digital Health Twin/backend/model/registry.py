@@ -0,0 +1,157 @@
+"""Registry of versioned model artifacts.
+
+Every published version is an immutable directory holding the compiled
+forest and its metadata. Two pointer files choose what gets served:
+
+    model/registry/
+        ACTIVE                  version answering /predict
+        SHADOW                  optional candidate scored off the request path
+        <version>/
+            health_model.npz    compiled forest (see model/forest.py)
+            metadata.json       version, created_at, classes, metrics, ...
+
+Workers poll the pointers (MODEL_CHECK_INTERVAL), load a new active version
+in the background and swap it in without a restart. When there is no ACTIVE
+pointer the app serves model/health_model.npz as before. MODEL_ENGINE=sklearn
+ignores ACTIVE (it only loads model/health_model.pkl) and logs a warning.
+
+    python -m model.registry publish <version> [model.pkl]
+    python -m model.registry activate <version>
+    python -m model.registry shadow <version>|off
+    python -m model.registry list
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from model.forest import export_forest, CompiledForest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_DIR = os.getenv('MODEL_REGISTRY_DIR', os.path.join(BASE_DIR, 'registry'))
+ARTIFACT_NAME = 'health_model.npz'
+METADATA_NAME = 'metadata.json'
+ACTIVE = 'ACTIVE'
+SHADOW = 'SHADOW'
+# Must fit PredictionRecord.model_version
+MAX_VERSION_LENGTH = 20
+
+def _version_dir(version, registry_dir=None):
+    return os.path.join(registry_dir or REGISTRY_DIR, version)
+
+def _write_atomic(path, text):
+    """Write via a temp file + rename so readers never see a partial file"""
+    directory = os.path.dirname(path)
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    with os.fdopen(handle, 'w') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+def validate_version(version):
+    if not version or len(version) > MAX_VERSION_LENGTH or not all(c.isalnum() or c in '._-' for c in version):
+        raise ValueError(f"Invalid model version '{version}': use up to {MAX_VERSION_LENGTH} letters, digits, '.', '_' or '-'")
+
+def read_pointer(name, registry_dir=None):
+    """Version named by the ACTIVE or SHADOW pointer, or None"""
+    try:
+        with open(os.path.join(registry_dir or REGISTRY_DIR, name)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def artifact_path(version, registry_dir=None):
+    return os.path.join(_version_dir(version, registry_dir), ARTIFACT_NAME)
+
+def load_version(version, registry_dir=None):
+    return CompiledForest.load(artifact_path(version, registry_dir))
+
+def metadata(version, registry_dir=None):
+    with open(os.path.join(_version_dir(version, registry_dir), METADATA_NAME)) as f:
+        return json.load(f)
+
+def list_versions(registry_dir=None):
+    """Metadata of every published version, oldest first"""
+    registry_dir = registry_dir or REGISTRY_DIR
+    if not os.path.isdir(registry_dir):
+        return []
+    versions = [
+        metadata(name, registry_dir) for name in os.listdir(registry_dir)
+        if os.path.isfile(os.path.join(registry_dir, name, METADATA_NAME))
+    ]
+    return sorted(versions, key=lambda entry: entry.get('created_at', ''))
+
+def publish(model, version, extra_metadata=None, registry_dir=None):
+    """Export a fitted RandomForestClassifier as a new immutable version"""
+    validate_version(version)
+    registry_dir = registry_dir or REGISTRY_DIR
+    target = _version_dir(version, registry_dir)
+    if os.path.exists(target):
+        raise ValueError(f"Model version '{version}' already exists")
+
+    os.makedirs(registry_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=registry_dir, prefix='.publish-')
+    try:
+        export_forest(model, os.path.join(staging, ARTIFACT_NAME))
+        info = {
+            'version': version,
+            'created_at': datetime.utcnow().isoformat(),
+            'classes': [str(label) for label in model.classes_],
+            'n_features': int(model.n_features_in_),
+            'n_estimators': len(model.estimators_),
+            **(extra_metadata or {})
+        }
+        with open(os.path.join(staging, METADATA_NAME), 'w') as f:
+            json.dump(info, f, indent=2)
+        # The version appears complete or not at all
+        os.rename(staging, target)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return info
+
+def _set_pointer(name, version, registry_dir=None):
+    registry_dir = registry_dir or REGISTRY_DIR
+    if version is None:
+        try:
+            os.remove(os.path.join(registry_dir, name))
+        except FileNotFoundError:
+            pass
+        return
+    if not os.path.isfile(artifact_path(version, registry_dir)):
+        raise ValueError(f"Model version '{version}' is not in the registry")
+    _write_atomic(os.path.join(registry_dir, name), version + '\n')
+
+def activate(version, registry_dir=None):
+    """Promote a version; workers pick it up within MODEL_CHECK_INTERVAL"""
+    _set_pointer(ACTIVE, version, registry_dir)
+
+def set_shadow(version, registry_dir=None):
+    """Score a candidate version in shadow mode, or stop with version=None"""
+    _set_pointer(SHADOW, version, registry_dir)
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+    try:
+        if command == 'publish' and len(sys.argv) >= 3:
+            import joblib
+            source = sys.argv[3] if len(sys.argv) > 3 else os.path.join(BASE_DIR, 'health_model.pkl')
+            info = publish(joblib.load(source), sys.argv[2], {'source': os.path.basename(source)})
+            print(f"✅ Published model version {info['version']}")
+        elif command == 'activate' and len(sys.argv) == 3:
+            activate(sys.argv[2])
+            print(f"✅ Active model version: {sys.argv[2]}")
+        elif command == 'shadow' and len(sys.argv) == 3:
+            set_shadow(None if sys.argv[2] == 'off' else sys.argv[2])
+            print(f"✅ Shadow model version: {sys.argv[2]}")
+        elif command == 'list':
+            active, shadow = read_pointer(ACTIVE), read_pointer(SHADOW)
+            for entry in list_versions():
+                marker = ' (active)' if entry['version'] == active else ' (shadow)' if entry['version'] == shadow else ''
+                print(f"{entry['version']:20} {entry.get('created_at', '')}{marker}")
+        else:
+            print(__doc__)
+            sys.exit(2)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
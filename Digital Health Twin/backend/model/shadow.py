@@ -0,0 +1,135 @@
+"""Shadow scoring of a candidate model.
+
+When the registry's SHADOW pointer names a version, every input the active
+model scores is also queued here. A background thread scores the queued
+inputs with the candidate in batches and keeps agreement statistics, so
+the candidate can be compared on live traffic before it is promoted.
+Nothing here runs on the request path except a non-blocking queue put;
+when the queue is full the sample is dropped and counted.
+
+Statistics are per worker process and reset when the shadow version changes.
+"""
+import os
+import queue
+import threading
+import time
+from collections import Counter
+import numpy as np
+from model import registry
+
+SHADOW_QUEUE_SIZE = int(os.getenv('SHADOW_QUEUE_SIZE', 10000))
+# Queued submissions scored together in one predict_proba call
+SHADOW_BATCH_SIZE = 256
+
+class ShadowScorer:
+    def __init__(self, max_queued=SHADOW_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.lock = threading.Lock()
+        self.version = None
+        self.model = None
+        self.thread = None
+        self.pid = None
+        self._reset()
+
+    def _reset(self):
+        self.compared = 0
+        self.agreed = 0
+        self.dropped = 0
+        self.confidence_delta = 0.0
+        self.disagreements = Counter()
+        self.score_seconds = 0.0
+
+    def set_version(self, version):
+        """Follow the SHADOW pointer; the candidate is loaded by the worker thread"""
+        with self.lock:
+            if version == self.version:
+                return
+            self.version = version
+            self.model = None
+            self._reset()
+
+    def submit(self, features, labels, confidences, active_version):
+        """Queue rows the active model just scored (never blocks)"""
+        if self.version is None or self.version == active_version:
+            return
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait((self.version, features, labels, confidences))
+        except queue.Full:
+            with self.lock:
+                self.dropped += len(labels)
+
+    def _ensure_thread(self):
+        # Threads do not survive a fork, so each Gunicorn worker starts its own
+        if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+            with self.lock:
+                if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+                    self.pid = os.getpid()
+                    self.thread = threading.Thread(target=self._run, name='shadow-scorer', daemon=True)
+                    self.thread.start()
+
+    def _run(self):
+        while True:
+            items = [self.queue.get()]
+            rows = len(items[0][2])
+            while rows < SHADOW_BATCH_SIZE:
+                try:
+                    items.append(self.queue.get_nowait())
+                    rows += len(items[-1][2])
+                except queue.Empty:
+                    break
+            try:
+                self._score(items)
+            except Exception as e:
+                print(f"❌ Shadow scoring failed: {e}")
+
+    def _score(self, items):
+        version = self.version
+        items = [item for item in items if item[0] == version]
+        if not items:
+            return
+        model = self.model
+        if model is None:
+            model = registry.load_version(version)
+            with self.lock:
+                if self.version != version:
+                    return
+                self.model = model
+
+        started = time.perf_counter()
+        features = np.concatenate([item[1] for item in items])
+        labels = np.concatenate([item[2] for item in items])
+        confidences = np.concatenate([item[3] for item in items])
+        probabilities = model.predict_proba(features)
+        shadow_labels = np.asarray(model.classes_)[probabilities.argmax(axis=1)].astype(str)
+        agree = shadow_labels == labels
+        elapsed = time.perf_counter() - started
+
+        with self.lock:
+            if self.version != version:
+                return
+            self.compared += len(labels)
+            self.agreed += int(agree.sum())
+            self.confidence_delta += float(np.abs(probabilities.max(axis=1) - confidences).sum())
+            self.disagreements.update(
+                f"{active}->{shadow}" for active, shadow in zip(labels[~agree], shadow_labels[~agree])
+            )
+            self.score_seconds += elapsed
+
+    def stats(self):
+        with self.lock:
+            if self.version is None:
+                return {'version': None}
+            return {
+                'version': self.version,
+                'loaded': self.model is not None,
+                'compared': self.compared,
+                'agreement_rate': round(self.agreed / self.compared, 4) if self.compared else None,
+                'mean_confidence_delta': round(self.confidence_delta / self.compared, 4) if self.compared else None,
+                'disagreements': dict(self.disagreements.most_common(20)),
+                'queued': self.queue.qsize(),
+                'dropped': self.dropped,
+                'score_ms_per_row': round(1000 * self.score_seconds / self.compared, 4) if self.compared else None
+            }
+
+shadow_scorer = ShadowScorer()
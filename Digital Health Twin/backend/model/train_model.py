@@ -3,6 +3,7 @@ import joblib
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
+from forest import export_forest
 
 # ----------------------------
 # Dataset (20 rows sample)
@@ -51,3 +52,6 @@ joblib.dump(model, MODEL_PATH)
 
 print("Model trained and saved at:", MODEL_PATH)
 
+# Export the pickle-free compiled forest used at serve time
+print("Compiled forest saved at:", export_forest(model))
+
@@ -0,0 +1,311 @@
+"""Outbreak cluster detection over prediction history.
+
+A HealthAlert is raised per sample. This job looks across samples: for every
+(state, district, disease) it counts predictions per day and runs a one-sided
+CUSUM of the daily count against that key's own baseline, an exponentially
+weighted mean and variance of its past daily counts:
+
+    S(day) = max(0, S(day - 1) + (count - mean) / sd - K)
+
+S grows while a district keeps reporting more cases than usual. Once it
+passes H and the run holds at least OUTBREAK_MIN_CASES cases, an
+OutbreakAlert is written; it is updated while the run lasts and ENDED when S
+falls back to zero. S is carried over at most H, so however large the burst,
+the alert ends after about H / K days back at baseline. The open day is
+scored provisionally on every scan, so a burst is flagged the day it
+happens. sd is at least sqrt(max(mean, 1)) (Poisson noise): twenty Cholera
+predictions in one quiet district stand out, twenty spread over twenty
+districts do not. Days inside a run do not feed the baseline.
+
+Incremental: the scan state holds the last prediction id counted. Each scan
+aggregates only predictions above it (a primary key range) per key and day in
+SQL, and updates only the detector rows of keys with new data or an active
+alert, so its cost follows the new rows, not the history. Predictions newer
+than OUTBREAK_SETTLE_SECONDS wait for the next scan, so rows of transactions
+still in flight are not skipped. The first scan seeds the baselines from the
+daily rollups of the last OUTBREAK_BASELINE_DAYS instead of reading raw
+history. Predictions for a day that is already scored count towards the open
+day. No alert is raised for a district seen for less than
+OUTBREAK_MIN_HISTORY_DAYS.
+
+    python outbreaks.py scan                     one incremental pass
+    python outbreaks.py watch [--interval 60]    scan every --interval seconds
+    python outbreaks.py reset                    drop the detector state; the next scan re-seeds
+
+Run one scanner per database.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from sqlalchemy import func, select
+from database import (db, WaterQualityRecord, PredictionRecord, PredictionRollup, OutbreakAlert,
+                      OutbreakBaseline, OutbreakScanState, determine_alert_level)
+from sqlite_writer import sqlite_writer
+
+DISEASES = [name.strip() for name in os.getenv('OUTBREAK_DISEASES', 'Cholera,Diarrhea,Typhoid').split(',') if name.strip()]
+# Allowed drift per day and alarm threshold, both in standard deviations
+CUSUM_K = float(os.getenv('OUTBREAK_CUSUM_K', 0.5))
+CUSUM_H = float(os.getenv('OUTBREAK_CUSUM_H', 4.0))
+MIN_CASES = int(os.getenv('OUTBREAK_MIN_CASES', 5))
+BASELINE_DAYS = int(os.getenv('OUTBREAK_BASELINE_DAYS', 28))
+MIN_HISTORY_DAYS = int(os.getenv('OUTBREAK_MIN_HISTORY_DAYS', 7))
+SETTLE_SECONDS = float(os.getenv('OUTBREAK_SETTLE_SECONDS', 10))
+# Weight of the newest day in the baseline: the centre of mass of a BASELINE_DAYS mean
+ALPHA = 2 / (BASELINE_DAYS + 1)
+# Longer gaps without data are skipped: the baseline has decayed to nothing by then
+MAX_GAP_DAYS = 3 * BASELINE_DAYS
+
+def _as_date(value):
+    # func.date() gives a string on SQLite
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def _key_columns():
+    return (
+        func.coalesce(WaterQualityRecord.state, ''),
+        func.coalesce(WaterQualityRecord.district, ''),
+        PredictionRecord.predicted_disease,
+        func.date(PredictionRecord.timestamp)
+    )
+
+def _daily_counts(*conditions):
+    """(state, district, disease, day, count) of predictions matching `conditions`"""
+    keys = _key_columns()
+    statement = select(*keys, func.count(PredictionRecord.id))\
+        .join(WaterQualityRecord, PredictionRecord.water_quality_id == WaterQualityRecord.id)\
+        .where(PredictionRecord.predicted_disease.in_(DISEASES), *conditions)\
+        .group_by(*keys)
+    return [(state, district, disease, _as_date(day), count)
+            for state, district, disease, day, count in db.session.execute(statement)]
+
+def _settled_upper_bound(now):
+    """Highest prediction id below which every row is older than the settle window"""
+    latest = db.session.execute(select(func.max(PredictionRecord.id))).scalar() or 0
+    # A range on ix_prediction_records_timestamp: only the last few seconds of rows.
+    # `+ 0` keeps the planner from walking the primary key for MIN(id) instead
+    first_unsettled = db.session.execute(
+        select(func.min(PredictionRecord.id + 0))
+        .where(PredictionRecord.timestamp > now - timedelta(seconds=SETTLE_SECONDS))
+    ).scalar()
+    return latest if first_unsettled is None else min(latest, first_unsettled - 1)
+
+def _sd(baseline):
+    return math.sqrt(max(baseline.variance, baseline.mean, 1.0))
+
+def _score(baseline):
+    """CUSUM including the open day's count so far"""
+    return max(0.0, baseline.cusum + (baseline.day_count - baseline.mean) / _sd(baseline) - CUSUM_K)
+
+def _close_day(baseline, run):
+    """Score the open day for good and open the next one"""
+    score = _score(baseline)
+    if score > 0:
+        if baseline.cusum == 0:
+            baseline.run_start, baseline.run_cases, baseline.run_expected = baseline.day, 0, 0.0
+        baseline.run_cases += baseline.day_count
+        baseline.run_expected += baseline.mean
+    else:
+        alert = run.alerts.pop(baseline.alert_id, None)
+        if alert is not None:
+            alert.status = 'ENDED'
+            run.ended += 1
+        baseline.alert_id = None
+        baseline.run_start, baseline.run_cases, baseline.run_expected = None, 0, 0.0
+        difference = baseline.day_count - baseline.mean
+        baseline.mean += ALPHA * difference
+        baseline.variance = (1 - ALPHA) * (baseline.variance + ALPHA * difference * difference)
+    baseline.cusum = min(score, CUSUM_H)
+    baseline.days_observed += 1
+    baseline.day += timedelta(days=1)
+    baseline.day_count = 0
+
+def _advance(baseline, day, run):
+    """Close days until `day` is the open one"""
+    while baseline.day < day:
+        _close_day(baseline, run)
+        skipped = (day - baseline.day).days - MAX_GAP_DAYS
+        if skipped > 0:
+            baseline.day += timedelta(days=skipped)
+            baseline.days_observed += skipped
+
+def _check_open_day(baseline, run):
+    """Raise, or bring up to date, the key's alert from the open day's provisional score"""
+    score = _score(baseline)
+    in_run = baseline.cusum > 0
+    cases = (baseline.run_cases if in_run else 0) + baseline.day_count
+    expected = (baseline.run_expected if in_run else 0.0) + baseline.mean
+
+    alert = run.alerts.get(baseline.alert_id)
+    if alert is None:
+        if score <= CUSUM_H or cases < MIN_CASES or baseline.days_observed < MIN_HISTORY_DAYS:
+            return
+        alert = OutbreakAlert(
+            state=baseline.state,
+            district=baseline.district,
+            predicted_disease=baseline.predicted_disease,
+            alert_level=determine_alert_level(baseline.predicted_disease),
+            status='ACTIVE',
+            window_start=baseline.run_start if in_run else baseline.day,
+            window_end=baseline.day
+        )
+        db.session.add(alert)
+        run.raised += 1
+    if baseline.day_count:
+        alert.window_end = baseline.day
+    alert.case_count = cases
+    alert.expected_count = expected
+    alert.score = max(alert.score or 0.0, score)
+    if alert.id is None:
+        db.session.flush()
+        run.alerts[alert.id] = alert
+        baseline.alert_id = alert.id
+
+def _new_baseline(state, district, disease, day, baselines):
+    # A disease new to a known district has had a daily count of zero for as long as the district has reported
+    history = [
+        baseline.days_observed + (day - baseline.day).days
+        for (other_state, other_district, _), baseline in baselines.items()
+        if (other_state, other_district) == (state, district)
+    ]
+    baseline = OutbreakBaseline(state=state, district=district, predicted_disease=disease, day=day, day_count=0,
+                                mean=0.0, variance=0.0, cusum=0.0, days_observed=max(history, default=0),
+                                run_start=None, run_cases=0, run_expected=0.0)
+    db.session.add(baseline)
+    baselines[(state, district, disease)] = baseline
+    return baseline
+
+def _seed_baselines(upto, today):
+    """Baselines from the rollups of the last BASELINE_DAYS, and today's counts up to `upto`"""
+    first_day = today - timedelta(days=BASELINE_DAYS)
+    history = {}
+    for state, district, disease, day, count in db.session.execute(
+        select(PredictionRollup.state, PredictionRollup.district, PredictionRollup.predicted_disease,
+               PredictionRollup.day, PredictionRollup.record_count)
+        .where(PredictionRollup.day >= first_day, PredictionRollup.day < today,
+               PredictionRollup.predicted_disease.in_(DISEASES), PredictionRollup.record_count > 0)
+    ):
+        history.setdefault((state, district, disease), {})[_as_date(day)] = count
+
+    district_first_day = {}
+    for (state, district, _), days in history.items():
+        district_first_day[(state, district)] = min(min(days), district_first_day.get((state, district), today))
+
+    baselines = {}
+    for (state, district, disease), days in history.items():
+        observed = (today - district_first_day[(state, district)]).days
+        counts = [days.get(district_first_day[(state, district)] + timedelta(days=offset), 0) for offset in range(observed)]
+        mean = sum(counts) / observed
+        baselines[(state, district, disease)] = OutbreakBaseline(
+            state=state, district=district, predicted_disease=disease, day=today, day_count=0,
+            mean=mean, variance=sum((count - mean) ** 2 for count in counts) / observed, cusum=0.0,
+            days_observed=observed, run_start=None, run_cases=0, run_expected=0.0
+        )
+        db.session.add(baselines[(state, district, disease)])
+
+    midnight = datetime(today.year, today.month, today.day)
+    for state, district, disease, _, count in _daily_counts(PredictionRecord.timestamp >= midnight,
+                                                              PredictionRecord.id <= upto):
+        baseline = baselines.get((state, district, disease)) or _new_baseline(state, district, disease, today, baselines)
+        baseline.day_count += count
+    return baselines
+
+def scan(now=None):
+    """One incremental pass over the predictions added since the last one. Returns a summary."""
+    now = now or datetime.utcnow()
+    today = now.date()
+    started = time.perf_counter()
+    with sqlite_writer.lock():
+        try:
+            state = db.session.execute(select(OutbreakScanState).with_for_update()).scalar_one_or_none()
+            upto = _settled_upper_bound(now)
+            run = SimpleNamespace(
+                alerts={alert.id: alert for alert in OutbreakAlert.query.filter_by(status='ACTIVE')},
+                raised=0, ended=0
+            )
+
+            if state is None:
+                baselines = _seed_baselines(upto, today)
+                state = OutbreakScanState(id=1, last_prediction_id=upto)
+                db.session.add(state)
+                counts, touched = [], set(baselines)
+            else:
+                baselines = {
+                    (baseline.state, baseline.district, baseline.predicted_disease): baseline
+                    for baseline in OutbreakBaseline.query
+                }
+                counts = []
+                if upto > state.last_prediction_id:
+                    counts = _daily_counts(PredictionRecord.id > state.last_prediction_id, PredictionRecord.id <= upto)
+                touched = set()
+
+            # Oldest day first, so every key's days are closed in order
+            for key_state, district, disease, day, count in sorted(counts, key=lambda row: row[3]):
+                key = (key_state, district, disease)
+                baseline = baselines.get(key) or _new_baseline(key_state, district, disease, day, baselines)
+                _advance(baseline, day, run)
+                baseline.day_count += count
+                touched.add(key)
+
+            # An active run ends on a quiet day too, even when the district sent nothing since
+            for key, baseline in baselines.items():
+                if baseline.alert_id is not None and baseline.day < today:
+                    _advance(baseline, today, run)
+                    touched.add(key)
+
+            for key in touched:
+                _check_open_day(baselines[key], run)
+
+            watermark = state.last_prediction_id = max(state.last_prediction_id, upto)
+            state.scanned_at = now
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    return {
+        'watermark': watermark,
+        'new_predictions': sum(row[4] for row in counts),
+        'keys_updated': len(touched),
+        'alerts_raised': run.raised,
+        'alerts_ended': run.ended,
+        'active_alerts': len(run.alerts),
+        'seconds': round(time.perf_counter() - started, 4)
+    }
+
+def reset():
+    """Forget the detector state and end its active alerts; the next scan seeds again"""
+    with sqlite_writer.lock():
+        OutbreakAlert.query.filter_by(status='ACTIVE').update({'status': 'ENDED'})
+        OutbreakBaseline.query.delete()
+        OutbreakScanState.query.delete()
+        db.session.commit()
+
+def print_summary(summary):
+    print(f"✅ Outbreak scan up to prediction {summary['watermark']}: {summary['new_predictions']} new predictions, "
+          f"{summary['keys_updated']} districts/diseases updated, {summary['alerts_raised']} raised, "
+          f"{summary['alerts_ended']} ended, {summary['active_alerts']} active ({summary['seconds'] * 1000:.0f}ms)")
+
+if __name__ == "__main__":
+    from app import app
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['scan', 'watch', 'reset'])
+    parser.add_argument('--interval', type=float, default=60)
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.command == 'reset':
+            reset()
+            print("✅ Outbreak detector state dropped")
+        elif args.command == 'scan':
+            print_summary(scan())
+        else:
+            while True:
+                try:
+                    print_summary(scan())
+                except Exception as e:
+                    print(f"❌ Outbreak scan failed: {e}")
+                sys.stdout.flush()
+                time.sleep(args.interval)
@@ -0,0 +1,48 @@
+"""Keyset (cursor) pagination helpers.
+
+Pages are ordered newest first by (timestamp, id). The cursor handed to the
+client is an opaque token holding the key of the last row on the page, so
+the next page is a range seek on an index instead of an OFFSET scan, and
+its cost does not depend on how deep the client has paged.
+"""
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+def encode_cursor(timestamp, record_id):
+    payload = json.dumps([timestamp.isoformat(), record_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Return (timestamp, id) from a cursor. Raises ValueError if it is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, record_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(timestamp), int(record_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def keyset_page(query, timestamp_column, id_column, cursor, limit, key):
+    """Fetch one page of `query`, newest first.
+
+    `key` maps a result row to its (timestamp, id). Returns (rows, next_cursor);
+    next_cursor is None on the last page. Raises ValueError if limit is below 1.
+    """
+    if limit < 1:
+        raise ValueError('limit must be at least 1')
+    if cursor:
+        timestamp, record_id = decode_cursor(cursor)
+        # The leading `<=` is the index range; the OR only breaks timestamp ties
+        query = query.filter(and_(
+            timestamp_column <= timestamp,
+            or_(timestamp_column < timestamp, id_column < record_id)
+        ))
+
+    rows = query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*key(rows[-1]))
+    return rows, next_cursor
@@ -0,0 +1,314 @@
+"""Retrain the disease model on confirmed alert outcomes.
+
+Labels come from RESOLVED alerts with a `confirmed_disease` ('None' marks a
+false alarm); the features are the water quality reading the alert was
+raised for. Rows are streamed from the database in chunks straight into
+NumPy arrays instead of being loaded into pandas in one go, and only a
+bounded sample is kept: at most --max-rows training rows and MAX_HOLDOUT_ROWS
+hold-out rows, stratified by label. Memory therefore stops growing with
+labeled history once it passes those sizes.
+
+The most recent --holdout-days of labeled readings are held out. With
+--search, parameter sets are compared on the newest part of the training
+window in parallel processes; the chosen parameters are then fitted on the
+whole training window using every core and scored on the hold-out next to
+the model currently being served. The new model is published to the model
+registry with its metrics, and can be put in shadow mode or activated.
+
+    python retrain.py [--holdout-days 30] [--max-rows 500000] [--search] [--shadow | --activate]
+
+Wall time per stage and peak memory are printed and stored in the version's
+metadata.
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+from sqlalchemy import func, select
+from database import db, WaterQualityRecord, PredictionRecord, HealthAlert
+from model import registry
+from model.predict import QUANTIZATION
+
+CHUNK_SIZE = 10000
+MIN_TRAINING_ROWS = 50
+# Labeled rows kept for fitting and for the hold-out; beyond these, a sample
+MAX_TRAINING_ROWS = 500000
+MAX_HOLDOUT_ROWS = 100000
+# Newest share of the training window used to compare parameter sets
+VALIDATION_FRACTION = 0.2
+# Rows bootstrapped per tree. Caps tree size, so fit time and model size stop
+# growing with labeled history beyond this many rows
+MAX_SAMPLES_PER_TREE = 100000
+DEFAULT_PARAMS = {'n_estimators': 100, 'max_depth': None, 'min_samples_leaf': 5}
+SEARCH_GRID = [
+    {'n_estimators': trees, 'max_depth': depth, 'min_samples_leaf': leaf}
+    for trees in (100, 200)
+    for depth in (None, 12)
+    for leaf in (1, 5)
+]
+
+def _labeled(*columns):
+    """SELECT `columns` over confirmed outcomes joined to their readings"""
+    return select(*columns).select_from(HealthAlert)\
+        .join(PredictionRecord, HealthAlert.prediction_id == PredictionRecord.id)\
+        .join(WaterQualityRecord, PredictionRecord.water_quality_id == WaterQualityRecord.id)\
+        .where(HealthAlert.status == 'RESOLVED', HealthAlert.confirmed_disease.isnot(None))
+
+def latest_labeled_timestamp():
+    """Timestamp of the newest labeled reading as datetime64[us], or None"""
+    latest = db.session.execute(_labeled(func.max(PredictionRecord.timestamp))).scalar()
+    return np.datetime64(latest, 'us') if latest is not None else None
+
+def stream_labeled_rows(chunk_size=CHUNK_SIZE):
+    """Yield (features, labels, timestamps) chunks of confirmed outcomes.
+
+    One query read through a server-side cursor, `chunk_size` rows at a time.
+    """
+    statement = _labeled(
+        WaterQualityRecord.ph,
+        WaterQualityRecord.turbidity,
+        WaterQualityRecord.tds,
+        WaterQualityRecord.people_affected_per_5000,
+        HealthAlert.confirmed_disease,
+        PredictionRecord.timestamp
+    )
+
+    result = db.session.execute(statement.execution_options(yield_per=chunk_size))
+    for rows in result.partitions():
+        yield (
+            np.array([row[:4] for row in rows], dtype=np.float64),
+            np.array([row[4] for row in rows]).astype(str),
+            np.array([row[5] for row in rows], dtype='datetime64[us]')
+        )
+
+class StratifiedSample:
+    """Bounded sample of streamed (features, labels, timestamps) rows.
+
+    Every row gets a random key and each label keeps the `size` rows with the
+    lowest keys (bottom-k sampling: a uniform sample of that label). Chunks are
+    buffered and cut back to `size` once a label holds twice that, so at most
+    2 * `size` rows per label are held whatever the history. rows() then takes
+    each label's share of `size` in proportion to the rows it has seen.
+    """
+
+    def __init__(self, size, seed=42):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.parts = {}
+        self.held = Counter()
+        self.counts = Counter()
+
+    @property
+    def seen(self):
+        return sum(self.counts.values())
+
+    def add(self, X, y, timestamps):
+        keys = self.rng.random(len(y))
+        for label in np.unique(y):
+            rows = y == label
+            count = int(rows.sum())
+            self.counts[label] += count
+            self.held[label] += count
+            self.parts.setdefault(label, []).append((keys[rows], X[rows], timestamps[rows]))
+            if self.held[label] > 2 * self.size:
+                self._compact(label)
+
+    def _compact(self, label):
+        keys, X, timestamps = (np.concatenate(part) for part in zip(*self.parts[label]))
+        if len(keys) > self.size:
+            lowest = np.argpartition(keys, self.size)[:self.size]
+            keys, X, timestamps = keys[lowest], X[lowest], timestamps[lowest]
+        self.parts[label] = [(keys, X, timestamps)]
+        self.held[label] = len(keys)
+
+    def rows(self):
+        """(X, y, timestamps) of the sample; every row when no more than `size` were seen"""
+        X, y, timestamps = [np.empty((0, 4))], [np.array([], dtype=str)], [np.array([], dtype='datetime64[us]')]
+        for label in sorted(self.parts):
+            self._compact(label)
+            keys, label_X, label_timestamps = self.parts[label][0]
+            share = len(keys)
+            if self.seen > self.size:
+                # At least one row, so a rare label is never sampled away
+                share = min(share, max(1, round(self.size * self.counts[label] / self.seen)))
+            lowest = np.argsort(keys)[:share]
+            X.append(label_X[lowest])
+            y.append(np.full(share, label))
+            timestamps.append(label_timestamps[lowest])
+        return np.concatenate(X), np.concatenate(y), np.concatenate(timestamps)
+
+def load_labeled_rows(holdout_start, max_rows=MAX_TRAINING_ROWS, chunk_size=CHUNK_SIZE):
+    """Stream the labeled rows into a training and a hold-out StratifiedSample (features quantized)"""
+    train, holdout = StratifiedSample(max_rows), StratifiedSample(MAX_HOLDOUT_ROWS)
+    for X, y, timestamps in stream_labeled_rows(chunk_size):
+        # Fit, compare and evaluate on the inputs the served model gets
+        X = quantize_features(X)
+        in_train = timestamps <= holdout_start
+        train.add(X[in_train], y[in_train], timestamps[in_train])
+        holdout.add(X[~in_train], y[~in_train], timestamps[~in_train])
+    return train, holdout
+
+def quantize_features(X):
+    """Vectorized model.predict.quantize: what the served model sees"""
+    return np.column_stack([np.round(X[:, column], digits) for column, digits in enumerate(QUANTIZATION)])
+
+def _fit(params, X, y, n_jobs):
+    from sklearn.ensemble import RandomForestClassifier
+    max_samples = min(1.0, MAX_SAMPLES_PER_TREE / len(y))
+    return RandomForestClassifier(**params, max_samples=max_samples, n_jobs=n_jobs, random_state=42).fit(X, y)
+
+# Search processes receive the data once, through the pool initializer
+_search_data = None
+
+def _init_search(X_fit, y_fit, X_val, y_val):
+    global _search_data
+    _search_data = (X_fit, y_fit, X_val, y_val)
+
+def _score_params(params):
+    X_fit, y_fit, X_val, y_val = _search_data
+    model = _fit(params, X_fit, y_fit, n_jobs=1)
+    return params, float((model.predict(X_val) == y_val).mean())
+
+def search_params(X, y, timestamps, jobs):
+    """Pick parameters on the newest VALIDATION_FRACTION of the training window (X quantized)"""
+    order = np.argsort(timestamps, kind='stable')
+    split = int(len(order) * (1 - VALIDATION_FRACTION))
+    fit_rows, validation_rows = order[:split], order[split:]
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(SEARCH_GRID)),
+        initializer=_init_search,
+        initargs=(X[fit_rows], y[fit_rows], X[validation_rows], y[validation_rows])
+    ) as pool:
+        results = list(pool.map(_score_params, SEARCH_GRID))
+    for params, accuracy in results:
+        print(f"  {params} validation accuracy {accuracy:.4f}")
+    return max(results, key=lambda result: result[1])[0]
+
+def evaluate(predicted, actual):
+    from sklearn.metrics import accuracy_score, f1_score, recall_score
+    labels = sorted(set(actual) | set(predicted))
+    recalls = recall_score(actual, predicted, labels=labels, average=None, zero_division=0)
+    return {
+        'accuracy': round(float(accuracy_score(actual, predicted)), 4),
+        'macro_f1': round(float(f1_score(actual, predicted, labels=labels, average='macro', zero_division=0)), 4),
+        'recall': {label: round(float(value), 4) for label, value in zip(labels, recalls)}
+    }
+
+def peak_memory_mb():
+    """Peak RSS of this process and of its largest child, in MB (ru_maxrss is KB on Linux)"""
+    return (
+        round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    )
+
+def retrain(holdout_days=30, search=False, jobs=None, version=None, chunk_size=CHUNK_SIZE,
+            max_rows=MAX_TRAINING_ROWS):
+    """Train, evaluate and publish a model. Returns the published metadata."""
+    from model.predict import predict_proba_batch
+
+    jobs = jobs or os.cpu_count()
+    timings = {}
+
+    @contextmanager
+    def stage(name):
+        started = time.perf_counter()
+        yield
+        timings[name] = round(time.perf_counter() - started, 3)
+        print(f"⏱️  {name}: {timings[name]:.2f}s")
+
+    with stage('load'):
+        latest = latest_labeled_timestamp()
+        if latest is None:
+            raise ValueError("No labeled rows: resolve alerts with a confirmed_disease first")
+        holdout_start = latest - np.timedelta64(holdout_days, 'D')
+        train, holdout = load_labeled_rows(holdout_start, max_rows, chunk_size)
+        X_train, y_train, timestamps_train = train.rows()
+        X_holdout, y_holdout, _ = holdout.rows()
+
+    if train.seen < MIN_TRAINING_ROWS or holdout.seen == 0:
+        raise ValueError(
+            f"Need at least {MIN_TRAINING_ROWS} training rows and one hold-out row, "
+            f"have {train.seen} and {holdout.seen} (try another --holdout-days)"
+        )
+    if len(train.counts) < 2:
+        raise ValueError("Training window has a single label; nothing to learn")
+
+    params = DEFAULT_PARAMS
+    if search:
+        with stage('search'):
+            params = search_params(X_train, y_train, timestamps_train, jobs)
+
+    with stage('fit'):
+        model = _fit(params, X_train, y_train, n_jobs=jobs)
+
+    with stage('evaluate'):
+        candidate = evaluate(model.predict(X_holdout), y_holdout)
+        classes, probabilities = predict_proba_batch(X_holdout)
+        current = evaluate(np.asarray(classes)[probabilities.argmax(axis=1)].astype(str), y_holdout)
+
+    version = version or datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+    peak_self, peak_children = peak_memory_mb()
+    info = {
+        'source': 'retrain',
+        'params': params,
+        'training_rows': len(y_train),
+        'holdout_rows': len(y_holdout),
+        'labeled_rows': {'training': train.seen, 'holdout': holdout.seen},
+        'holdout_start': str(holdout_start),
+        'metrics': candidate,
+        'current_model_metrics': current,
+        'wall_time_seconds': timings,
+        'peak_memory_mb': {'job': peak_self, 'search_processes': peak_children}
+    }
+    with stage('publish'):
+        info = registry.publish(model, version, info)
+    return info
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrain the disease model on confirmed alert outcomes")
+    parser.add_argument('--holdout-days', type=int, default=30)
+    parser.add_argument('--max-rows', type=int, default=MAX_TRAINING_ROWS,
+                        help='training rows kept, a label-stratified sample beyond this (default: %(default)s)')
+    parser.add_argument('--search', action='store_true', help='compare SEARCH_GRID parameter sets in parallel processes')
+    parser.add_argument('--jobs', type=int, default=None, help='processes / cores to use (default: all)')
+    parser.add_argument('--version', default=None, help='registry version name (default: timestamp)')
+    promote = parser.add_mutually_exclusive_group()
+    promote.add_argument('--shadow', action='store_true', help='score the new version in shadow mode')
+    promote.add_argument('--activate', action='store_true', help='serve the new version if it does at least as well')
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        started = time.perf_counter()
+        try:
+            info = retrain(args.holdout_days, args.search, args.jobs, args.version, max_rows=args.max_rows)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
+        metrics, current = info['metrics'], info['current_model_metrics']
+        labeled = info['labeled_rows']
+        print(f"✅ Published model version {info['version']} "
+              f"({info['training_rows']} of {labeled['training']} training rows, "
+              f"{info['holdout_rows']} of {labeled['holdout']} hold-out rows)")
+        print(f"   hold-out accuracy {metrics['accuracy']:.4f} (served model {current['accuracy']:.4f}), "
+              f"macro F1 {metrics['macro_f1']:.4f} (served model {current['macro_f1']:.4f})")
+        print(f"   wall time {time.perf_counter() - started:.2f}s, "
+              f"peak memory {info['peak_memory_mb']['job']} MB (search processes {info['peak_memory_mb']['search_processes']} MB)")
+
+        if args.shadow:
+            registry.set_shadow(info['version'])
+            print(f"✅ Version {info['version']} is now scored in shadow mode")
+        elif args.activate:
+            if metrics['accuracy'] >= current['accuracy']:
+                registry.activate(info['version'])
+                print(f"✅ Version {info['version']} is now active")
+            else:
+                print(f"❌ Not activated: hold-out accuracy is below the served model's")
+                sys.exit(1)
@@ -0,0 +1,156 @@
+"""Rebuild and verify the dashboard and time-series rollup tables.
+
+The rollups are updated incrementally on every write (see
+`update_prediction_rollups` / `update_health_metrics_rollups` in database.py).
+This module recomputes them from the raw rows, e.g. after a bulk import or a
+manual data fix, and checks that the incremental values still match.
+
+    python rollups.py rebuild
+    python rollups.py check
+"""
+import sys
+from sqlalchemy import DateTime, func, insert, select, type_coerce
+from database import (db, WaterQualityRecord, PredictionRecord, HealthMetricsRecord, PredictionRollup,
+                      WaterQualityHourlyRollup, HealthMetricsRollup, HealthMetricsHourlyRollup,
+                      ROLLUP_VITALS, WATER_QUALITY_VALUES)
+from sqlite_writer import sqlite_writer
+
+# Float sums are accumulated in a different order on write vs. rebuild
+SUM_TOLERANCE = 1e-6
+
+def _dialect_name(connection):
+    bind = connection.get_bind() if hasattr(connection, 'get_bind') else connection
+    return bind.dialect.name
+
+def _hour(column, dialect):
+    """Timestamp truncated to the hour, as the hourly rollups store it"""
+    if dialect == 'postgresql':
+        return type_coerce(func.date_trunc('hour', column), DateTime)
+    # SQLAlchemy stores SQLite datetimes as text with microseconds
+    return type_coerce(func.strftime('%Y-%m-%d %H:00:00.000000', column), DateTime)
+
+def _raw_water_quality_aggregates(keys):
+    """Water quality counts, sums and bounds of predictions, grouped by `keys` (labeled columns)"""
+    value_columns = []
+    for name in WATER_QUALITY_VALUES:
+        column = getattr(WaterQualityRecord, name)
+        value_columns += [
+            func.sum(column).label(f'{name}_sum'),
+            func.min(column).label(f'{name}_min'),
+            func.max(column).label(f'{name}_max')
+        ]
+    return select(
+        *keys,
+        func.count(PredictionRecord.id).label('record_count'),
+        *value_columns
+    ).join(WaterQualityRecord, PredictionRecord.water_quality_id == WaterQualityRecord.id)\
+     .group_by(*keys)
+
+def _raw_prediction_aggregates():
+    return _raw_water_quality_aggregates((
+        func.coalesce(WaterQualityRecord.state, '').label('state'),
+        func.coalesce(WaterQualityRecord.district, '').label('district'),
+        PredictionRecord.predicted_disease,
+        func.date(PredictionRecord.timestamp).label('day')
+    ))
+
+def _raw_water_quality_hourly_aggregates(dialect):
+    return _raw_water_quality_aggregates((
+        func.coalesce(WaterQualityRecord.state, '').label('state'),
+        func.coalesce(WaterQualityRecord.district, '').label('district'),
+        _hour(PredictionRecord.timestamp, dialect).label('hour')
+    ))
+
+def _raw_health_metrics_aggregates(period_key):
+    """Vitals counts, sums and bounds per state, district and `period_key` (a labeled column)"""
+    vital_columns = []
+    for vital in ROLLUP_VITALS:
+        column = getattr(HealthMetricsRecord, vital)
+        vital_columns.append(func.count(column).label(f'{vital}_count'))
+        vital_columns.append(func.coalesce(func.sum(column), 0).label(f'{vital}_sum'))
+        vital_columns.append(func.min(column).label(f'{vital}_min'))
+        vital_columns.append(func.max(column).label(f'{vital}_max'))
+
+    keys = (
+        func.coalesce(HealthMetricsRecord.state, '').label('state'),
+        func.coalesce(HealthMetricsRecord.district, '').label('district'),
+        period_key
+    )
+    return select(
+        *keys,
+        func.count(HealthMetricsRecord.id).label('record_count'),
+        *vital_columns
+    ).group_by(*keys)
+
+def _rollup_sources(dialect):
+    """(rollup model, raw aggregate select, key columns) for every rollup table"""
+    return (
+        (PredictionRollup, _raw_prediction_aggregates(), ('state', 'district', 'predicted_disease', 'day')),
+        (WaterQualityHourlyRollup, _raw_water_quality_hourly_aggregates(dialect), ('state', 'district', 'hour')),
+        (HealthMetricsRollup, _raw_health_metrics_aggregates(func.date(HealthMetricsRecord.timestamp).label('day')),
+         ('state', 'district', 'day')),
+        (HealthMetricsHourlyRollup, _raw_health_metrics_aggregates(_hour(HealthMetricsRecord.timestamp, dialect).label('hour')),
+         ('state', 'district', 'hour')),
+    )
+
+def rebuild_rollups(connection=None):
+    """Replace the rollup tables with aggregates computed from the raw rows"""
+    connection = connection or db.session
+    for model, raw_select, _ in _rollup_sources(_dialect_name(connection)):
+        columns = [column.name for column in raw_select.selected_columns]
+        connection.execute(model.__table__.delete())
+        connection.execute(insert(model.__table__).from_select(columns, raw_select))
+
+def _compare(model, raw_select, key_columns):
+    value_columns = [column.name for column in raw_select.selected_columns if column.name not in key_columns]
+
+    def as_key(row):
+        return tuple(str(row[column]) for column in key_columns)
+
+    raw = {as_key(row): row for row in db.session.execute(raw_select).mappings()}
+    rolled = {
+        as_key(row): row
+        for row in db.session.execute(select(model.__table__)).mappings()
+        if row['record_count'] != 0
+    }
+
+    mismatches = []
+    for key in raw.keys() | rolled.keys():
+        for column in value_columns:
+            expected = raw[key][column] if key in raw else 0
+            actual = rolled[key][column] if key in rolled else 0
+            if abs((expected or 0) - (actual or 0)) > SUM_TOLERANCE * max(1, abs(expected or 0)):
+                mismatches.append({
+                    'table': model.__tablename__, 'key': key, 'column': column,
+                    'expected': expected, 'actual': actual
+                })
+    return mismatches
+
+def check_rollups():
+    """Compare the rollups with the raw aggregates. Returns a list of mismatches."""
+    mismatches = []
+    for model, raw_select, key_columns in _rollup_sources(_dialect_name(db.session)):
+        mismatches += _compare(model, raw_select, key_columns)
+    return mismatches
+
+if __name__ == "__main__":
+    from app import app
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'check'
+    with app.app_context():
+        if command == 'rebuild':
+            with sqlite_writer.lock():
+                rebuild_rollups()
+                db.session.commit()
+            print("✅ Rollups rebuilt from raw records")
+        elif command == 'check':
+            mismatches = check_rollups()
+            for mismatch in mismatches:
+                print(f"❌ {mismatch['table']} {mismatch['key']} {mismatch['column']}: "
+                      f"expected {mismatch['expected']}, found {mismatch['actual']}")
+            if mismatches:
+                sys.exit(1)
+            print("✅ Rollups match the raw records")
+        else:
+            print(f"Unknown command: {command} (expected 'rebuild' or 'check')")
+            sys.exit(2)
@@ -0,0 +1,103 @@
+"""SQLite production profile (SQLITE_TUNING=1): pragmas and a single writer.
+
+SQLite lets one connection write to a database file at a time. When several
+Gunicorn workers write, they race for that lock: the losers retry inside
+SQLite's busy handler, sleeping with growing backoff, and fail with
+"database is locked" once busy_timeout runs out. Under load that means
+errors, and writers that wake up long after the lock was freed.
+
+With the profile on:
+
+- Every connection sets WAL journaling (readers never wait for the writer,
+  nor it for them), synchronous=NORMAL (fsync at checkpoints rather than
+  every commit: a power cut can lose the last commits, never corrupt the
+  file), busy_timeout, mmap_size and cache_size.
+- Write transactions run inside `sqlite_writer.lock()`: a thread lock in the
+  process and an exclusive flock on `<database>-writer.lock` across
+  processes. Writers queue for the flock in the kernel and are woken in turn
+  the moment it is released, so only one of them ever asks SQLite for the
+  write lock. Reads take no lock and run concurrently.
+
+Other database backends are unaffected: the lock is a no-op there.
+"""
+import fcntl
+import os
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+
+class SQLiteWriter:
+    """Flask extension: `sqlite_writer.init_app(app)`, then `with sqlite_writer.lock(): ...`"""
+
+    def __init__(self):
+        self.enabled = False
+        self.thread_lock = threading.Lock()
+        self.lock_path = None
+        self.lock_file = None
+        self.pid = None
+        self.writes = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def init_app(self, app):
+        from database import db
+
+        with app.app_context():
+            engine = db.engine
+        if engine.dialect.name != 'sqlite' or not app.config.get('SQLITE_TUNING'):
+            return
+        self.pragmas = [
+            'journal_mode=WAL',
+            'synchronous=NORMAL',
+            f"busy_timeout={app.config['SQLITE_BUSY_TIMEOUT_MS']}",
+            f"mmap_size={app.config['SQLITE_MMAP_SIZE']}",
+            # Negative: size in KiB rather than pages
+            f"cache_size=-{app.config['SQLITE_CACHE_SIZE_KB']}",
+        ]
+        event.listen(engine, 'connect', self._set_pragmas)
+        database = engine.url.database
+        if database and database != ':memory:':
+            self.lock_path = os.path.abspath(database) + '-writer.lock'
+            self.enabled = True
+
+    def _set_pragmas(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in self.pragmas:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
+    @contextmanager
+    def lock(self):
+        """Hold the database's single write slot; wrap a whole write transaction (not reentrant)"""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        with self.thread_lock:
+            # An inherited descriptor would share its flock with the parent: open one per process
+            if self.pid != os.getpid():
+                self.lock_file = open(self.lock_path, 'a')
+                self.pid = os.getpid()
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+            waited = time.perf_counter() - started
+            self.writes += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        return {
+            'enabled': True,
+            'pragmas': self.pragmas,
+            'writes': self.writes,
+            'mean_wait_ms': round(self.wait_seconds / self.writes * 1000, 3) if self.writes else 0.0,
+            'max_wait_ms': round(self.max_wait_seconds * 1000, 3)
+        }
+
+sqlite_writer = SQLiteWriter()
@@ -0,0 +1,274 @@
+"""Write-behind persistence for /predict (PREDICTION_WRITE_MODE=async).
+
+In async mode /predict answers as soon as the prediction is made. The record
+is appended to a local spool file and queued; a background writer per worker
+process drains the queue into bulk inserts (save_prediction_records_bulk)
+every WRITE_BEHIND_INTERVAL_MS or WRITE_BEHIND_BATCH_SIZE records, whichever
+comes first. The client gets the prediction's `prediction_uuid` up front.
+
+Spool: each worker appends JSON lines to its own segment in
+PREDICTION_SPOOL_DIR and holds an exclusive flock on it. A line is written
+(unbuffered) before the response is sent, so a crashed worker loses nothing;
+set PREDICTION_SPOOL_FSYNC=1 to also survive power loss. Once every record
+in a segment is committed and the segment is big enough, it is deleted and a
+new one started. A segment nobody holds a lock on belongs to a dead worker:
+it is replayed (skipping UUIDs already in the database) and deleted, at
+the moment a worker's writer starts, or with `python write_behind.py recover`.
+"""
+import atexit
+import fcntl
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from sqlalchemy import select
+
+SEGMENT_PREFIX = 'predictions-'
+SEGMENT_SUFFIX = '.log'
+SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+# Attempts per batch before it is moved to the dead-letter file
+MAX_ATTEMPTS = 5
+
+class PredictionWriter:
+    """Flask extension: `prediction_writer.init_app(app)`, then `submit(...)` from /predict"""
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.pid = None
+        self._thread = None
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.appended = self.committed = 0
+        self.written = self.batches = self.dead_lettered = self.recovered = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('PREDICTION_WRITE_MODE', 'sync') == 'async'
+        self.interval = app.config.get('WRITE_BEHIND_INTERVAL_MS', 50) / 1000
+        self.batch_size = app.config.get('WRITE_BEHIND_BATCH_SIZE', 500)
+        self.spool_dir = app.config.get('PREDICTION_SPOOL_DIR')
+        self.fsync = app.config.get('PREDICTION_SPOOL_FSYNC', False)
+        if self.enabled:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            atexit.register(self.flush)
+
+    def submit(self, water_data, prediction_result, additional_info):
+        """Spool and queue one prediction; returns its prediction_uuid"""
+        self._ensure_started()
+        prediction_uuid = prediction_result.get('prediction_uuid') or str(uuid.uuid4())
+        record = {
+            'uuid': prediction_uuid,
+            'timestamp': datetime.utcnow().isoformat(),
+            'water': water_data,
+            'prediction': dict(prediction_result, prediction_uuid=prediction_uuid),
+            'info': additional_info
+        }
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode()
+        with self.lock:
+            self.segment.write(line)
+            if self.fsync:
+                os.fsync(self.segment.fileno())
+            self.appended += 1
+            self.queue.put(record)
+        return prediction_uuid
+
+    def flush(self, timeout=5.0):
+        """Wait until everything submitted so far is committed (or the timeout passes)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if self.pid != os.getpid() or self.committed >= self.appended:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def stats(self):
+        if not self.enabled:
+            return {'mode': 'sync'}
+        with self.lock:
+            started = self.pid == os.getpid()
+            return {
+                'mode': 'async',
+                'pending': self.appended - self.committed if started else 0,
+                'written': self.written if started else 0,
+                'batches': self.batches if started else 0,
+                'dead_lettered': self.dead_lettered if started else 0,
+                'recovered': self.recovered if started else 0,
+                'interval_ms': int(self.interval * 1000),
+                'batch_size': self.batch_size
+            }
+
+    def _ensure_started(self):
+        # Threads and locked segments do not survive a fork: every worker starts its own.
+        # A writer thread that died is restarted on the same queue and segment
+        if self.pid == os.getpid() and self._thread.is_alive():
+            return
+        with self.lock:
+            if self.pid != os.getpid():
+                self.queue = queue.Queue()
+                self._reset_counters()
+                self._open_segment()
+                self.pid = os.getpid()
+                self._thread = None
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='prediction-writer', daemon=True)
+                self._thread.start()
+
+    def _open_segment(self):
+        # Lock before the .log name appears, so recovery never takes a live segment
+        name = f"{SEGMENT_PREFIX}{os.getpid()}-{time.time_ns()}"
+        pending_path = os.path.join(self.spool_dir, name + '.open')
+        self.segment_path = os.path.join(self.spool_dir, name + SEGMENT_SUFFIX)
+        self.segment = open(pending_path, 'ab', buffering=0)
+        fcntl.flock(self.segment, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.rename(pending_path, self.segment_path)
+        self.appended = self.committed = 0
+
+    def _rotate_if_done(self):
+        """Called with the lock held after a commit"""
+        if self.committed == self.appended and self.segment.tell() >= SEGMENT_MAX_BYTES:
+            os.unlink(self.segment_path)
+            self.segment.close()
+            self._open_segment()
+
+    def _run(self):
+        try:
+            self.recover()
+        except Exception as e:
+            print(f"❌ Write-behind: spool recovery failed: {e}")
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._persist(batch)
+                with self.lock:
+                    self.committed += len(batch)
+                    self._rotate_if_done()
+            except Exception as e:
+                # Not counted as committed: the records stay in this worker's
+                # segment, which is then never rotated, and are replayed after it exits
+                print(f"❌ Write-behind: batch of {len(batch)} failed: {e}")
+
+    def _persist(self, records, skip_existing=False):
+        """Bulk insert records, retrying with backoff.
+
+        While the database is unreachable this keeps retrying. If the database
+        is up but the batch still fails MAX_ATTEMPTS times, the records go to
+        the dead-letter file instead of blocking the queue.
+        """
+        attempt = 0
+        while True:
+            try:
+                with self.app.app_context():
+                    saved = self._insert(records, skip_existing)
+            except Exception as e:
+                print(f"❌ Write-behind insert failed: {e}")
+                saved = None
+            if saved is not None:
+                with self.lock:
+                    self.written += len(saved)
+                    self.batches += 1
+                return True
+            attempt += 1
+            if attempt >= MAX_ATTEMPTS and self._database_available():
+                self._dead_letter(records)
+                return False
+            time.sleep(min(0.1 * 2 ** attempt, 5.0))
+
+    def _database_available(self):
+        from database import db
+        try:
+            with self.app.app_context():
+                db.session.execute(select(1))
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _insert(records, skip_existing):
+        from database import db, PredictionRecord, save_prediction_records_bulk
+
+        if skip_existing:
+            existing = set(db.session.scalars(
+                select(PredictionRecord.prediction_uuid)
+                .where(PredictionRecord.prediction_uuid.in_([record['uuid'] for record in records]))
+            ))
+            records = [record for record in records if record['uuid'] not in existing]
+        return save_prediction_records_bulk([
+            (record['water'], record['prediction'],
+             dict(record['info'] or {}, timestamp=datetime.fromisoformat(record['timestamp'])))
+            for record in records
+        ])
+
+    def _dead_letter(self, records):
+        path = os.path.join(self.spool_dir, f"failed-{os.getpid()}.jsonl")
+        with open(path, 'a') as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+        with self.lock:
+            self.dead_lettered += len(records)
+        print(f"❌ Write-behind: {len(records)} predictions could not be saved, kept in {path}")
+
+    def recover(self):
+        """Replay and delete spool segments left behind by dead workers"""
+        if not self.enabled:
+            return 0
+        replayed = 0
+        for name in sorted(os.listdir(self.spool_dir)):
+            path = os.path.join(self.spool_dir, name)
+            if not (name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)):
+                continue
+            try:
+                segment = open(path, 'rb')
+            except FileNotFoundError:
+                continue  # replayed and deleted by another worker since listdir
+            with segment:
+                try:
+                    fcntl.flock(segment, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # a live worker's segment
+                if not os.path.exists(path):
+                    continue  # another worker replayed it while we waited for the lock
+                records = []
+                for line in segment:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        pass  # torn last line: that request never got a response
+                for start in range(0, len(records), self.batch_size):
+                    self._persist(records[start:start + self.batch_size], skip_existing=True)
+                os.unlink(path)
+                replayed += len(records)
+        if replayed:
+            print(f"✅ Write-behind: replayed {replayed} spooled predictions")
+            with self.lock:
+                self.recovered += replayed
+        return replayed
+
+prediction_writer = PredictionWriter()
+
+if __name__ == "__main__":
+    import sys
+    # The instance app.py configured, not this __main__ module's copy
+    from app import prediction_writer as writer
+
+    if sys.argv[1:] != ['recover']:
+        print("Usage: python write_behind.py recover")
+        sys.exit(2)
+    writer.enabled = True
+    os.makedirs(writer.spool_dir, exist_ok=True)
+    print(f"✅ Replayed {writer.recover()} spooled predictions")
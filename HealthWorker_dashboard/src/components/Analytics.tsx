@@ -35,6 +35,8 @@ interface HealthAlert {
   status: string;
   created_at: string;
   notes: string;
+  occurrence_count?: number;
+  last_seen_at?: string;
   prediction: {
     disease: string;
     health_alert: string;
@@ -47,6 +49,11 @@ interface HealthAlert {
   assigned_worker: any;
 }
 
+// Used when the server has no alert stream (it answers 503 under sync workers)
+const ALERTS_POLL_MS = 30000;
+// The stream is tried again after the 503's Retry-After
+const STREAM_RETRY_MS = 300000;
+
 const Analytics: React.FC = () => {
   const { t } = useTranslation();
   const [dashboardData, setDashboardData] = useState<DashboardData | null>(null);
@@ -62,6 +69,59 @@ const Analytics: React.FC = () => {
     fetchData();
   }, []);
 
+  // Live alert updates; EventSource reconnects by itself and resumes from the last event.
+  // When the stream is refused, /alerts is polled until it is accepted again
+  useEffect(() => {
+    let source: EventSource | null = null;
+    let pollTimer: number | undefined;
+    let retryTimer: number | undefined;
+    const pollAlerts = async () => {
+      try {
+        const response = await fetch('http://127.0.0.1:5000/alerts');
+        if (response.ok) setActiveAlerts(await response.json());
+      } catch (err) {
+        console.error('Analytics: Error polling alerts:', err);
+      }
+    };
+    const applyAlert = (event: MessageEvent) => {
+      const alert: HealthAlert = JSON.parse(event.data);
+      setActiveAlerts(alerts => {
+        const others = alerts.filter(existing => existing.id !== alert.id);
+        if (alert.status !== 'ACTIVE') return others;
+        const index = alerts.findIndex(existing => existing.id === alert.id);
+        if (index === -1) return [alert, ...alerts];
+        return alerts.map(existing => (existing.id === alert.id ? alert : existing));
+      });
+    };
+    const connect = () => {
+      const stream = new EventSource('http://127.0.0.1:5000/alerts/stream');
+      source = stream;
+      stream.addEventListener('alert.created', applyAlert);
+      stream.addEventListener('alert.updated', applyAlert);
+      // Too far behind to replay: reload everything
+      stream.addEventListener('reset', () => fetchData());
+      stream.onopen = () => {
+        if (pollTimer === undefined) return;
+        // Back from polling: catch up on what changed since the last poll
+        window.clearInterval(pollTimer);
+        pollTimer = undefined;
+        pollAlerts();
+      };
+      stream.onerror = () => {
+        // CLOSED means refused (e.g. 503), not a dropped connection being retried
+        if (stream.readyState !== EventSource.CLOSED) return;
+        if (pollTimer === undefined) pollTimer = window.setInterval(pollAlerts, ALERTS_POLL_MS);
+        retryTimer = window.setTimeout(connect, STREAM_RETRY_MS);
+      };
+    };
+    connect();
+    return () => {
+      source?.close();
+      window.clearInterval(pollTimer);
+      window.clearTimeout(retryTimer);
+    };
+  }, []);
+
   const fetchData = async () => {
     try {
       setLoading(true);